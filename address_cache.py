@@ -0,0 +1,95 @@
+# address_cache.py - Постоянный кеш адресов ключей gaiad (имя ключа -> bech32 адрес)
+
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+DEFAULT_CACHE_FILE = ".address_cache.json"
+
+
+def default_gaiad_home():
+    return Path(os.getenv("GAIAD_HOME", Path.home() / ".gaia"))
+
+
+class AddressCache:
+    """Кеш `gaiad keys show <name> -a` в небольшом JSON файле.
+
+    Кеш сбрасывается, если изменились каталоги keyring-* в домашнем каталоге
+    gaiad (inode или mtime): добавление и удаление ключей меняет mtime каталога.
+    Промахи дозаполняются одним вызовом `gaiad keys list` на все ключи сразу.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_FILE, gaiad_home=None, gaiad_bin="gaiad"):
+        self.path = Path(path)
+        self.gaiad_home = Path(gaiad_home) if gaiad_home else default_gaiad_home()
+        self.gaiad_bin = gaiad_bin
+        self._lock = threading.Lock()
+        self._addresses = None
+        self._unknown = set()   # Имена, которых нет в keyring (в пределах процесса)
+        self.stats = {"hits": 0, "misses": 0, "keyring_calls": 0}
+
+    def _fingerprint(self):
+        """Отпечаток каталогов keyring: [[путь, inode, mtime_ns], ...]"""
+        fingerprint = []
+        for keyring_dir in sorted(self.gaiad_home.glob("keyring-*")):
+            try:
+                st = keyring_dir.stat()
+            except OSError:
+                continue
+            fingerprint.append([str(keyring_dir), st.st_ino, st.st_mtime_ns])
+        return fingerprint
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get("fingerprint") != self._fingerprint():
+            return {}
+        return dict(data.get("addresses") or {})
+
+    def _save(self):
+        data = {"fingerprint": self._fingerprint(), "addresses": self._addresses}
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def _list_keys(self):
+        """Все ключи keyring одним вызовом gaiad"""
+        self.stats["keyring_calls"] += 1
+        result = subprocess.run([self.gaiad_bin, "keys", "list", "-o", "json"], capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"gaiad keys list: {result.stderr.strip()}")
+        # Некоторые версии gaiad пишут JSON в stderr
+        raw = result.stdout.strip() or result.stderr.strip()
+        return {key["name"]: key["address"] for key in json.loads(raw or "[]")}
+
+    def get_many(self, names):
+        """Адреса для списка имён ключей: {имя: адрес}. Неизвестные имена пропускаются"""
+        with self._lock:
+            if self._addresses is None:
+                self._addresses = self._load()
+            missing = [name for name in names if name not in self._addresses and name not in self._unknown]
+            self.stats["hits"] += len(names) - len(missing)
+            self.stats["misses"] += len(missing)
+            if missing:
+                self._addresses.update(self._list_keys())
+                self._unknown.update(name for name in missing if name not in self._addresses)
+                self._save()
+            return {name: self._addresses[name] for name in names if name in self._addresses}
+
+    def get(self, name):
+        return self.get_many([name]).get(name)
+
+    def invalidate(self):
+        with self._lock:
+            self._addresses = {}
+            self._unknown.clear()
+            try:
+                self.path.unlink()
+            except FileNotFoundError:
+                pass
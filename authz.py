@@ -0,0 +1,211 @@
+# authz.py - Пакетное снятие наград через authz: одна транзакция MsgExec на десятки кошельков
+#
+# Каждый WalletN один раз выдаёт ключу-контроллеру (AUTHZ_CONTROLLER)
+# GenericAuthorization на MsgWithdrawDelegatorReward. Дальше контроллер
+# подписывает MsgExec со снятиями многих кошельков: награды приходят на
+# баланс каждого кошелька, комиссию одной транзакции платит контроллер.
+
+import base64
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from broadcaster import SigningError
+from gas_oracle import GasEstimate
+from planner import fee_for
+from rpc_client import RPCError, parse_time
+from signer import MSG_WITHDRAW, msg_exec, msg_grant, withdraw_all_msgs
+from tx_confirmer import parse_withdrawals
+
+GRANT_TTL = 365 * 86400             # Срок выдаваемого разрешения (сек)
+GRANT_RENEW_BEFORE = 14 * 86400     # Перевыдать разрешение, если до истечения осталось меньше (сек)
+GRANT_GAS = 120_000                 # Газ MsgGrant (в блоках нет образцов для GasOracle)
+GRANT_CHECK_GAS = 12_000            # Проверка разрешения на каждое сообщение внутри MsgExec
+MIN_MSG_GAS = 40_000                # Газ одного снятия, если модель GasOracle его не различает
+BLOCK_GAS_SHARE = 0.25              # Доля max_gas блока на одну транзакцию: большой tx дольше ждёт места
+DEFAULT_MAX_TX_GAS = 10_000_000
+DEFAULT_BATCH_SIZE = 50             # Кошельков в одной транзакции MsgExec
+QUERY_WORKERS = 16                  # Параллельных запросов разрешений и валидаторов
+
+
+@dataclass
+class AuthzBatch:
+    """Кошельки одной транзакции MsgExec и её итог"""
+    wallets: list                   # [(имя, адрес, валидаторов по снимку)]
+    msgs: list = field(default_factory=list)        # Снятия всех кошельков (Any)
+    gas: int = 0
+    gas_source: str = ""
+    tx_hash: str = ""
+    status: object = None           # True / "out_of_gas" / False, как у PendingTx
+    withdrawn: dict = field(default_factory=dict)   # имя -> {"withdrawn", "validators"}
+
+
+def plan_batches(wallets, base_gas, msg_gas, max_gas, max_wallets=DEFAULT_BATCH_SIZE):
+    """Жадное разбиение [(имя, адрес, валидаторов)] на пакеты в пределах max_gas и max_wallets.
+
+    Газ пакета по модели: base_gas + msg_gas на каждое снятие. Кошелёк,
+    который один превышает max_gas, идёт отдельным пакетом.
+    """
+    batches, current, gas = [], [], base_gas
+    for wallet in wallets:
+        wallet_gas = msg_gas * max(wallet[2], 1)
+        if current and (gas + wallet_gas > max_gas or len(current) >= max_wallets):
+            batches.append(AuthzBatch(current, gas=gas, gas_source="model"))
+            current, gas = [], base_gas
+        current.append(wallet)
+        gas += wallet_gas
+    if current:
+        batches.append(AuthzBatch(current, gas=gas, gas_source="model"))
+    return batches
+
+
+class AuthzWithdrawer:
+    """Снятие наград многих кошельков транзакциями MsgExec ключа-контроллера.
+
+    Разрешения проверяются через REST; кошелёк без действующего разрешения
+    выдаёт его своей транзакцией MsgGrant (раз в GRANT_TTL). Кошельки с
+    разрешением делятся на пакеты так, чтобы газ транзакции не превышал
+    max_tx_gas и BLOCK_GAS_SHARE от лимита блока. Газ пакета - симуляция
+    через REST, иначе модель GasOracle; пакет, не уложившийся в лимит по
+    симуляции, делится пополам. MsgExec подписывается только внутри процесса.
+    """
+
+    def __init__(self, client, broadcaster, simulator, controller, controller_address, gas_price,
+                 max_tx_gas=DEFAULT_MAX_TX_GAS, max_wallets=DEFAULT_BATCH_SIZE, denom="uatom", clock=time.time):
+        self.client = client
+        self.broadcaster = broadcaster
+        self.simulator = simulator
+        self.controller = controller
+        self.controller_address = controller_address
+        self.gas_price = gas_price
+        self.max_tx_gas = max_tx_gas
+        self.max_wallets = max_wallets
+        self.denom = denom
+        self.clock = clock
+        self._max_gas = None
+        self.stats = {"grants_checked": 0, "grants_missing": 0, "grants_unknown": 0, "batches": 0,
+                      "batch_splits": 0, "wallets_withdrawn": 0, "withdrawn": 0, "fees": 0}
+
+    # ------------------------------------------------------------------
+    # Разрешения
+    # ------------------------------------------------------------------
+
+    def grant_status(self, address):
+        """True - есть действующее разрешение, False - нет или скоро истекает, None - не удалось проверить"""
+        try:
+            grants = self.client.get_grants(address, self.controller_address, MSG_WITHDRAW)
+        except RPCError:
+            return None
+        now = self.clock()
+        for grant in grants:
+            authorization = grant.get("authorization") or {}
+            if authorization.get("msg", MSG_WITHDRAW) != MSG_WITHDRAW:
+                continue
+            expiration = parse_time(grant.get("expiration"))
+            if expiration is None or expiration - now > GRANT_RENEW_BEFORE:
+                return True
+        return False
+
+    def check_grants(self, wallets):
+        """(с разрешением, без разрешения, не проверены) - списки [(имя, адрес, валидаторов)]"""
+        with ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="authz") as pool:
+            statuses = list(pool.map(lambda wallet: self.grant_status(wallet[1]), wallets))
+        granted = [wallet for wallet, status in zip(wallets, statuses) if status is True]
+        missing = [wallet for wallet, status in zip(wallets, statuses) if status is False]
+        unknown = [wallet for wallet, status in zip(wallets, statuses) if status is None]
+        self.stats["grants_checked"] += len(wallets)
+        self.stats["grants_missing"] += len(missing)
+        self.stats["grants_unknown"] += len(unknown)
+        return granted, missing, unknown
+
+    def grant_tx(self, address):
+        """(аргументы `gaiad tx`, сообщения, газ) транзакции MsgGrant от кошелька контроллеру"""
+        expiration = int(self.clock() + GRANT_TTL)
+        tx_args = ["authz", "grant", self.controller_address, "generic", "--msg-type", MSG_WITHDRAW,
+                   "--expiration", str(expiration)]
+        return tx_args, [msg_grant(address, self.controller_address, MSG_WITHDRAW, expiration)], GRANT_GAS
+
+    # ------------------------------------------------------------------
+    # Пакеты
+    # ------------------------------------------------------------------
+
+    def gas_model(self):
+        """(газ транзакции без снятий, газ одного снятия) по оценкам GasOracle.
+
+        Постоянная часть - как у транзакции с одним лёгким сообщением (send),
+        газ снятия - прирост модели снятия на одного валидатора.
+        """
+        oracle = self.simulator.oracle
+        msg_gas = oracle.withdraw_gas(2).gas - oracle.withdraw_gas(1).gas
+        return oracle.send_gas().gas, max(msg_gas, MIN_MSG_GAS) + GRANT_CHECK_GAS
+
+    def max_gas(self):
+        """Лимит газа одной транзакции: max_tx_gas, но не больше BLOCK_GAS_SHARE от лимита блока"""
+        if self._max_gas is None:
+            try:
+                block_gas = self.client.get_block_max_gas()
+            except (RPCError, KeyError, ValueError, AttributeError):
+                block_gas = None
+            self._max_gas = min(self.max_tx_gas, int(block_gas * BLOCK_GAS_SHARE)) if block_gas else self.max_tx_gas
+        return self._max_gas
+
+    def plan(self, wallets):
+        """Пакеты по модели газа (без запросов валидаторов и симуляции)"""
+        base_gas, msg_gas = self.gas_model()
+        return plan_batches(wallets, base_gas, msg_gas, self.max_gas(), self.max_wallets)
+
+    def fee(self, gas):
+        return fee_for(gas, self.gas_price)
+
+    def _wallet_msgs(self, wallet):
+        _, address, _ = wallet
+        return withdraw_all_msgs(address, self.client.get_delegator_validators(address))
+
+    def _simulate(self, batch):
+        """Газ пакета: симуляция подписанного MsgExec через REST или модель"""
+        base_gas, msg_gas = self.gas_model()
+        model = GasEstimate(base_gas + msg_gas * len(batch.msgs), "model")
+        signer = self.broadcaster.signer
+        try:
+            tx_raw, _ = signer.sign([msg_exec(self.controller_address, batch.msgs)], self.controller,
+                                    self.controller_address, self.fee(model.gas), 0, self.denom)
+        except (SigningError, RPCError):
+            return model
+        return self.simulator.signed_tx_gas(base64.b64encode(tx_raw).decode(), lambda: model)
+
+    def prepare(self, batch):
+        """Снятия по текущим валидаторам и газ по симуляции. Список готовых пакетов:
+        пакет, превысивший лимит газа, делится пополам. Кошельки без валидаторов отбрасываются"""
+        with ThreadPoolExecutor(max_workers=QUERY_WORKERS, thread_name_prefix="authz") as pool:
+            wallet_msgs = list(pool.map(self._wallet_msgs, batch.wallets))
+        batch.wallets = [wallet for wallet, msgs in zip(batch.wallets, wallet_msgs) if msgs]
+        batch.msgs = [msg for msgs in wallet_msgs for msg in msgs]
+        if not batch.msgs:
+            return []
+        estimate = self._simulate(batch)
+        batch.gas, batch.gas_source = estimate.gas, estimate.source
+        if batch.gas <= self.max_gas() or len(batch.wallets) == 1:
+            return [batch]
+        self.stats["batch_splits"] += 1
+        middle = len(batch.wallets) // 2
+        return self.prepare(AuthzBatch(batch.wallets[:middle])) + self.prepare(AuthzBatch(batch.wallets[middle:]))
+
+    def broadcast(self, batch):
+        """Подписывает MsgExec контроллером и рассылает. BroadcastResult"""
+        fees = self.fee(batch.gas)
+        result = self.broadcaster.sign_and_broadcast(None, [msg_exec(self.controller_address, batch.msgs)],
+                                                     self.controller, self.controller_address, fees, batch.gas,
+                                                     self.denom)
+        if result.accepted:
+            batch.tx_hash = result.tx_hash
+            self.stats["batches"] += 1
+            self.stats["fees"] += fees
+        return result
+
+    def breakdown(self, batch, tx_result):
+        """Итог по кошелькам из событий включённой транзакции: {имя: {"withdrawn", "validators"}}"""
+        by_address = parse_withdrawals(tx_result, [address for _, address, _ in batch.wallets], self.denom)
+        batch.withdrawn = {name: by_address[address] for name, address, _ in batch.wallets}
+        self.stats["wallets_withdrawn"] += sum(1 for parts in batch.withdrawn.values() if parts["withdrawn"])
+        self.stats["withdrawn"] += sum(parts["withdrawn"] for parts in batch.withdrawn.values())
+        return batch.withdrawn
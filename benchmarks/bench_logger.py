@@ -0,0 +1,87 @@
+# bench_logger.py - Накладные расходы одного события лога: синхронный логгер против очереди
+#
+# Запуск из корня проекта: python3 benchmarks/bench_logger.py [событий] [потоков]
+
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from colorama import Fore, Style  # noqa: E402
+
+from logger import CosmosLogger  # noqa: E402
+
+
+class SyncLogger:
+    """Прежняя схема: FileHandler + StreamHandler в потоке вызова и ещё один print"""
+
+    def __init__(self, log_dir):
+        self.logger = logging.getLogger("bench_sync")
+        self.logger.handlers.clear()
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+        for handler in (logging.FileHandler(os.path.join(log_dir, "sync.log"), encoding="utf-8"),
+                        logging.StreamHandler(sys.stdout)):
+            handler.setFormatter(formatter)
+            self.logger.addHandler(handler)
+
+    def log_send_transaction(self, wallet_name, amount, target, exchange, tx_hash, success=True):
+        status = "SUCCESS" if success else "FAILED"
+        message = f"[{wallet_name}] Отправка {amount:,} uatom на {exchange} - {status} - TX: {tx_hash}"
+        self.logger.info(message)
+        print(f"{Fore.GREEN}💸 {message}{Style.RESET_ALL}")
+
+    def stop(self):
+        for handler in self.logger.handlers:
+            handler.close()
+
+
+def run(logger, events, threads):
+    """Среднее время вызова log_* в потоке обработки (мкс)"""
+    per_thread = events // threads
+
+    def worker(n):
+        for i in range(per_thread):
+            logger.log_send_transaction(f"Wallet{n}", 1_000_000 + i, "cosmos1target", "OKX", "A" * 64)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    caller_time = time.perf_counter() - started
+    logger.stop()   # Для логгера с очередью - дождаться записи всех событий
+    total_time = time.perf_counter() - started
+    return caller_time / (per_thread * threads) * 1e6, total_time
+
+
+def main():
+    events = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    real_stdout = sys.stdout
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, open(os.devnull, "w", encoding="utf-8") as devnull:
+        sys.stdout = devnull    # Консоль не должна влиять на замер
+        try:
+            for name, factory in (("sync", lambda: SyncLogger(tmp)),
+                                  ("queue", lambda: CosmosLogger(tmp, rotation="size"))):
+                for n in (1, threads):
+                    # Лучший из трёх прогонов, чтобы сгладить шум планировщика
+                    results[(name, n)] = min((run(factory(), events, n) for _ in range(3)), key=lambda r: r[0])
+        finally:
+            sys.stdout = real_stdout
+
+    print(f"{events} событий, консоль -> /dev/null")
+    print(f"{'логгер':<8}{'потоков':>9}{'мкс/событие':>14}{'всего, с':>11}")
+    for (name, n), (per_event, total) in results.items():
+        print(f"{name:<8}{n:>9}{per_event:>14.1f}{total:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
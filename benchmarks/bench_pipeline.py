@@ -0,0 +1,166 @@
+# bench_pipeline.py - Полный проход main() против локального узла и подменного gaiad, без выхода в сеть
+#
+# Запуск из корня проекта:
+#   python3 benchmarks/bench_pipeline.py                       # 119, 500 и 5000 кошельков
+#   python3 benchmarks/bench_pipeline.py 119 --latency 0.05 --error-rate 0.02 --oog-rate 0.1
+#   python3 benchmarks/bench_pipeline.py 500 -- --workers 8 --combined
+#   python3 benchmarks/bench_pipeline.py 500 -- --workers 8 --authz Controller
+#
+# Аргументы после "--" передаются script.py как есть. Каждый размер прогоняется
+# в отдельном процессе (свежие глобальные клиенты и честный пик RSS).
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, ".."))
+
+from fake_gaiad import write_keyring  # noqa: E402
+from fake_node import FakeChain, FakeNode  # noqa: E402
+
+DEFAULT_SIZES = (119, 500, 5000)
+
+
+def _exchange_addresses(count):
+    from signer import bech32_address
+    import hashlib
+    return [bech32_address("cosmos", hashlib.sha256(f"okx{i}".encode()).digest()[:20]) for i in range(count)]
+
+
+def _prepare(workdir, home, count):
+    """Каталог запуска: okx_wallets и bin/gaiad -> fake_gaiad.py"""
+    bin_dir = os.path.join(workdir, "bin")
+    os.makedirs(bin_dir)
+    os.symlink(os.path.join(BENCH_DIR, "fake_gaiad.py"), os.path.join(bin_dir, "gaiad"))
+    with open(os.path.join(workdir, "okx_wallets"), "w", encoding="utf-8") as f:
+        f.write("\n".join(_exchange_addresses(count)) + "\n")
+    return {
+        **os.environ,
+        "PATH": f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}",
+        "GAIAD_HOME": home,
+        "FAKE_GAIAD_LOG": os.path.join(workdir, "gaiad_calls"),
+        "LOG_TO_CONSOLE": "false",
+        "PYTHONPATH": os.pathsep.join([BENCH_DIR, os.path.join(BENCH_DIR, "..")]),
+    }
+
+
+def run_size(count, args, home):
+    chain = FakeChain(block_time=args.block_time, out_of_gas_rate=args.oog_rate, validators=args.validators)
+    node = FakeNode(chain, latency=args.latency, error_rate=args.error_rate)
+    url = node.start()
+    try:
+        with tempfile.TemporaryDirectory(prefix="cosm-bench-") as workdir:
+            env = _prepare(workdir, home, count)
+            child = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", str(count), "--node", url,
+                 "--block-time", str(args.block_time), "--", *args.script_args],
+                cwd=workdir, env=env, capture_output=True, text=True,
+            )
+            if child.returncode != 0:
+                raise RuntimeError(f"{count} кошельков: прогон упал\n{child.stderr[-4000:]}")
+            result = json.loads(child.stdout.strip().splitlines()[-1])
+            try:
+                with open(env["FAKE_GAIAD_LOG"], encoding="utf-8") as f:
+                    calls = f.read().splitlines()
+            except OSError:
+                calls = []
+    finally:
+        node.stop()
+    result["subprocesses"] = len(calls)
+    result["subprocess_kinds"] = {kind: calls.count(kind) for kind in sorted(set(calls))}
+    result["node_requests"] = node.requests
+    result["errors_injected"] = node.errors_injected
+    return result
+
+
+def child_main(args):
+    """Прогон script.main() в этом процессе; последняя строка stdout - JSON с результатом"""
+    from dataclasses import replace
+
+    import config
+    import script
+
+    # NUM_WALLETS в боевой конфигурации ограничен MAX_WALLETS; script.main() проверяет настройки заново
+    config.MAX_WALLETS = max(config.MAX_WALLETS, args.child)
+    config.set_settings(replace(config.get_settings(), rpc_nodes=(args.node,), rest_nodes={}, num_wallets=args.child))
+    script.configure_waits(sleep=lambda seconds: None, block_time=args.block_time)
+
+    real_stdout = sys.stdout
+    started = time.perf_counter()
+    with open(os.devnull, "w", encoding="utf-8") as devnull:
+        sys.stdout = devnull    # Вывод script.py не должен влиять на замер
+        try:
+            code = script.main(args.script_args)
+        finally:
+            sys.stdout = real_stdout
+    wall_time = time.perf_counter() - started
+    if code:
+        # Пустой замер не должен выглядеть как результат
+        print(f"script.main() вернул {code}", file=sys.stderr)
+        sys.exit(code)
+
+    client = script.get_rpc_client()
+    run_stats = script.current_chain().run_stats
+    histograms = script.get_metrics().snapshot()["histograms"]
+    print(json.dumps({
+        "wallets": args.child,
+        "wall_time": round(wall_time, 3),
+        "rpc_requests": client.stats["requests"],
+        "rpc_per_wallet": round(client.stats["requests"] / args.child, 2),
+        "transactions": sum(run_stats["transactions"].values()),
+        "out_of_gas": sum(run_stats["out_of_gas"].values()),
+        "read_cache_hit_rate": script.get_read_cache().hit_rate(),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        # Суммарное время по стадиям (сек) - куда уходит проход
+        "stages": {name: round(sum(h["sum"] for h in series.values()), 2) for name, series in histograms.items()},
+    }))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк прохода main() на локальном узле")
+    parser.add_argument("sizes", nargs="*", type=int, default=list(DEFAULT_SIZES),
+                        help="Число синтетических кошельков (по умолчанию 119 500 5000)")
+    parser.add_argument("--block-time", type=float, default=0.05, help="Время блока узла (сек)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Средняя задержка ответа узла (сек)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Доля запросов с ответом HTTP 503")
+    parser.add_argument("--oog-rate", type=float, default=0.0, help="Доля транзакций с out of gas")
+    parser.add_argument("--validators", type=int, default=2, help="Валидаторов на кошелёк")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--node", help=argparse.SUPPRESS)
+    argv = list(sys.argv[1:] if argv is None else argv)
+    split = argv.index("--") if "--" in argv else len(argv)
+    args = parser.parse_args(argv[:split])
+    args.script_args = argv[split + 1:]
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        child_main(args)
+        return
+
+    with tempfile.TemporaryDirectory(prefix="cosm-bench-home-") as home:
+        started = time.perf_counter()
+        write_keyring(home, max(args.sizes))
+        print(f"keyring: {max(args.sizes)} ключей за {time.perf_counter() - started:.1f} сек")
+        print(f"узел: блок {args.block_time} сек, задержка {args.latency} сек, ошибки {args.error_rate:.0%}, "
+              f"out of gas {args.oog_rate:.0%}; script.py {' '.join(args.script_args) or '(по умолчанию)'}")
+        print(f"{'кошельков':>10}{'время, с':>10}{'RPC/кош.':>10}{'подпроц.':>10}{'tx':>7}{'oog':>5}{'RSS, МБ':>9}")
+        for count in args.sizes:
+            r = run_size(count, args, home)
+            print(f"{r['wallets']:>10}{r['wall_time']:>10.2f}{r['rpc_per_wallet']:>10.2f}{r['subprocesses']:>10}"
+                  f"{r['transactions']:>7}{r['out_of_gas']:>5}{r['peak_rss_mb']:>9.1f}")
+            print(f"{'':>10}gaiad: {r['subprocess_kinds'] or '-'}, запросов к узлу: {r['node_requests']}, "
+                  f"внедрено ошибок: {r['errors_injected']}, попаданий в кеш чтений: {r['read_cache_hit_rate']:.0%}")
+            print(f"{'':>10}стадии, с: {r['stages']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env -S python3 -S
+# fake_gaiad.py - Подмена gaiad для бенчмарков: bench_pipeline.py кладёт её в PATH под именем gaiad
+#
+# Ключи кошельков детерминированы (приватный ключ = sha256(имя)) и заранее
+# записываются в $GAIAD_HOME/keyring-test/keys.json функцией write_keyring().
+# Каждый вызов дописывает строку в $FAKE_GAIAD_LOG - по ней считаются подпроцессы.
+
+import base64
+import hashlib
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), ".."))
+
+KEYS_FILE = os.path.join("keyring-test", "keys.json")
+DRY_RUN_GAS = 200_000
+CONTROLLER_KEY = "Controller"   # Ключ-контроллер для `script.py --authz Controller`
+
+
+def private_key(name):
+    return hashlib.sha256(name.encode("utf-8")).digest()
+
+
+def write_keyring(home, count):
+    """keys.json с адресами Wallet1..WalletN и CONTROLLER_KEY (нужен ecdsa, как для подписи в signer.py)"""
+    import ecdsa
+    from signer import pubkey_address
+
+    def entry(name):
+        key = ecdsa.SigningKey.from_string(private_key(name), curve=ecdsa.SECP256k1)
+        return {"name": name, "type": "local",
+                "address": pubkey_address(key.get_verifying_key().to_string("compressed"))}
+
+    path = os.path.join(home, KEYS_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            keys = [key for key in json.load(f) if key["name"] != CONTROLLER_KEY]
+    except (OSError, ValueError):
+        keys = []
+    for i in range(len(keys), count):
+        keys.append(entry(f"Wallet{i + 1}"))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(keys[:count] + [entry(CONTROLLER_KEY)], f)
+
+
+def _keys():
+    with open(os.path.join(os.environ["GAIAD_HOME"], KEYS_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _option(args, name, default=None):
+    return args[args.index(name) + 1] if name in args else default
+
+
+def _broadcast(node, tx_bytes):
+    import urllib.request   # Только для отправки: остальные команды запускаются быстрее
+    payload = json.dumps({"jsonrpc": "2.0", "id": 1, "method": "broadcast_tx_sync",
+                          "params": {"tx": tx_bytes}}).encode("utf-8")
+    request = urllib.request.Request(node, data=payload, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.load(response)
+
+
+def main(args):
+    log_path = os.getenv("FAKE_GAIAD_LOG")
+    if log_path:
+        with open(log_path, "a", encoding="utf-8") as f:
+            f.write(" ".join(args[:2]) + "\n")
+
+    if args[:2] == ["keys", "list"]:
+        print(json.dumps(_keys()))
+    elif args[:2] == ["keys", "show"]:
+        address = next((k["address"] for k in _keys() if k["name"] == args[2]), None)
+        if address is None:
+            print(f"Error: {args[2]}.info: key not found", file=sys.stderr)
+            return 1
+        print(address)
+    elif args[:2] == ["keys", "export"]:
+        print(private_key(args[2]).hex())
+    elif args[:1] == ["tx"] and "--dry-run" in args:
+        print(f"gas estimate: {DRY_RUN_GAS}", file=sys.stderr)
+    elif args[:1] == ["tx"] and "--generate-only" in args:
+        if args[1:3] == ["distribution", "withdraw-all-rewards"] and ("--offline" in args or "--node" not in args):
+            # Как gaiad: валидаторы делегатора запрашиваются у узла
+            print("Error: cannot generate tx in offline mode", file=sys.stderr)
+            return 1
+        print(json.dumps({"body": {"messages": args[1:3]}, "auth_info": {}, "signatures": []}))
+    elif args[:2] == ["tx", "sign"]:
+        with open(args[2], encoding="utf-8") as f:
+            tx = json.load(f)
+        tx["signatures"] = [base64.b64encode(os.urandom(64)).decode()]
+        print(json.dumps(tx))
+    elif args[:2] == ["tx", "encode"]:
+        # Не TxRaw: fake_node только регистрирует такие байты, без изменения балансов
+        print(base64.b64encode(b"fake-gaiad-tx:" + os.urandom(24)).decode())
+    elif args[:1] == ["tx"]:
+        tx_bytes = base64.b64encode(b"fake-gaiad-tx:" + os.urandom(24)).decode()
+        response = _broadcast(_option(args, "--node"), tx_bytes)
+        result = response.get("result") or {}
+        print(json.dumps({"txhash": result.get("hash", ""), "code": result.get("code", 0),
+                          "raw_log": result.get("log", "")}))
+    else:
+        print(f"fake gaiad: неподдерживаемая команда {' '.join(args)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
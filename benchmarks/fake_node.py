@@ -0,0 +1,416 @@
+# fake_node.py - Локальный узел CometBFT RPC + Cosmos REST для бенчмарков без выхода в сеть
+#
+# Один HTTP сервер отвечает и на RPC (/status, /tx, /block, /block_results, JSON-RPC
+# broadcast_tx_sync), и на REST (/cosmos/...), поэтому REST URL узла совпадает с RPC.
+
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CHAIN_ID = "cosmoshub-4"
+START_HEIGHT = 20_000_000
+ACCOUNT_NUMBER = 7
+OUT_OF_GAS_CODE = 11
+UNAUTHORIZED_CODE = 4
+BLOCK_MAX_GAS = 75_000_000
+
+MSG_SEND = "/cosmos.bank.v1beta1.MsgSend"
+MSG_WITHDRAW = "/cosmos.distribution.v1beta1.MsgWithdrawDelegatorReward"
+MSG_GRANT = "/cosmos.authz.v1beta1.MsgGrant"
+MSG_EXEC = "/cosmos.authz.v1beta1.MsgExec"
+GENERIC_AUTHORIZATION = "/cosmos.authz.v1beta1.GenericAuthorization"
+WITHDRAW_MSG_GAS = 60_000   # Газ каждого снятия сверх gas_used, как в block_results
+SAMPLE_TXS = (b"sample-withdraw", b"sample-send")   # Байты типичных транзакций блока (не разбираются)
+
+
+# ----------------------------------------------------------------------
+# Разбор TxRaw из signer.py (только нужные поля protobuf)
+# ----------------------------------------------------------------------
+
+def _read_varint(data, i):
+    value = shift = 0
+    while True:
+        byte = data[i]
+        i += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, i
+
+
+def _fields(data):
+    """[(номер поля, bytes или int)] верхнего уровня сообщения"""
+    fields, i = [], 0
+    while i < len(data):
+        key, i = _read_varint(data, i)
+        number, wire_type = key >> 3, key & 7
+        if wire_type == 2:
+            length, i = _read_varint(data, i)
+            fields.append((number, data[i:i + length]))
+            i += length
+        elif wire_type == 0:
+            value, i = _read_varint(data, i)
+            fields.append((number, value))
+        else:
+            raise ValueError(f"wire type {wire_type}")
+    return fields
+
+
+def _first(fields, number, default=b""):
+    return next((value for n, value in fields if n == number), default)
+
+
+def _decode_any(data):
+    """(type_url, {поле: значение}); у MsgExec в поле "msgs" - вложенные сообщения"""
+    msg = _fields(data)
+    type_url, value = _first(msg, 1).decode(), _fields(_first(msg, 2))
+    fields = dict(value)
+    if type_url == MSG_EXEC:
+        fields["msgs"] = [_decode_any(inner) for number, inner in value if number == 2]
+    return type_url, fields
+
+
+def decode_tx(tx_raw):
+    """Сообщения и комиссия TxRaw: ([(type_url, {поле: значение})], fee). None, если это не TxRaw"""
+    try:
+        tx = _fields(tx_raw)
+        body, auth_info = _fields(_first(tx, 1)), _fields(_first(tx, 2))
+        msgs = [_decode_any(msg) for number, msg in body if number == 1]
+        fee_coin = _fields(_first(_fields(_first(auth_info, 2)), 1))
+        fee = int(_first(fee_coin, 2, b"0") or 0)
+    except (ValueError, IndexError, UnicodeDecodeError):
+        return None
+    return msgs, fee
+
+
+# ----------------------------------------------------------------------
+# Состояние сети
+# ----------------------------------------------------------------------
+
+class FakeChain:
+    """Балансы, награды и транзакции синтетических кошельков.
+
+    Высота растёт раз в block_time секунд; транзакция видна в /tx со следующего
+    блока после отправки. Эффекты подписанных внутри процесса транзакций
+    (снятие наград, отправка, комиссия) применяются к балансам; байты от
+    fake_gaiad не разбираются и только регистрируются.
+    """
+
+    def __init__(self, block_time=0.05, balance=2_000_000, rewards=800_000, validators=2,
+                 gas_used=180_000, out_of_gas_rate=0.0, seed=1):
+        self.block_time = block_time
+        self.initial_balance = balance
+        self.initial_rewards = rewards
+        self.validators = [f"cosmosvaloper1{'q' * 37}{i:01d}" for i in range(validators)]
+        self.gas_used = gas_used
+        self.out_of_gas_rate = out_of_gas_rate
+        self.started = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._balances = {}
+        self._rewards = {}
+        self._txs = {}          # хеш -> (высота включения, код, лог, события, gas_used)
+        self._blocks = {}       # высота -> [(байты транзакции base64, хеш)]
+        self._grants = {}       # (granter, grantee) -> срок разрешения (unix time)
+
+    def height(self):
+        return START_HEIGHT + int((time.monotonic() - self.started) / self.block_time)
+
+    def balance(self, address):
+        with self._lock:
+            return self._balances.get(address, self.initial_balance)
+
+    def rewards(self, address):
+        with self._lock:
+            return self._rewards.get(address, self.initial_rewards)
+
+    def grant_expiration(self, granter, grantee):
+        with self._lock:
+            return self._grants.get((granter, grantee))
+
+    def simulate(self, tx_bytes):
+        """gas_used симуляции: базовый газ и WITHDRAW_MSG_GAS на каждое снятие, в том числе внутри MsgExec"""
+        decoded = decode_tx(base64.b64decode(tx_bytes))
+        msgs = decoded[0] if decoded else []
+        inner = [m for type_url, fields in msgs if type_url == MSG_EXEC for m in fields["msgs"]]
+        withdrawals = sum(1 for type_url, _ in msgs + inner if type_url == MSG_WITHDRAW)
+        return self.gas_used + WITHDRAW_MSG_GAS * withdrawals
+
+    def broadcast(self, tx_bytes):
+        """(код CheckTx, лог, хеш). Повторная отправка - "tx already exists in cache" """
+        raw = base64.b64decode(tx_bytes)
+        tx_hash = hashlib.sha256(raw).hexdigest().upper()
+        with self._lock:
+            if tx_hash in self._txs:
+                return None, "tx already exists in cache", tx_hash
+            out_of_gas = self._random.random() < self.out_of_gas_rate
+            decoded = decode_tx(raw)
+            unauthorized = decoded and self._unauthorized(decoded[0])
+            events = self._apply(decoded, out_of_gas or unauthorized) if decoded else []
+            if out_of_gas:
+                code, log = OUT_OF_GAS_CODE, "out of gas in location: WritePerAddress; gasWanted: 1, gasUsed: 2: out of gas"
+            elif unauthorized:
+                code, log = UNAUTHORIZED_CODE, f"failed to execute message; message index: 0: {unauthorized}: unauthorized"
+            else:
+                code, log = 0, ""
+            height = self.height() + 1
+            gas_used = self.simulate(tx_bytes) if decoded else self.gas_used
+            self._txs[tx_hash] = (height, code, log, events, gas_used)
+            self._blocks.setdefault(height, []).append((tx_bytes, tx_hash))
+        return 0, "", tx_hash
+
+    def _unauthorized(self, msgs):
+        """Ошибка MsgExec без разрешения (строка) или None"""
+        for type_url, fields in msgs:
+            if type_url != MSG_EXEC:
+                continue
+            grantee = fields.get(1, b"").decode()
+            for _, inner in fields["msgs"]:
+                granter = inner.get(1, b"").decode()
+                if self._grants.get((granter, grantee), 0) < time.time():
+                    return f"authorization not found for {granter}"
+        return None
+
+    def _apply(self, decoded, failed):
+        msgs, fee = decoded
+        events = []
+        payer = None
+        withdrawn_from = set()
+        for type_url, fields in msgs:
+            sender = fields.get(1, b"").decode()
+            payer = payer or sender
+            if failed:
+                continue
+            inner = fields["msgs"] if type_url == MSG_EXEC else [(type_url, fields)]
+            for type_url, fields in inner:
+                events += self._apply_msg(type_url, fields, withdrawn_from)
+        for address in withdrawn_from:
+            self._rewards[address] = 0
+        if payer:
+            self._balances[payer] = self._balances.get(payer, self.initial_balance) - fee
+            events.append({"type": "tx", "attributes": [
+                {"key": "fee", "value": f"{fee}uatom"},
+                {"key": "fee_payer", "value": payer},
+            ]})
+        return events
+
+    def _apply_msg(self, type_url, fields, withdrawn_from):
+        sender = fields.get(1, b"").decode()
+        events = []
+        if type_url == MSG_WITHDRAW:
+            share = self._rewards.get(sender, self.initial_rewards) // max(len(self.validators), 1)
+            self._balances[sender] = self._balances.get(sender, self.initial_balance) + share
+            withdrawn_from.add(sender)
+            events.append({"type": "withdraw_rewards", "attributes": [
+                {"key": "amount", "value": f"{share}uatom"},
+                {"key": "validator", "value": fields.get(2, b"").decode()},
+                {"key": "delegator", "value": sender},
+            ]})
+            events.append({"type": "message", "attributes": [{"key": "action", "value": MSG_WITHDRAW}]})
+        elif type_url == MSG_SEND:
+            coin = dict(_fields(fields.get(3, b"")))
+            amount = int(coin.get(2, b"0"))
+            self._balances[sender] = self._balances.get(sender, self.initial_balance) - amount
+            events.append({"type": "transfer", "attributes": [
+                {"key": "recipient", "value": fields.get(2, b"").decode()},
+                {"key": "sender", "value": sender},
+                {"key": "amount", "value": f"{amount}{coin.get(1, b'uatom').decode()}"},
+            ]})
+            events.append({"type": "message", "attributes": [{"key": "action", "value": MSG_SEND}]})
+        elif type_url == MSG_GRANT:
+            grant = dict(_fields(fields.get(3, b"")))
+            expiration = dict(_fields(grant.get(2, b""))).get(1, 0)
+            self._grants[(sender, fields.get(2, b"").decode())] = expiration
+            events.append({"type": "message", "attributes": [{"key": "action", "value": MSG_GRANT}]})
+        return events
+
+    def tx(self, tx_hash):
+        with self._lock:
+            entry = self._txs.get(tx_hash.upper())
+        if entry is None or entry[0] > self.height():
+            return None
+        height, code, log, events, gas_used = entry
+        return {"hash": tx_hash, "height": str(height),
+                "tx_result": {"code": code, "log": log, "gas_used": str(gas_used), "events": events}}
+
+    def _block_txs(self, height):
+        if height > self.height():
+            return []
+        with self._lock:
+            return list(self._blocks.get(height, ()))
+
+    def block(self, height):
+        """Заголовок и транзакции блока: наши, затем типичные из block_results"""
+        at = datetime.fromtimestamp(time.time() - (self.height() - height) * self.block_time, timezone.utc)
+        txs = [tx for tx, _ in self._block_txs(height)] + [base64.b64encode(tx).decode() for tx in SAMPLE_TXS]
+        return {"block_id": {}, "block": {"header": {"chain_id": CHAIN_ID, "height": str(height),
+                                                     "time": at.strftime("%Y-%m-%dT%H:%M:%S.%fZ")},
+                                          "data": {"txs": txs}}}
+
+    def block_results(self, height):
+        """Наши транзакции блока и по одной типичной транзакции снятия и отправки - материал для GasOracle"""
+        own = []
+        for _, tx_hash in self._block_txs(height):
+            _, code, log, events, gas_used = self._txs[tx_hash]
+            own.append({"code": code, "log": log, "gas_used": str(gas_used), "events": events})
+        withdraw_events = [{"type": "message", "attributes": [{"key": "action", "value": MSG_WITHDRAW}]}]
+        withdraw_events += [{"type": "withdraw_rewards", "attributes": []} for _ in self.validators]
+        send_events = [{"type": "message", "attributes": [{"key": "action", "value": MSG_SEND}]}]
+        return {"height": str(height), "txs_results": own + [
+            {"code": 0, "gas_used": str(self.gas_used + 60_000 * len(self.validators)), "events": withdraw_events},
+            {"code": 0, "gas_used": str(self.gas_used // 2), "events": send_events},
+        ]}
+
+
+# ----------------------------------------------------------------------
+# HTTP
+# ----------------------------------------------------------------------
+
+class FakeNode:
+    """HTTP сервер поверх FakeChain с задержкой ответа и внедрением ошибок.
+
+    latency - средняя задержка ответа (сек, равномерно 0.5x..1.5x),
+    error_rate - доля запросов, на которые узел отвечает ошибкой error_status
+    (503 или 429 с заголовком Retry-After: retry_after), fail_next - число
+    следующих запросов, которые получат ту же ошибку независимо от error_rate.
+    """
+
+    def __init__(self, chain=None, latency=0.0, error_rate=0.0, seed=1, error_status=503, retry_after=None):
+        self.chain = chain or FakeChain()
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.fail_next = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors_injected = 0
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self, port=0):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, как у настоящих узлов за nginx
+            disable_nagle_algorithm = True  # Иначе заголовки и тело ждут delayed ACK (~40 мс)
+
+            def do_GET(self):
+                node._handle(self, "GET")
+
+            def do_POST(self):
+                node._handle(self, "POST")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="fake-node", daemon=True).start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _handle(self, request, method):
+        body = None
+        if method == "POST":
+            length = int(request.headers.get("Content-Length") or 0)
+            body = json.loads(request.rfile.read(length) or b"{}")
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate or self.fail_next > 0
+            self.fail_next = max(self.fail_next - 1, 0)
+            delay = self.latency * self._random.uniform(0.5, 1.5) if self.latency else 0
+            if fail:
+                self.errors_injected += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+            return _send(request, self.error_status, {"error": "injected"}, headers)
+        url = urlparse(request.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        status, payload = self._route(method, url.path, query, body)
+        _send(request, status, payload)
+
+    def _route(self, method, path, query, body):
+        chain = self.chain
+        if method == "POST":
+            if path.endswith("/cosmos/tx/v1beta1/simulate"):
+                return 200, {"gas_info": {"gas_wanted": "0", "gas_used": str(chain.simulate(body["tx_bytes"]))}}
+            code, log, tx_hash = chain.broadcast(body["params"]["tx"])
+            if code is None:
+                return 200, {"jsonrpc": "2.0", "id": body.get("id"),
+                             "error": {"code": -32603, "message": "Internal error", "data": log}}
+            return 200, {"jsonrpc": "2.0", "id": body.get("id"),
+                         "result": {"code": code, "log": log, "hash": tx_hash}}
+
+        if path == "/status":
+            return 200, {"result": {"node_info": {"network": CHAIN_ID},
+                                    "sync_info": {"latest_block_height": str(chain.height())}}}
+        if path == "/tx":
+            tx_hash = query.get("hash", "").removeprefix("0x")
+            result = chain.tx(tx_hash)
+            if result is None:
+                return 500, {"jsonrpc": "2.0", "id": -1,
+                             "error": {"code": -32603, "message": "Internal error",
+                                       "data": f"tx ({tx_hash}) not found"}}
+            return 200, {"jsonrpc": "2.0", "id": -1, "result": result}
+        if path == "/consensus_params":
+            return 200, {"jsonrpc": "2.0", "id": -1, "result": {
+                "block_height": str(chain.height()),
+                "consensus_params": {"block": {"max_bytes": "22020096", "max_gas": str(BLOCK_MAX_GAS)}}}}
+        if path == "/cosmos/authz/v1beta1/grants":
+            expiration = chain.grant_expiration(query.get("granter"), query.get("grantee"))
+            if expiration is None:
+                # Как в Cosmos SDK до 0.50: отсутствие разрешения - NotFound
+                return 404, {"code": 5, "message": "authorization not found", "details": []}
+            expires = datetime.fromtimestamp(expiration, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+            return 200, {"grants": [{"authorization": {"@type": GENERIC_AUTHORIZATION, "msg": MSG_WITHDRAW},
+                                     "expiration": expires}],
+                         "pagination": {"next_key": None, "total": "1"}}
+        if path == "/block":
+            return 200, {"jsonrpc": "2.0", "id": -1, "result": chain.block(int(query.get("height", 0)))}
+        if path == "/block_results":
+            return 200, {"jsonrpc": "2.0", "id": -1, "result": chain.block_results(int(query.get("height", 0)))}
+
+        parts = path.strip("/").split("/")
+        address = parts[4] if len(parts) > 4 else ""
+        if path.startswith("/cosmos/bank/v1beta1/balances/"):
+            return 200, {"balances": [{"denom": "uatom", "amount": str(chain.balance(address))}],
+                         "pagination": {"next_key": None, "total": "1"}}
+        if path.startswith("/cosmos/auth/v1beta1/accounts/"):
+            return 200, {"account": {"@type": "/cosmos.auth.v1beta1.BaseAccount", "address": address,
+                                     "account_number": str(ACCOUNT_NUMBER), "sequence": "0"}}
+        if path.startswith("/cosmos/distribution/v1beta1/delegators/") and path.endswith("/rewards"):
+            share = chain.rewards(address) / max(len(chain.validators), 1)
+            coins = [{"denom": "uatom", "amount": f"{share:.6f}"}] if share else []
+            return 200, {"rewards": [{"validator_address": v, "reward": coins} for v in chain.validators],
+                         "total": [{"denom": "uatom", "amount": f"{chain.rewards(address):.6f}"}]}
+        if path.startswith("/cosmos/distribution/v1beta1/delegators/") and path.endswith("/validators"):
+            return 200, {"validators": chain.validators}
+        return 404, {"code": 5, "message": f"{path} not found", "details": []}
+
+
+def _send(request, status, payload, headers=None):
+    data = json.dumps(payload).encode("utf-8")
+    request.send_response(status)
+    request.send_header("Content-Type", "application/json")
+    for name, value in (headers or {}).items():
+        request.send_header(name, value)
+    request.send_header("Content-Length", str(len(data)))
+    request.end_headers()
+    request.wfile.write(data)
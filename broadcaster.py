@@ -0,0 +1,217 @@
+# broadcaster.py - Офлайн-подпись через gaiad и параллельная отправка на несколько узлов
+
+import base64
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from metrics import get_metrics
+from rpc_client import RPCError
+
+BROADCAST_FANOUT = 3        # На сколько лучших узлов отправлять одну транзакцию
+SIGN_TIMEOUT = 60           # Таймаут одного вызова gaiad (сек)
+
+TX_IN_CACHE_CODE = 19       # sdkerrors.ErrTxInMempoolCache
+WRONG_SEQUENCE_CODE = 32    # sdkerrors.ErrWrongSequence
+_IN_CACHE_MARKERS = ("tx already exists in cache", "tx already in mempool")
+
+
+class SigningError(Exception):
+    """Не удалось собрать или подписать транзакцию"""
+
+
+def tx_hash(tx_bytes):
+    """Хеш транзакции как в Tendermint: SHA256 от байт, HEX в верхнем регистре"""
+    return hashlib.sha256(base64.b64decode(tx_bytes)).hexdigest().upper()
+
+
+def is_in_cache(code=None, log=""):
+    """Узел уже видел эту транзакцию - для нас это успешная отправка"""
+    if code == TX_IN_CACHE_CODE:
+        return True
+    log = (log or "").lower()
+    return any(marker in log for marker in _IN_CACHE_MARKERS)
+
+
+class BroadcastResult:
+    """Итог отправки: принята ли транзакция и каким узлом"""
+
+    def __init__(self, tx_hash, accepted, code=None, log="", node=None, latency=None):
+        self.tx_hash = tx_hash
+        self.accepted = accepted
+        self.code = code
+        self.log = log
+        self.node = node
+        self.latency = latency
+
+
+class Broadcaster:
+    """Подписывает транзакцию один раз и рассылает одни и те же байты на несколько узлов.
+
+    Подпись делает Signer внутри процесса, а без него - gaiad:
+    `gaiad tx ... --generate-only --node`, `gaiad tx sign --offline` с
+    account_number/sequence из REST и `gaiad tx encode`. Байты уходят через
+    broadcast_tx_sync на fanout лучших узлов параллельно; первый ответ CheckTx
+    с кодом 0 (или "already in cache") считается успехом, остальные не ждём.
+    """
+
+    def __init__(self, client, fanout=BROADCAST_FANOUT, gaiad_bin="gaiad", timeout=SIGN_TIMEOUT, signer=None):
+        self.client = client
+        self.signer = signer
+        self.fanout = fanout
+        self.gaiad_bin = gaiad_bin
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max(fanout * 4, 4), thread_name_prefix="broadcast")
+        self._lock = threading.Lock()
+        self.stats = {"signed": 0, "signed_in_process": 0, "signer_fallbacks": 0,
+                      "accepted": 0, "in_cache": 0, "rejected": 0, "node_errors": 0}
+
+    # ------------------------------------------------------------------
+    # Подпись
+    # ------------------------------------------------------------------
+
+    def _gaiad(self, args):
+        try:
+            result = subprocess.run([self.gaiad_bin, *args], capture_output=True, text=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise SigningError(f"gaiad {args[0]} {args[1]}: {e}") from e
+        if result.returncode != 0:
+            raise SigningError(f"gaiad {' '.join(args[:2])}: {result.stderr.strip()}")
+        return result.stdout.strip()
+
+    def sign(self, tx_args, wallet_name, address, fees, gas):
+        """Подписанные байты транзакции через gaiad (base64). tx_args - аргументы после `gaiad tx`"""
+        with get_metrics().timer("sign_seconds", mode="gaiad"):
+            return self._sign_gaiad(tx_args, wallet_name, address, fees, gas)
+
+    def _sign_gaiad(self, tx_args, wallet_name, address, fees, gas):
+        chain_id = self.client.get_chain_id()
+        account_number, sequence = self.client.get_account(address)
+        # Сборка идёт с узлом: withdraw-all-rewards запрашивает валидаторов и в --offline не работает.
+        # Подпись - офлайн, account_number/sequence уже получены из REST
+        node = self.client.nodes.ranked()[0]
+        with self.client.node_slot(node):
+            unsigned = self._gaiad(["tx", *tx_args, "--from", wallet_name, "--fees", fees, "--gas", str(gas),
+                                    "--generate-only", "--chain-id", chain_id, "--node", node, "-o", "json"])
+        with tempfile.TemporaryDirectory(prefix="cosm-tx-") as tmp:
+            unsigned_path = os.path.join(tmp, "unsigned.json")
+            signed_path = os.path.join(tmp, "signed.json")
+            with open(unsigned_path, "w", encoding="utf-8") as f:
+                f.write(unsigned)
+            signed = self._gaiad(["tx", "sign", unsigned_path, "--from", wallet_name,
+                                  "--account-number", str(account_number), "--sequence", str(sequence),
+                                  "--chain-id", chain_id, "--offline", "-o", "json"])
+            with open(signed_path, "w", encoding="utf-8") as f:
+                f.write(signed)
+            tx_bytes = self._gaiad(["tx", "encode", signed_path])
+        with self._lock:
+            self.stats["signed"] += 1
+        return tx_bytes
+
+    # ------------------------------------------------------------------
+    # Отправка
+    # ------------------------------------------------------------------
+
+    def _send(self, tx_bytes, node):
+        """(узел, код CheckTx или None, лог, задержка, вид ошибки узла или None)"""
+        started = time.monotonic()
+        try:
+            result = self.client.broadcast_tx_sync(tx_bytes, node)
+        except RPCError as e:
+            if is_in_cache(log=str(e)):
+                return node, TX_IN_CACHE_CODE, str(e), time.monotonic() - started, None
+            return node, None, str(e), time.monotonic() - started, e.kind
+        return node, int(result.get("code", 0)), result.get("log", ""), time.monotonic() - started, None
+
+    def broadcast(self, tx_bytes, nodes=None):
+        """Отправляет байты на несколько узлов, возвращает BroadcastResult первого принявшего"""
+        with get_metrics().timer("broadcast_seconds") as labels:
+            result = self._broadcast(tx_bytes, nodes)
+            labels["outcome"] = "accepted" if result.accepted else "rejected"
+        return result
+
+    def _broadcast(self, tx_bytes, nodes):
+        """Рассылка с повтором, если все узлы перегружены или недоступны.
+
+        Повтор отправляет те же байты: узел, уже принявший транзакцию,
+        ответит "already in cache", поэтому повтор не создаёт второй транзакции.
+        """
+        tx_id = tx_hash(tx_bytes)
+        try:
+            return self.client.retrying(lambda: self._broadcast_once(tx_id, tx_bytes, nodes))
+        except RPCError as e:
+            with self._lock:
+                self.stats["rejected"] += 1
+            return BroadcastResult(tx_id, False, None, str(e))
+
+    def _broadcast_once(self, tx_id, tx_bytes, nodes):
+        """BroadcastResult первого принявшего узла или отказа CheckTx.
+        RPCError, если ни один узел не ответил по существу; повторяемая - только если все ошибки повторяемые"""
+        nodes = (nodes or self.client.nodes.ranked())[:self.fanout]
+        futures = [self._executor.submit(self._send, tx_bytes, node) for node in nodes]
+        rejected, error = None, None
+        for future in as_completed(futures):
+            node, code, log, latency, kind = future.result()
+            if code == 0 or is_in_cache(code, log):
+                with self._lock:
+                    self.stats["in_cache" if code else "accepted"] += 1
+                return BroadcastResult(tx_id, True, code, log, node, latency)
+            if code is None:
+                with self._lock:
+                    self.stats["node_errors"] += 1
+                # Повторяем, только если все узлы отказали из-за перегрузки или сети
+                if error is None or error.retryable:
+                    error = RPCError(f"{node}: {log}", kind)
+            else:
+                # Отказ CheckTx (баланс, sequence, газ) важнее сетевой ошибки
+                rejected = BroadcastResult(tx_id, False, code, log, node, latency)
+        if rejected is not None:
+            with self._lock:
+                self.stats["rejected"] += 1
+            return rejected
+        raise error or RPCError("нет доступных узлов")
+
+    def sign_and_broadcast(self, tx_args, msgs, wallet_name, address, fee_amount, gas, denom="uatom"):
+        """Подписывает и рассылает транзакцию.
+
+        msgs - сообщения для Signer (signer.msg_send и т.п.) или функция,
+        возвращающая их (вызывается только при подписи внутри процесса);
+        tx_args - те же сообщения аргументами `gaiad tx` для подписи через gaiad;
+        None, если у сообщений нет аналога в gaiad (составная транзакция, MsgExec).
+        """
+        if self.signer is not None:
+            try:
+                return self._sign_in_process_and_broadcast(msgs, wallet_name, address, fee_amount, gas, denom)
+            except SigningError:
+                if tx_args is None:
+                    raise
+                with self._lock:
+                    self.stats["signer_fallbacks"] += 1
+        if tx_args is None:
+            raise SigningError("Транзакция подписывается только внутри процесса (нужен ecdsa и SIGN_MODE=local)")
+        fees = f"{fee_amount}{denom}"
+        return self.broadcast(self.sign(tx_args, wallet_name, address, fees, gas))
+
+    def _sign_in_process_and_broadcast(self, msgs, wallet_name, address, fee_amount, gas, denom):
+        if callable(msgs):
+            msgs = msgs()
+        for attempt in range(2):
+            tx_raw, sequence = self.signer.sign(msgs, wallet_name, address, fee_amount, gas, denom)
+            with self._lock:
+                self.stats["signed_in_process"] += 1
+            result = self.broadcast(base64.b64encode(tx_raw).decode())
+            if result.accepted:
+                self.signer.mark_accepted(address, sequence)
+                return result
+            wrong_sequence = result.code == WRONG_SEQUENCE_CODE or "sequence mismatch" in (result.log or "")
+            if not wrong_sequence or attempt:
+                return result
+            # Локальный sequence разошёлся с сетью: синхронизируем и подписываем заново
+            get_metrics().inc("sequence_resyncs_total")
+            self.signer.resync(address, result.log)
+        return result
+
@@ -0,0 +1,117 @@
+# chains.py - Профили сетей Cosmos SDK: несколько сетей в одном процессе
+#
+# Профиль - поля Settings, которыми сеть отличается от Cosmos Hub: деном,
+# префикс адресов, RPC и REST узлы, бинарник, цена газа, пороги. Сети из
+# CHAINS получают настройки процесса (.env, аргументы CLI) с изменениями
+# своего профиля; файлы состояния сети (адреса бирж, индекс, скорость
+# наград) - с суффиксом её имени. Встроенные профили дополняются и
+# меняются файлом CHAINS_FILE: {"имя": {"поле": значение, ...}}.
+#
+# Ключи общие (Wallet1..N): адрес из keyring переводится в префикс сети,
+# поэтому сети с coin type 118 подписываются теми же ключами gaiad.
+
+import json
+import os
+from dataclasses import fields, replace
+from types import MappingProxyType
+
+from config import ConfigError, Settings
+
+BUILTIN_CHAINS = {
+    "cosmoshub": {},
+    "mantra": {
+        "denom": "uom",
+        "bech32_prefix": "mantra",
+        "chain_bin": "mantrachaind",
+        "gas_price": 0.01,
+        # Пороги в uom: комиссия снятия ~0.005 OM, остаток - запас на несколько комиссий
+        "min_rewards_to_withdraw": 10_000_000,
+        "min_send_amount": 1_000_000,
+        "min_balance_remain": 500_000,
+        "max_balance_remain": 1_000_000,
+        "rpc_nodes": ["https://mantra-rpc.publicnode.com:443"],
+        "rest_nodes": {"https://mantra-rpc.publicnode.com:443": "https://mantra-rest.publicnode.com:443"},
+    },
+}
+
+# Файлы, которые у каждой сети свои
+CHAIN_FILES = ("okx_wallets_file", "bitget_wallets_file", "binance_wallets_file", "index_file",
+               "reward_rates_file")
+
+# Пороги в денноме сети: профиль с другим денномом обязан задать их сам
+DENOM_FIELDS = ("min_rewards_to_withdraw", "min_send_amount", "min_balance_remain", "max_balance_remain")
+
+# Поля профиля: всё, кроме того, что задаёт процесс
+PROFILE_FIELDS = frozenset(f.name for f in fields(Settings)) - {"chain", "chains", "chains_file"}
+
+
+def chain_file(path, chain):
+    """Имя файла состояния сети: okx_wallets -> okx_wallets_mantra, wallet_index.db -> wallet_index_mantra.db"""
+    root, ext = os.path.splitext(path)
+    return f"{root}_{chain}{ext}"
+
+
+def load_profiles(path=None):
+    """Встроенные профили с изменениями из файла path (JSON). ConfigError, если файл не читается"""
+    profiles = {name: dict(profile) for name, profile in BUILTIN_CHAINS.items()}
+    if not path or not os.path.exists(path):
+        return profiles
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ConfigError([f"{path}: {e}"]) from e
+    if not isinstance(data, dict) or not all(isinstance(profile, dict) for profile in data.values()):
+        raise ConfigError([f"{path}: ожидается объект {{\"сеть\": {{\"поле\": значение}}}}"])
+    for name, profile in data.items():
+        profiles.setdefault(name, {}).update(profile)
+    return profiles
+
+
+def derive_settings(base, name, profile):
+    """Settings сети name: base с изменениями профиля. ValueError при ошибке в профиле"""
+    unknown = set(profile) - PROFILE_FIELDS
+    if unknown:
+        raise ValueError(f"неизвестные поля профиля: {', '.join(sorted(unknown))}")
+    overrides = {"chain": name}
+    if name != base.chain:
+        if "rpc_nodes" not in profile:
+            raise ValueError("в профиле не заданы rpc_nodes")
+        missing = [field for field in DENOM_FIELDS if field not in profile]
+        if profile.get("denom", base.denom) != base.denom and missing:
+            raise ValueError(f"деном {profile['denom']} отличается от {base.denom}, в профиле не заданы пороги: "
+                             f"{', '.join(missing)}")
+        overrides["rest_nodes"] = MappingProxyType({})
+        overrides.update((field, chain_file(getattr(base, field), name)) for field in CHAIN_FILES)
+    for key, value in profile.items():
+        if key in ("fallback_gas", "gas_increase_multiplier"):
+            value = MappingProxyType({**getattr(base, key), **value})
+        elif key == "rest_nodes":
+            value = MappingProxyType(dict(value))
+        elif key == "rpc_nodes":
+            value = tuple(value)
+        overrides[key] = value
+    return replace(base, **overrides)
+
+
+def chain_settings(base):
+    """Настройки каждой сети из base.chains (без CHAINS - только base). ConfigError при ошибках"""
+    names = list(base.chains) or [base.chain]
+    profiles = load_profiles(base.chains_file)
+    errors, result = [], []
+    if len(set(names)) != len(names):
+        errors.append(f"CHAINS: сеть указана дважды: {', '.join(names)}")
+    for name in names:
+        if name not in profiles:
+            errors.append(f"CHAINS: неизвестная сеть {name!r} (известны: {', '.join(sorted(profiles))})")
+            continue
+        try:
+            settings = derive_settings(base, name, profiles[name])
+        except (TypeError, ValueError) as e:
+            errors.append(f"{name}: {e}")
+            continue
+        errors += [f"{name}: {error}" for error in settings.validate()]
+        result.append(settings)
+    if errors:
+        raise ConfigError(errors)
+    return result
@@ -1,140 +1,405 @@
 # config.py - Конфигурация для Cosmos автоматизации
+#
+# Все параметры собираются один раз в неизменяемый объект Settings:
+# get_settings() при первом вызове читает .env и переменные окружения,
+# проверяет значения и кеширует результат. Импорт модуля ничего не читает
+# и не печатает. Старые имена (config.GAS_PRICE и т.п.) доступны как раньше.
 
 import os
-from dotenv import load_dotenv
-
-# Загружаем переменные окружения
-load_dotenv()
-
-# ============================================================================
-# ОСНОВНЫЕ ПАРАМЕТРЫ
-# ============================================================================
-
-GAS_PRICE = float(os.getenv('GAS_PRICE', 0.005))  # Цена газа в uatom
-NUM_WALLETS = int(os.getenv('NUM_WALLETS', 119))  # Количество кошельков для обработки
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field, fields, replace
+from types import MappingProxyType
 
 # ============================================================================
 # RPC УЗЛЫ
 # ============================================================================
 
-RPC_NODES = [
+DEFAULT_RPC_NODES = (
     "https://cosmos-rpc.publicnode.com:443",
-    "https://cosmos-rpc.polkachu.com:443", 
-    "https://cosmoshub-mainnet-rpc.itrocket.net"
-]
-
-# Добавляем кастомные RPC из переменных окружения
-if os.getenv('CUSTOM_RPC_1'):
-    RPC_NODES.append(os.getenv('CUSTOM_RPC_1'))
-if os.getenv('CUSTOM_RPC_2'):
-    RPC_NODES.append(os.getenv('CUSTOM_RPC_2'))
-if os.getenv('CUSTOM_RPC_3'):
-    RPC_NODES.append(os.getenv('CUSTOM_RPC_3'))
-
-# ============================================================================
-# ПОРОГИ ДЛЯ ОПЕРАЦИЙ
-# ============================================================================
-
-MIN_REWARDS_TO_WITHDRAW = int(os.getenv('MIN_REWARDS_TO_WITHDRAW', 700000))  # Минимум наград для снятия (uatom)
-MIN_SEND_AMOUNT = int(os.getenv('MIN_SEND_AMOUNT', 50000))                  # Минимум для отправки (uatom)
-
-# Остатки на кошельках
-MIN_BALANCE_REMAIN = int(os.getenv('MIN_BALANCE_REMAIN', 15000))             # Минимальный остаток (uatom)
-MAX_BALANCE_REMAIN = int(os.getenv('MAX_BALANCE_REMAIN', 25000))             # Максимальный остаток (uatom)
-
-# ============================================================================
-# ЗАДЕРЖКИ И ПОВТОРНЫЕ ПОПЫТКИ
-# ============================================================================
-
-# Задержки между операциями (секунды)
-MIN_DELAY = int(os.getenv('MIN_DELAY', 3600))                # Минимальная задержка между кошельками (1 час)
-MAX_DELAY = int(os.getenv('MAX_DELAY', 7200))                # Максимальная задержка (2 часа)
-
-# Повторные попытки
-MAX_WITHDRAW_ATTEMPTS = int(os.getenv('MAX_WITHDRAW_ATTEMPTS', 3))           # Попытки снятия наград
-MAX_SEND_ATTEMPTS = int(os.getenv('MAX_SEND_ATTEMPTS', 3))                  # Попытки отправки
-TX_CHECK_RETRIES = int(os.getenv('TX_CHECK_RETRIES', 10))                   # Проверки статуса транзакции
-TX_CHECK_WAIT = int(os.getenv('TX_CHECK_WAIT', 30))                         # Ожидание между проверками (сек)
-
-# ============================================================================
-# ФАЙЛЫ КОШЕЛЬКОВ
-# ============================================================================
-
-OKX_WALLETS_FILE = os.getenv('OKX_WALLETS_FILE', 'okx_wallets')
-BITGET_WALLETS_FILE = os.getenv('BITGET_WALLETS_FILE', 'bitget_wallets')
-BINANCE_WALLETS_FILE = os.getenv('BINANCE_WALLETS_FILE', 'binance_wallets')
-
-# Список поддерживаемых бирж
-SUPPORTED_EXCHANGES = {
-    'OKX': OKX_WALLETS_FILE,
-    'Bitget': BITGET_WALLETS_FILE,
+    "https://cosmos-rpc.polkachu.com:443",
+    "https://cosmoshub-mainnet-rpc.itrocket.net",
+)
+
+# REST (LCD) эндпоинты тех же провайдеров: {rpc_url: rest_url}
+DEFAULT_REST_NODES = {
+    "https://cosmos-rpc.publicnode.com:443": "https://cosmos-rest.publicnode.com:443",
+    "https://cosmos-rpc.polkachu.com:443": "https://cosmos-api.polkachu.com:443",
+    "https://cosmoshub-mainnet-rpc.itrocket.net": "https://cosmoshub-mainnet-api.itrocket.net",
 }
 
-# Добавляем Binance если файл существует
-if os.path.exists(BINANCE_WALLETS_FILE):
-    SUPPORTED_EXCHANGES['Binance'] = BINANCE_WALLETS_FILE
+BROADCAST_MODES = ("multi", "gaiad")
+SIGN_MODES = ("local", "gaiad")
+MAX_WALLETS = 500           # Предел NUM_WALLETS (бенчмарк поднимает его для синтетических кошельков)
+
+
+class ConfigError(ValueError):
+    """Ошибки конфигурации; errors - список всех найденных проблем"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+def _frozen(mapping):
+    return MappingProxyType(dict(mapping))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Неизменяемые настройки запуска. Изменённая копия - через configure() или dataclasses.replace()"""
+
+    # Сеть (профили сетей - chains.py)
+    chain: str = "cosmoshub"                    # Имя сети, которую описывают настройки
+    denom: str = "uatom"                        # Деном комиссий, балансов и наград
+    bech32_prefix: str = "cosmos"               # Префикс адресов сети
+    chain_bin: str = "gaiad"                    # Бинарник сети для keyring и операций через CLI
+    chain_home: str = None                      # Его домашний каталог (по умолчанию GAIAD_HOME или ~/.gaia)
+    chains: tuple = ()                          # Сети одного процесса (CHAINS); пусто - только эта
+    chains_file: str = "chains.json"            # Свои профили сетей и изменения встроенных
+
+    # Основные параметры
+    gas_price: float = 0.005                    # Цена газа в денноме сети
+    num_wallets: int = 119                      # Количество кошельков для обработки
+
+    # RPC и REST узлы, включая CUSTOM_RPC_1..3 / CUSTOM_REST_1..3
+    rpc_nodes: tuple = DEFAULT_RPC_NODES
+    rest_nodes: MappingProxyType = field(default_factory=lambda: _frozen(DEFAULT_REST_NODES))
+
+    # Пороги операций (в денноме сети)
+    min_rewards_to_withdraw: int = 700000       # Минимум наград для снятия (нижняя граница порога)
+    max_withdraw_fee_ratio: float = 0.002       # Порог снятия: комиссия не больше этой доли наград
+    min_send_amount: int = 50000                # Минимум для отправки
+    min_balance_remain: int = 15000             # Минимальный остаток
+    max_balance_remain: int = 25000             # Максимальный остаток
+
+    # Задержки и повторные попытки
+    min_delay: int = 3600                       # Пауза после кошелька с действиями: от (сек)
+    max_delay: int = 7200                       # ... до (сек)
+    max_withdraw_attempts: int = 3              # Попытки снятия наград (и составной транзакции)
+    max_send_attempts: int = 3                  # Попытки отправки
+    tx_check_retries: int = 10                  # Ожидание включения в блок:
+    tx_check_wait: int = 30                     # tx_check_retries * tx_check_wait секунд
+    block_time: float = 6.0                     # Время блока - первая проверка транзакции (сек)
+    reconcile_timeout: int = 60                 # Ожидание транзакций из журнала при продолжении (сек)
+    schedule_wallets: bool = True               # Сканировать только кошельки, для которых пришло время
+    max_recheck_interval: int = 86400           # Наибольший интервал между проверками кошелька (сек)
+
+    # Параллельность
+    workers: int = 1                            # Кошельков в обработке одновременно
+    max_inflight_tx: int = 4                    # Транзакций в ожидании подтверждения одновременно
+    node_concurrency: int = 8                   # Верхняя граница адаптивного лимита запросов к одному узлу
+    scan_workers: int = 32                      # Потоков для фазы сканирования балансов и наград
+    broadcast_mode: str = "multi"               # multi - подпись и рассылка на несколько узлов, gaiad - через один
+    sign_mode: str = "local"                    # local - подпись внутри процесса, gaiad - `gaiad tx sign`
+    combined: bool = False                      # Снятие и отправка одной транзакцией
+
+    # Пакетное снятие через authz (authz.py)
+    authz_controller: str = None                # Ключ-контроллер для MsgExec (не задан - режим выключен)
+    authz_batch_size: int = 50                  # Кошельков в одной транзакции MsgExec
+    authz_max_tx_gas: int = 10_000_000          # Лимит газа одной транзакции MsgExec
+
+    # Сеть и кеши
+    rpc_timeout: float = 15.0                   # Таймаут одного HTTP запроса (сек)
+    rpc_retries: int = 3                        # Повторов запроса, когда узлы отвечают 429/5xx/таймаутом
+    gas_estimate_ttl: int = 300                 # Время жизни оценки газа по блокам (сек)
+    metrics_port: int = 0                       # Порт /metrics (0 - не запускать)
+    index_wallets: bool = False                 # Вести локальный индекс транзакций кошельков (indexer.py)
+    index_file: str = "wallet_index.db"
+    reward_rates_file: str = ".reward_rates.json"   # Скорость наград и расписание проверок (fee_optimizer.py)
+
+    # Файлы кошельков
+    okx_wallets_file: str = "okx_wallets"
+    bitget_wallets_file: str = "bitget_wallets"
+    binance_wallets_file: str = "binance_wallets"
+
+    # Газ: запасные значения и множители при out of gas
+    fallback_gas: MappingProxyType = field(default_factory=lambda: _frozen({"withdraw": 900000, "send": 250000}))
+    gas_increase_multiplier: MappingProxyType = field(
+        default_factory=lambda: _frozen({"withdraw": 1.2, "send": 1.1}))
+
+    # Логирование
+    log_level: str = "INFO"
+    log_dir: str = "logs"
+    log_to_file: bool = True
+    log_to_console: bool = True
+    log_rotation: str = "size"                  # size - по размеру, time - в полночь
+    log_max_bytes: int = 10 * 1024 * 1024       # Размер файла для ротации по размеру
+    log_backup_count: int = 14                  # Сколько старых файлов хранить
+
+    # Режимы работы
+    debug_mode: bool = False
+    dry_run: bool = False                       # Тестовый режим без реальных транзакций
+    skip_rewards_check: bool = False
+
+    # Уведомления
+    telegram_bot_token: str = None
+    telegram_chat_id: str = None
+    discord_webhook_url: str = None
+    email_smtp_host: str = None
+    email_smtp_port: int = 587
+    email_username: str = None
+    email_password: str = None
+    email_to: str = None
+
+    # Мониторинг
+    health_check_interval: int = 300            # 5 минут
+    stats_update_interval: int = 3600           # 1 час
+    daily_report_time: str = "09:00"            # Время ежедневного отчета
+
+    @property
+    def telegram_enabled(self):
+        return bool(self.telegram_bot_token and self.telegram_chat_id)
+
+    @property
+    def discord_enabled(self):
+        return bool(self.discord_webhook_url)
+
+    @property
+    def email_enabled(self):
+        return bool(self.email_smtp_host and self.email_username and self.email_password and self.email_to)
+
+    @property
+    def tx_confirm_timeout(self):
+        return self.tx_check_retries * self.tx_check_wait
+
+    @property
+    def supported_exchanges(self):
+        """{биржа: файл адресов}; Binance - если файл существует"""
+        exchanges = {"OKX": self.okx_wallets_file, "Bitget": self.bitget_wallets_file}
+        if os.path.exists(self.binance_wallets_file):
+            exchanges["Binance"] = self.binance_wallets_file
+        return exchanges
+
+    def validate(self):
+        """Список ошибок конфигурации (пустой, если всё корректно)"""
+        errors = []
+
+        if self.num_wallets < 1 or self.num_wallets > MAX_WALLETS:
+            errors.append(f"NUM_WALLETS должно быть между 1 и {MAX_WALLETS}, получено: {self.num_wallets}")
+
+        if self.gas_price <= 0 or self.gas_price > 1:
+            errors.append(f"GAS_PRICE должно быть между 0 и 1, получено: {self.gas_price}")
+
+        if not 0 < self.max_withdraw_fee_ratio < 1:
+            errors.append(f"MAX_WITHDRAW_FEE_RATIO должно быть между 0 и 1, получено: {self.max_withdraw_fee_ratio}")
+
+        if self.min_balance_remain >= self.max_balance_remain:
+            errors.append(f"MIN_BALANCE_REMAIN ({self.min_balance_remain}) должно быть меньше "
+                          f"MAX_BALANCE_REMAIN ({self.max_balance_remain})")
+
+        if self.min_delay >= self.max_delay:
+            errors.append(f"MIN_DELAY ({self.min_delay}) должно быть меньше MAX_DELAY ({self.max_delay})")
+
+        if not self.rpc_nodes:
+            errors.append("Должен быть указан хотя бы один RPC узел")
+
+        if not self.denom:
+            errors.append("Не задан деном сети (denom)")
+        if not self.bech32_prefix or not self.bech32_prefix.isalnum() or not self.bech32_prefix.islower():
+            errors.append(f"Префикс адресов должен состоять из строчных букв и цифр, получено: {self.bech32_prefix!r}")
+
+        for name in ("max_withdraw_attempts", "max_send_attempts", "tx_check_retries", "workers",
+                     "max_inflight_tx", "node_concurrency", "scan_workers", "max_recheck_interval",
+                     "authz_batch_size", "authz_max_tx_gas"):
+            if getattr(self, name) < 1:
+                errors.append(f"{name.upper()} должно быть не меньше 1, получено: {getattr(self, name)}")
+        if self.rpc_retries < 0:
+            errors.append(f"RPC_RETRIES не может быть отрицательным, получено: {self.rpc_retries}")
+
+        if self.broadcast_mode not in BROADCAST_MODES:
+            errors.append(f"BROADCAST_MODE должно быть одним из {BROADCAST_MODES}, получено: {self.broadcast_mode}")
+        if self.sign_mode not in SIGN_MODES:
+            errors.append(f"SIGN_MODE должно быть одним из {SIGN_MODES}, получено: {self.sign_mode}")
+
+        return errors
 
-# ============================================================================
-# НАСТРОЙКИ ГАЗА
-# ============================================================================
-
-# Fallback значения газа
-FALLBACK_GAS = {
-    'withdraw': int(os.getenv('FALLBACK_WITHDRAW_GAS', 900000)),
-    'send': int(os.getenv('FALLBACK_SEND_GAS', 250000))
-}
-
-# Множители для увеличения газа при ошибках
-GAS_INCREASE_MULTIPLIER = {
-    'withdraw': float(os.getenv('WITHDRAW_GAS_MULTIPLIER', 1.2)),  # +20%
-    'send': float(os.getenv('SEND_GAS_MULTIPLIER', 1.1))          # +10%
-}
 
 # ============================================================================
-# НАСТРОЙКИ ЛОГИРОВАНИЯ
+# ЧТЕНИЕ ИЗ ОКРУЖЕНИЯ
 # ============================================================================
 
-LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
-LOG_DIR = os.getenv('LOG_DIR', 'logs')
-LOG_TO_FILE = os.getenv('LOG_TO_FILE', 'true').lower() == 'true'
-LOG_TO_CONSOLE = os.getenv('LOG_TO_CONSOLE', 'true').lower() == 'true'
+class _Env:
+    """Чтение переменных с накоплением ошибок разбора вместо исключения на первой"""
+
+    def __init__(self, environ):
+        self.environ = environ
+        self.errors = []
+
+    def get_str(self, name, default=None):
+        value = self.environ.get(name)
+        return value if value else default
+
+    def _parse(self, name, default, parse, kind):
+        value = self.environ.get(name)
+        if value is None or value == "":
+            return default
+        try:
+            return parse(value)
+        except ValueError:
+            self.errors.append(f"{name} должно быть {kind}, получено: {value!r}")
+            return default
+
+    def get_int(self, name, default):
+        return self._parse(name, default, int, "целым числом")
+
+    def get_float(self, name, default):
+        return self._parse(name, default, float, "числом")
+
+    def get_bool(self, name, default):
+        return self._parse(name, default, lambda value: value.lower() == "true", "true/false")
+
+
+def load_settings(environ=None):
+    """Settings из переменных окружения (и .env, если environ не передан). Без проверки значений"""
+    if environ is None:
+        from dotenv import load_dotenv  # Отложенный импорт: модуль config не должен тормозить запуск
+        load_dotenv()
+        environ = os.environ
+    env = _Env(environ)
+    d = Settings()
+
+    rpc_nodes = list(DEFAULT_RPC_NODES)
+    rest_nodes = dict(DEFAULT_REST_NODES)
+    for i in (1, 2, 3):
+        rpc = env.get_str(f"CUSTOM_RPC_{i}")
+        if rpc:
+            rpc_nodes.append(rpc)
+            if env.get_str(f"CUSTOM_REST_{i}"):
+                rest_nodes[rpc] = env.get_str(f"CUSTOM_REST_{i}")
+
+    settings = Settings(
+        chain_bin=env.get_str("CHAIN_BIN", d.chain_bin),
+        chain_home=env.get_str("CHAIN_HOME"),
+        chains=tuple(name.strip() for name in env.get_str("CHAINS", "").split(",") if name.strip()),
+        chains_file=env.get_str("CHAINS_FILE", d.chains_file),
+        gas_price=env.get_float("GAS_PRICE", d.gas_price),
+        num_wallets=env.get_int("NUM_WALLETS", d.num_wallets),
+        rpc_nodes=tuple(rpc_nodes),
+        rest_nodes=_frozen(rest_nodes),
+        min_rewards_to_withdraw=env.get_int("MIN_REWARDS_TO_WITHDRAW", d.min_rewards_to_withdraw),
+        max_withdraw_fee_ratio=env.get_float("MAX_WITHDRAW_FEE_RATIO", d.max_withdraw_fee_ratio),
+        min_send_amount=env.get_int("MIN_SEND_AMOUNT", d.min_send_amount),
+        min_balance_remain=env.get_int("MIN_BALANCE_REMAIN", d.min_balance_remain),
+        max_balance_remain=env.get_int("MAX_BALANCE_REMAIN", d.max_balance_remain),
+        min_delay=env.get_int("MIN_DELAY", d.min_delay),
+        max_delay=env.get_int("MAX_DELAY", d.max_delay),
+        max_withdraw_attempts=env.get_int("MAX_WITHDRAW_ATTEMPTS", d.max_withdraw_attempts),
+        max_send_attempts=env.get_int("MAX_SEND_ATTEMPTS", d.max_send_attempts),
+        tx_check_retries=env.get_int("TX_CHECK_RETRIES", d.tx_check_retries),
+        tx_check_wait=env.get_int("TX_CHECK_WAIT", d.tx_check_wait),
+        block_time=env.get_float("BLOCK_TIME", d.block_time),
+        reconcile_timeout=env.get_int("RECONCILE_TIMEOUT", d.reconcile_timeout),
+        schedule_wallets=env.get_bool("SCHEDULE_WALLETS", d.schedule_wallets),
+        max_recheck_interval=env.get_int("MAX_RECHECK_INTERVAL", d.max_recheck_interval),
+        workers=env.get_int("WORKERS", d.workers),
+        max_inflight_tx=env.get_int("MAX_INFLIGHT_TX", d.max_inflight_tx),
+        node_concurrency=env.get_int("NODE_CONCURRENCY", d.node_concurrency),
+        scan_workers=env.get_int("SCAN_WORKERS", d.scan_workers),
+        broadcast_mode=env.get_str("BROADCAST_MODE", d.broadcast_mode),
+        sign_mode=env.get_str("SIGN_MODE", d.sign_mode),
+        combined=env.get_bool("COMBINED_TX", d.combined),
+        authz_controller=env.get_str("AUTHZ_CONTROLLER"),
+        authz_batch_size=env.get_int("AUTHZ_BATCH_SIZE", d.authz_batch_size),
+        authz_max_tx_gas=env.get_int("AUTHZ_MAX_TX_GAS", d.authz_max_tx_gas),
+        rpc_timeout=env.get_float("RPC_TIMEOUT", d.rpc_timeout),
+        rpc_retries=env.get_int("RPC_RETRIES", d.rpc_retries),
+        gas_estimate_ttl=env.get_int("GAS_ESTIMATE_TTL", d.gas_estimate_ttl),
+        metrics_port=env.get_int("METRICS_PORT", d.metrics_port),
+        index_wallets=env.get_bool("INDEX_WALLETS", d.index_wallets),
+        index_file=env.get_str("INDEX_FILE", d.index_file),
+        reward_rates_file=env.get_str("REWARD_RATES_FILE", d.reward_rates_file),
+        okx_wallets_file=env.get_str("OKX_WALLETS_FILE", d.okx_wallets_file),
+        bitget_wallets_file=env.get_str("BITGET_WALLETS_FILE", d.bitget_wallets_file),
+        binance_wallets_file=env.get_str("BINANCE_WALLETS_FILE", d.binance_wallets_file),
+        fallback_gas=_frozen({
+            "withdraw": env.get_int("FALLBACK_WITHDRAW_GAS", d.fallback_gas["withdraw"]),
+            "send": env.get_int("FALLBACK_SEND_GAS", d.fallback_gas["send"]),
+        }),
+        gas_increase_multiplier=_frozen({
+            "withdraw": env.get_float("WITHDRAW_GAS_MULTIPLIER", d.gas_increase_multiplier["withdraw"]),  # +20%
+            "send": env.get_float("SEND_GAS_MULTIPLIER", d.gas_increase_multiplier["send"]),              # +10%
+        }),
+        log_level=env.get_str("LOG_LEVEL", d.log_level),
+        log_dir=env.get_str("LOG_DIR", d.log_dir),
+        log_to_file=env.get_bool("LOG_TO_FILE", d.log_to_file),
+        log_to_console=env.get_bool("LOG_TO_CONSOLE", d.log_to_console),
+        log_rotation=env.get_str("LOG_ROTATION", d.log_rotation),
+        log_max_bytes=env.get_int("LOG_MAX_BYTES", d.log_max_bytes),
+        log_backup_count=env.get_int("LOG_BACKUP_COUNT", d.log_backup_count),
+        debug_mode=env.get_bool("DEBUG_MODE", d.debug_mode),
+        dry_run=env.get_bool("DRY_RUN", d.dry_run),
+        skip_rewards_check=env.get_bool("SKIP_REWARDS_CHECK", d.skip_rewards_check),
+        telegram_bot_token=env.get_str("TELEGRAM_BOT_TOKEN"),
+        telegram_chat_id=env.get_str("TELEGRAM_CHAT_ID"),
+        discord_webhook_url=env.get_str("DISCORD_WEBHOOK_URL"),
+        email_smtp_host=env.get_str("EMAIL_SMTP_HOST"),
+        email_smtp_port=env.get_int("EMAIL_SMTP_PORT", d.email_smtp_port),
+        email_username=env.get_str("EMAIL_USERNAME"),
+        email_password=env.get_str("EMAIL_PASSWORD"),
+        email_to=env.get_str("EMAIL_TO"),
+        health_check_interval=env.get_int("HEALTH_CHECK_INTERVAL", d.health_check_interval),
+        stats_update_interval=env.get_int("STATS_UPDATE_INTERVAL", d.stats_update_interval),
+        daily_report_time=env.get_str("DAILY_REPORT_TIME", d.daily_report_time),
+    )
+    if env.errors:
+        raise ConfigError(env.errors)
+    return settings
 
-# ============================================================================
-# РЕЖИМЫ РАБОТЫ
-# ============================================================================
-
-DEBUG_MODE = os.getenv('DEBUG_MODE', 'false').lower() == 'true'
-DRY_RUN = os.getenv('DRY_RUN', 'false').lower() == 'true'                   # Тестовый режим без реальных транзакций
-SKIP_REWARDS_CHECK = os.getenv('SKIP_REWARDS_CHECK', 'false').lower() == 'true'
 
 # ============================================================================
-# УВЕДОМЛЕНИЯ
+# ГЛОБАЛЬНЫЕ НАСТРОЙКИ
 # ============================================================================
 
-# Telegram Bot
-TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
-TELEGRAM_ENABLED = bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
-
-# Discord Webhook
-DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL')
-DISCORD_ENABLED = bool(DISCORD_WEBHOOK_URL)
-
-# Email уведомления
-EMAIL_SMTP_HOST = os.getenv('EMAIL_SMTP_HOST')
-EMAIL_SMTP_PORT = int(os.getenv('EMAIL_SMTP_PORT', 587))
-EMAIL_USERNAME = os.getenv('EMAIL_USERNAME')
-EMAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
-EMAIL_TO = os.getenv('EMAIL_TO')
-EMAIL_ENABLED = bool(EMAIL_SMTP_HOST and EMAIL_USERNAME and EMAIL_PASSWORD and EMAIL_TO)
-
-# ============================================================================
-# МОНИТОРИНГ
-# ============================================================================
+_settings = None
+_settings_lock = threading.Lock()
+_local = threading.local()
+
+def get_settings():
+    """Настройки процесса: читаются и проверяются при первом обращении. ConfigError при ошибках.
+
+    Внутри use_settings() возвращает настройки, заданные для этого потока (сеть из chains.py).
+    """
+    global _settings
+    override = getattr(_local, "settings", None)
+    if override is not None:
+        return override
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                settings = load_settings()
+                errors = settings.validate()
+                if errors:
+                    raise ConfigError(errors)
+                _settings = settings
+    return _settings
+
+def configure(**overrides):
+    """Заменяет настройки процесса копией с изменёнными полями (например, из аргументов CLI)"""
+    settings = replace(get_settings(), **overrides)
+    errors = settings.validate()
+    if errors:
+        raise ConfigError(errors)
+    return set_settings(settings)
+
+def set_settings(settings):
+    """Устанавливает готовые настройки без проверки (бенчмарки, отладка)"""
+    global _settings
+    with _settings_lock:
+        _settings = settings
+    return settings
+
+
+@contextmanager
+def use_settings(settings):
+    """get_settings() в этом потоке возвращает settings (None - настройки процесса)"""
+    previous = getattr(_local, "settings", None)
+    _local.settings = settings
+    try:
+        yield settings
+    finally:
+        _local.settings = previous
 
-HEALTH_CHECK_INTERVAL = int(os.getenv('HEALTH_CHECK_INTERVAL', 300))         # 5 минут
-STATS_UPDATE_INTERVAL = int(os.getenv('STATS_UPDATE_INTERVAL', 3600))        # 1 час
-DAILY_REPORT_TIME = os.getenv('DAILY_REPORT_TIME', '09:00')                 # Время ежедневного отчета
 
 # ============================================================================
 # ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ
@@ -142,47 +407,59 @@ DAILY_REPORT_TIME = os.getenv('DAILY_REPORT_TIME', '09:00')                 # В
 
 def get_config_summary():
     """Возвращает сводку текущей конфигурации"""
+    settings = get_settings()
     return {
-        'wallets_count': NUM_WALLETS,
-        'gas_price': GAS_PRICE,
-        'min_rewards': f"{MIN_REWARDS_TO_WITHDRAW:,} uatom ({MIN_REWARDS_TO_WITHDRAW/1_000_000:.6f} ATOM)",
-        'rpc_nodes_count': len(RPC_NODES),
-        'exchanges': list(SUPPORTED_EXCHANGES.keys()),
-        'debug_mode': DEBUG_MODE,
-        'dry_run': DRY_RUN,
+        'chain': settings.chain,
+        'chains': list(settings.chains),
+        'wallets_count': settings.num_wallets,
+        'gas_price': settings.gas_price,
+        'min_rewards': f"{settings.min_rewards_to_withdraw:,} {settings.denom} "
+                       f"({settings.min_rewards_to_withdraw/1_000_000:.6f} {settings.denom[1:].upper()})",
+        'rpc_nodes_count': len(settings.rpc_nodes),
+        'exchanges': list(settings.supported_exchanges.keys()),
+        'debug_mode': settings.debug_mode,
+        'dry_run': settings.dry_run,
         'notifications': {
-            'telegram': TELEGRAM_ENABLED,
-            'discord': DISCORD_ENABLED,
-            'email': EMAIL_ENABLED
+            'telegram': settings.telegram_enabled,
+            'discord': settings.discord_enabled,
+            'email': settings.email_enabled
         }
     }
 
 def validate_config():
-    """Проверяет корректность конфигурации"""
-    errors = []
-    
-    if NUM_WALLETS < 1 or NUM_WALLETS > 500:
-        errors.append(f"NUM_WALLETS должно быть между 1 и 500, получено: {NUM_WALLETS}")
-    
-    if GAS_PRICE <= 0 or GAS_PRICE > 1:
-        errors.append(f"GAS_PRICE должно быть между 0 и 1, получено: {GAS_PRICE}")
-    
-    if MIN_BALANCE_REMAIN >= MAX_BALANCE_REMAIN:
-        errors.append(f"MIN_BALANCE_REMAIN ({MIN_BALANCE_REMAIN}) должно быть меньше MAX_BALANCE_REMAIN ({MAX_BALANCE_REMAIN})")
-    
-    if MIN_DELAY >= MAX_DELAY:
-        errors.append(f"MIN_DELAY ({MIN_DELAY}) должно быть меньше MAX_DELAY ({MAX_DELAY})")
-    
-    if not RPC_NODES:
-        errors.append("Должен быть указан хотя бы один RPC узел")
-    
-    return errors
-
-# Автоматическая валидация при импорте
-if __name__ != "__main__":
-    config_errors = validate_config()
-    if config_errors:
+    """Проверяет корректность конфигурации; возвращает список ошибок"""
+    try:
+        settings = _settings or load_settings()
+    except ConfigError as e:
+        return e.errors
+    return settings.validate()
+
+
+# Прежние константы модуля (config.GAS_PRICE, from config import *) читаются из get_settings()
+_LEGACY_NAMES = {f.name.upper(): f.name for f in fields(Settings)}
+_LEGACY_NAMES.update({
+    "TELEGRAM_ENABLED": "telegram_enabled",
+    "DISCORD_ENABLED": "discord_enabled",
+    "EMAIL_ENABLED": "email_enabled",
+    "SUPPORTED_EXCHANGES": "supported_exchanges",
+})
+
+__all__ = ["Settings", "ConfigError", "get_settings", "configure", "set_settings", "use_settings", "load_settings",
+           "get_config_summary", "validate_config", *_LEGACY_NAMES]
+
+def __getattr__(name):
+    if name in _LEGACY_NAMES:
+        return getattr(get_settings(), _LEGACY_NAMES[name])
+    raise AttributeError(f"module 'config' has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    errors = validate_config()
+    if errors:
         print("⚠️ Ошибки в конфигурации:")
-        for error in config_errors:
+        for error in errors:
             print(f"  - {error}")
         print("Исправьте ошибки перед запуском системы.")
+    else:
+        for key, value in get_config_summary().items():
+            print(f"{key}: {value}")
@@ -0,0 +1,288 @@
+# daemon.py - Режим службы: один долгоживущий процесс с расписанием кошельков по времени готовности
+#
+# Запуск (аргументы те же, что у script.py):
+#   python3 daemon.py --workers 8 --max-inflight-tx 4
+#
+# Кеши (адреса, оценки газа, блоки), соединения и состояние узлов живут
+# между проверками. Вместо пауз MIN_DELAY..MAX_DELAY между кошельками
+# каждый кошелёк ставится в очередь на время, когда награды по прогнозу
+# дойдут до порога (fee_optimizer.py), со случайным сдвигом до MIN_DELAY.
+# Всё, что готово в одно время, выполняется параллельно (до --workers).
+# SIGINT/SIGTERM: новые задания не запускаются, начатые завершаются,
+# журнал закрывается; повторный Ctrl+C прерывает сразу.
+# Сети из CHAINS (--chains) ставят задания в один общий планировщик.
+
+import heapq
+import itertools
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from colorama import Fore, Style
+
+import script
+from config import get_settings
+from journal import SKIPPED
+from metrics import get_metrics, start_http_server
+from snapshot import PortfolioSnapshot, snapshot_wallet
+
+MIN_INTERVAL = 300      # Не проверять кошелёк чаще (сек), в том числе после ошибки
+MAX_WAIT = 60           # Наибольший сон планировщика без пробуждения (сек)
+
+
+class Scheduler:
+    """Очередь заданий по времени готовности (heapq) с выполнением в пуле потоков.
+
+    Задание - функция без аргументов. Если она возвращает время (как clock()),
+    задание снова ставится в очередь на это время. Готовые задания запускаются,
+    пока заняты не все workers потоков; остальные ждут в очереди.
+    """
+
+    def __init__(self, workers, clock=time.time, retry_interval=MIN_INTERVAL):
+        self.workers = workers
+        self.clock = clock
+        self.retry_interval = retry_interval
+        self._heap = []             # (время, порядковый номер, имя, задание)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = 0
+        self._stopping = False
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self.stats = {"scheduled": 0, "started": 0, "errors": 0}
+
+    def __len__(self):
+        with self._cond:
+            return len(self._heap)
+
+    def schedule(self, at, name, job):
+        with self._cond:
+            heapq.heappush(self._heap, (at, next(self._seq), name, job))
+            self.stats["scheduled"] += 1
+            self._cond.notify()
+
+    def next_run(self):
+        """Время ближайшего задания в очереди или None"""
+        with self._cond:
+            return self._heap[0][0] if self._heap else None
+
+    def stop(self):
+        """Прекращает запуск новых заданий; run() вернётся после завершения начатых"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+
+    def _run_job(self, name, job):
+        failed = False
+        try:
+            at = job()
+        except Exception as e:
+            failed = True
+            script.out(f"{Fore.RED}❌ Задание {name}: {e}{Fore.RESET}")
+            at = self.clock() + self.retry_interval
+        with self._cond:
+            self._running -= 1
+            self.stats["errors"] += failed
+            if at is not None and not self._stopping:
+                heapq.heappush(self._heap, (at, next(self._seq), name, job))
+                self.stats["scheduled"] += 1
+            self._cond.notify_all()
+
+    def run(self):
+        """Выполняет задания до stop(), затем ждёт завершения начатых"""
+        with self._cond:
+            while not self._stopping:
+                now = self.clock()
+                while self._heap and self._heap[0][0] <= now and self._running < self.workers:
+                    _, _, name, job = heapq.heappop(self._heap)
+                    self._running += 1
+                    self.stats["started"] += 1
+                    self._pool.submit(self._run_job, name, job)
+                timeout = MAX_WAIT
+                if self._heap and self._running < self.workers:
+                    timeout = min(max(self._heap[0][0] - now, 0), MAX_WAIT)
+                self._cond.wait(timeout)
+        self._pool.shutdown(wait=True)
+
+
+class WalletDaemon:
+    """Задания службы для одной сети: проверка каждого кошелька, замер узлов и выгрузка статистики.
+
+    Создаётся в контексте сети (script.chain_scope); задания выполняются в нём же.
+    """
+
+    def __init__(self, wallet_targets, settings, scheduler=None):
+        self.wallet_targets = wallet_targets
+        self.settings = settings
+        self.chain = script.current_chain()
+        # Поток на обслуживающие задания сверх кошельков
+        self.scheduler = scheduler if scheduler is not None else Scheduler(settings.workers + 1)
+        self.rows = {}              # Последняя строка снимка по кошельку
+        self._lock = threading.Lock()
+        self.stats = {"checks": 0, "processed": 0, "actions": 0, "scan_errors": 0}
+
+    def _jitter(self):
+        """Случайный сдвиг вместо паузы между кошельками: действия не идут строго подряд"""
+        return random.uniform(0, self.settings.min_delay)
+
+    def _next_time(self, wallet_name):
+        now = time.time()
+        next_check = script.get_fee_optimizer().next_check(wallet_name)
+        if next_check is None:
+            next_check = now + MIN_INTERVAL
+        return max(next_check, now + MIN_INTERVAL) + self._jitter()
+
+    def check_wallet(self, i):
+        """Свежий снимок кошелька, обработка при необходимости. Возвращает время следующей проверки"""
+        wallet_name = f"Wallet{i+1}"
+        row = snapshot_wallet(wallet_name, script.get_wallet_address, script.get_read_cache(), script.denom())
+        with self._lock:
+            self.stats["checks"] += 1
+            if row.ok:
+                self.rows[wallet_name] = row
+            else:
+                self.stats["scan_errors"] += 1
+        if not row.ok:
+            script.out(f"{Fore.RED}Ошибка получения состояния {wallet_name}: {row.error}{Fore.RESET}")
+            return time.time() + MIN_INTERVAL
+        script.get_fee_optimizer().observe([row])
+
+        if script.needs_processing(row):
+            action_performed, _ = script._timed_process_wallet(i, len(self.wallet_targets), self.wallet_targets, row)
+            with self._lock:
+                self.stats["processed"] += 1
+                self.stats["actions"] += bool(action_performed)
+        else:
+            script.journal_record(SKIPPED, wallet_name)
+
+        at = self._next_time(wallet_name)
+        script.out(f"{Fore.BLUE}🗓️  [ {wallet_name} ] Следующая проверка через {(at - time.time()) / 60:,.0f} мин{Fore.RESET}")
+        return at
+
+    def probe_nodes(self):
+        script.advance_read_cache(script.get_rpc_client().probe_nodes())
+        return time.time() + self.settings.health_check_interval
+
+    def export_stats(self):
+        self.export()
+        return time.time() + self.settings.stats_update_interval
+
+    def snapshot(self):
+        """Последние строки снимков всех кошельков"""
+        with self._lock:
+            return PortfolioSnapshot(sorted(self.rows.values(), key=lambda row: row.wallet_name))
+
+    def export(self):
+        """Индекс, статистика и прогнозы наград: раз в STATS_UPDATE_INTERVAL и при остановке"""
+        script.get_fee_optimizer().save()
+        script.update_wallet_index()
+        script.export_run_stats(self.snapshot())
+
+    def _schedule(self, at, name, job):
+        self.scheduler.schedule(at, f"{self.chain.name}/{name}", script.in_chain(job))
+
+    def start(self, wallet_indices):
+        """Ставит в очередь все кошельки: по прогнозу FeeOptimizer или сразу, если прогноза нет"""
+        now = time.time()
+        optimizer = script.get_fee_optimizer()
+        for i in wallet_indices:
+            next_check = optimizer.next_check(f"Wallet{i+1}") or now
+            self._schedule(max(next_check, now) + self._jitter(), f"Wallet{i+1}", lambda i=i: self.check_wallet(i))
+        self._schedule(now + self.settings.health_check_interval, "probe_nodes", self.probe_nodes)
+        self._schedule(now + self.settings.stats_update_interval, "export_stats", self.export_stats)
+        next_run = self.scheduler.next_run()
+        script.out(f"{Fore.CYAN}🗓️  В расписании {len(wallet_indices)} кошельков, первая проверка через "
+                   f"{max(next_run - now, 0) / 60:,.1f} мин{Fore.RESET}")
+
+    def run(self):
+        self.scheduler.run()
+
+    def finish(self):
+        """Закрывает проход журнала, выгружает статистику и прогнозы наград сети"""
+        with script.chain_scope(self.chain):
+            journal = script.get_journal()
+            journal.finish_run()
+            self.export()
+            journal.close()
+
+
+def start_chain(scheduler):
+    """Подготовка сети потока (журнал, узлы, индекс) и её задания в общем планировщике. WalletDaemon или None"""
+    settings = get_settings()
+    wallet_targets = script.load_wallet_targets()
+    if wallet_targets is None:
+        return None
+    script.enable_concurrency(settings.max_inflight_tx)
+    script.probe_rpc_nodes()
+    script.update_wallet_index()
+
+    journal = script.get_journal()
+    resumed = journal.unfinished_run()
+    if resumed:
+        journal.resume_run(resumed[0])
+        script.reconcile_journal()
+        journal.finish_run()
+    wallet_indices = list(range(settings.num_wallets))
+    journal.start_run(wallet_indices)
+    script.preload_wallet_addresses([f"Wallet{i+1}" for i in wallet_indices])
+
+    daemon = WalletDaemon(wallet_targets, settings, scheduler)
+    daemon.start(wallet_indices)
+    return daemon
+
+
+def install_signal_handlers(scheduler):
+    """Первый SIGINT/SIGTERM - мягкая остановка, повторный SIGINT - немедленная"""
+    def handle(signum, frame):
+        script.out(f"\n{Fore.YELLOW}⏹️  Получен сигнал {signal.Signals(signum).name}: "
+                   f"завершаем начатые кошельки и останавливаемся...{Fore.RESET}")
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        scheduler.stop()
+
+    signal.signal(signal.SIGINT, handle)
+    signal.signal(signal.SIGTERM, handle)
+
+
+def main(argv=None):
+    configured = script.configure_from_args(argv)
+    if configured is None:
+        return 1
+    args, settings, chains = configured
+    if settings.dry_run:
+        script.out(f"{Fore.RED}Режим плана (DRY_RUN, --plan) запускается через script.py{Fore.RESET}")
+        return 1
+
+    script.configure_waits(pause_between_wallets=False)  # Паузы между кошельками заменяет расписание
+    if settings.metrics_port:
+        start_http_server(get_metrics(), settings.metrics_port)
+        script.out(f"{Fore.CYAN}📊 Метрики: http://127.0.0.1:{settings.metrics_port}/metrics{Fore.RESET}")
+
+    # Один планировщик на все сети; у каждой - её потоки и один на обслуживающие задания
+    workers = sum((chain.settings or settings).workers + 1 for chain in chains)
+    scheduler = Scheduler(workers)
+    daemons = [daemon for daemon in script.run_chains(chains, lambda: start_chain(scheduler)) if daemon]
+    if len(daemons) < len(chains):
+        for daemon in daemons:
+            daemon.finish()
+        return 1
+
+    install_signal_handlers(scheduler)
+    started = time.monotonic()
+    script.out(f"{Fore.GREEN}{Style.BRIGHT}🛰️  Служба запущена (сетей: {len(daemons)}, потоков: {workers}, "
+               f"транзакций в полёте: {settings.max_inflight_tx}){Style.RESET_ALL}")
+    try:
+        scheduler.run()
+    finally:
+        for daemon in daemons:
+            daemon.finish()
+        checks = sum(daemon.stats["checks"] for daemon in daemons)
+        actions = sum(daemon.stats["actions"] for daemon in daemons)
+        script.out(f"{Fore.GREEN}✅ Служба остановлена через {(time.monotonic() - started) / 3600:,.1f} ч: "
+                   f"проверок {checks}, с действиями {actions}{Fore.RESET}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
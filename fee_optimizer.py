@@ -0,0 +1,164 @@
+# fee_optimizer.py - Порог снятия наград по комиссии и расписание проверок кошельков
+
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+from planner import fee_for
+
+DEFAULT_STATE_FILE = ".reward_rates.json"
+RATE_SMOOTHING = 0.3        # Вес нового замера в скользящей средней скорости начисления
+MIN_SAMPLE_INTERVAL = 300   # Замеры чаще дают шум округления наград (сек)
+UNKNOWN_RATE_RECHECK = 3600 # Повторная проверка, пока скорость не измерена (сек)
+
+
+class FeeOptimizer:
+    """Решает, окупает ли награда комиссию снятия, и когда кошелёк проверять снова.
+
+    Порог снятия зависит от числа валидаторов: газ снятия (GasOracle)
+    растёт с каждым MsgWithdrawDelegatorReward, и награда должна быть не
+    меньше комиссия / max_fee_ratio (но не ниже min_threshold).
+
+    Скорость начисления наград (uatom/сек) измеряется по последовательным
+    снимкам и сглаживается; по ней прогнозируется время, когда награда
+    дойдёт до порога. Состояние хранится в небольшом JSON файле между
+    запусками; изменения пишутся в него вызовом save() в конце прохода.
+    """
+
+    def __init__(self, gas_oracle, gas_price, max_fee_ratio, min_threshold=0,
+                 max_recheck=86400, path=DEFAULT_STATE_FILE, clock=time.time):
+        self.gas_oracle = gas_oracle
+        self.gas_price = gas_price
+        self.max_fee_ratio = max_fee_ratio
+        self.min_threshold = min_threshold
+        self.max_recheck = max_recheck
+        self.path = Path(path)
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._wallets = None    # имя -> {rewards, at, rate, validators, next_check}
+        self._dirty = False     # Есть изменения, не записанные в файл
+        self.stats = {"observed": 0, "rates_updated": 0, "due": 0, "deferred": 0}
+
+    # ------------------------------------------------------------------
+    # Состояние
+    # ------------------------------------------------------------------
+
+    def _state(self):
+        if self._wallets is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._wallets = dict(json.load(f).get("wallets") or {})
+            except (OSError, ValueError):
+                self._wallets = {}
+        return self._wallets
+
+    def save(self):
+        """Записывает состояние в файл, если оно менялось с прошлой записи"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            data = {"wallets": self._state()}
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    # ------------------------------------------------------------------
+    # Порог и прогноз
+    # ------------------------------------------------------------------
+
+    def threshold(self, validators=1):
+        """(порог наград, комиссия снятия) в uatom для числа валидаторов"""
+        fee = fee_for(self.gas_oracle.withdraw_gas(max(validators, 1)).gas, self.gas_price)
+        return max(self.min_threshold, math.ceil(fee / self.max_fee_ratio)), fee
+
+    def _next_check(self, rewards, threshold, rate, now):
+        """Прогноз времени, когда награда дойдёт до порога (не позже max_recheck)"""
+        if rewards >= threshold:
+            return now
+        if not rate:
+            return now + min(UNKNOWN_RATE_RECHECK, self.max_recheck)
+        return now + min((threshold - rewards) / rate, self.max_recheck)
+
+    def observe(self, snapshot):
+        """Обновляет скорость начисления и время следующей проверки по строкам снимка"""
+        now = self.clock()
+        rows = [row for row in snapshot if row.ok]
+        # Газ снятия может потребовать запросов к узлам: пороги считаются до захвата блокировки
+        thresholds = {validators: self.threshold(validators)[0] for validators in {row.validators for row in rows}}
+        with self._lock:
+            wallets = self._state()
+            for row in rows:
+                self.stats["observed"] += 1
+                entry = wallets.get(row.wallet_name)
+                if entry is None or row.rewards < entry["rewards"]:
+                    # Первый замер или награды сняты: новая база, скорость сохраняется
+                    rate = entry["rate"] if entry else None
+                    entry = {"rewards": row.rewards, "at": now, "rate": rate}
+                elif now - entry["at"] >= MIN_SAMPLE_INTERVAL:
+                    measured = (row.rewards - entry["rewards"]) / (now - entry["at"])
+                    rate = entry["rate"]
+                    entry["rate"] = measured if rate is None else rate + RATE_SMOOTHING * (measured - rate)
+                    entry["rewards"], entry["at"] = row.rewards, now
+                    self.stats["rates_updated"] += 1
+                entry["validators"] = row.validators
+                entry["next_check"] = self._next_check(row.rewards, thresholds[row.validators], entry["rate"], now)
+                wallets[row.wallet_name] = entry
+            self._dirty = self._dirty or bool(rows)
+
+    def withdrawn(self, wallet_name):
+        """Награды кошелька сняты: отсчёт начисления заново от нуля"""
+        now = self.clock()
+        with self._lock:
+            entry = self._state().get(wallet_name)
+            if entry is None:
+                return
+            validators = entry["validators"]
+        threshold, _ = self.threshold(validators)
+        with self._lock:
+            entry["rewards"], entry["at"] = 0.0, now
+            entry["next_check"] = self._next_check(0.0, threshold, entry["rate"], now)
+            self._dirty = True
+
+    def recheck(self, wallet_name):
+        """Проверить кошелёк в следующем проходе (например, после неудачной отправки)"""
+        with self._lock:
+            entry = self._state().get(wallet_name)
+            if entry is not None:
+                entry["next_check"] = self.clock()
+                self._dirty = True
+
+    def due(self, wallet_names):
+        """(кошельки, которые пора проверить, время ближайшей проверки остальных или None)"""
+        now = self.clock()
+        with self._lock:
+            wallets = self._state()
+            due, upcoming = [], []
+            for name in wallet_names:
+                next_check = (wallets.get(name) or {}).get("next_check")
+                if next_check is None or next_check <= now:
+                    due.append(name)
+                else:
+                    upcoming.append(next_check)
+            self.stats["due"] += len(due)
+            self.stats["deferred"] += len(upcoming)
+        return due, min(upcoming) if upcoming else None
+
+    def next_check(self, wallet_name):
+        """Время следующей проверки кошелька (unix time) или None, если кошелёк ещё не наблюдался"""
+        with self._lock:
+            return (self._state().get(wallet_name) or {}).get("next_check")
+
+    def rate(self, wallet_name):
+        """Скорость начисления наград (uatom/сек) или None, пока не измерена"""
+        with self._lock:
+            return (self._state().get(wallet_name) or {}).get("rate")
+
+    def snapshot(self):
+        """Состояние по кошелькам для JSON статистики"""
+        with self._lock:
+            return json.loads(json.dumps(self._state()))
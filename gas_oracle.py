@@ -0,0 +1,238 @@
+# gas_oracle.py - Оценка газа по недавним блокам с кешированием по высотам
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import get_metrics
+from rpc_client import RPCError
+
+MSG_SEND = "/cosmos.bank.v1beta1.MsgSend"
+MSG_WITHDRAW = "/cosmos.distribution.v1beta1.MsgWithdrawDelegatorReward"
+
+MSG_KINDS = {
+    MSG_SEND: "send",
+    MSG_WITHDRAW: "withdraw",
+}
+
+# Запасные значения и запас сверх среднего, как в прежних calculate_*.sh
+FALLBACK_GAS = {"withdraw": 900000, "send": 250000}
+GAS_MARGIN = {"withdraw": 1.05, "send": 1.1}
+
+SAMPLE_BLOCKS = 5           # Блоков с подходящими транзакциями для усреднения
+MAX_SCAN_BLOCKS = 200       # Максимальная глубина поиска назад от последнего блока
+FETCH_BATCH = 10            # Блоков, запрашиваемых параллельно
+ESTIMATE_TTL = 300          # Время жизни оценки (сек)
+BLOCK_CACHE_SIZE = 5000     # Высот в кеше результатов блоков
+
+
+def _message_actions(events):
+    return [
+        attr.get("value")
+        for event in events or []
+        if event.get("type") == "message"
+        for attr in event.get("attributes") or []
+        if attr.get("key") == "action"
+    ]
+
+
+def parse_block_samples(block_results):
+    """Образцы газа из block_results: [(вид, число валидаторов, gas_used), ...].
+
+    Учитываются только успешные транзакции из сообщений одного вида.
+    Для снятия наград число валидаторов - количество событий withdraw_rewards.
+    """
+    samples = []
+    for tx_result in block_results.get("txs_results") or []:
+        if int(tx_result.get("code", 0)) != 0:
+            continue
+        events = tx_result.get("events") or []
+        actions = set(_message_actions(events))
+        if len(actions) != 1:
+            continue
+        kind = MSG_KINDS.get(actions.pop())
+        if kind is None:
+            continue
+        validators = 1
+        if kind == "withdraw":
+            validators = sum(1 for event in events if event.get("type") == "withdraw_rewards") or 1
+        samples.append((kind, validators, int(tx_result.get("gas_used", 0))))
+    return samples
+
+
+class GasEstimate:
+    """Оценка газа с источником: "blocks" (по блокам), "model" или "fallback" """
+
+    def __init__(self, gas, source, samples=0, computed_at=0.0):
+        self.gas = gas
+        self.source = source
+        self.samples = samples
+        self.computed_at = computed_at
+
+
+class GasOracle:
+    """Общая для всех кошельков оценка газа по последним блокам сети.
+
+    Результаты блоков кешируются по высоте (блоки неизменны), поэтому
+    пересекающиеся окна поиска не запрашиваются повторно. Оценки по видам
+    сообщений (send, withdraw с группировкой по числу валидаторов) живут ttl секунд.
+    Поиск по блокам идёт без общей блокировки: оценку одного ключа считает
+    один поток, остальные ждут его результата, другие ключи не ждут.
+    """
+
+    def __init__(self, client, sample_blocks=SAMPLE_BLOCKS, max_scan=MAX_SCAN_BLOCKS,
+                 ttl=ESTIMATE_TTL, batch=FETCH_BATCH, cache_size=BLOCK_CACHE_SIZE, clock=time.monotonic,
+                 fallback_gas=FALLBACK_GAS):
+        self.client = client
+        self.fallback_gas = fallback_gas
+        self.sample_blocks = sample_blocks
+        self.max_scan = max_scan
+        self.ttl = ttl
+        self.batch = batch
+        self.cache_size = cache_size
+        self.clock = clock
+        self._blocks = OrderedDict()    # высота -> образцы
+        self._estimates = {}            # (вид, валидаторы) -> GasEstimate
+        self._pending = {}              # (вид, валидаторы) -> Event оценки, которую считает другой поток
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=batch, thread_name_prefix="gas")
+        self.stats = {"blocks_fetched": 0, "block_cache_hits": 0, "estimates": 0, "fallbacks": 0}
+
+    # ------------------------------------------------------------------
+    # Блоки
+    # ------------------------------------------------------------------
+
+    def _fetch_block(self, height):
+        try:
+            return height, parse_block_samples(self.client.get_block_results(height))
+        except (RPCError, KeyError, ValueError, TypeError):
+            return height, None
+
+    def _block_samples(self, heights):
+        """Образцы для списка высот: из кеша или параллельным запросом"""
+        result = {}
+        missing = []
+        with self._lock:
+            for height in heights:
+                if height in self._blocks:
+                    self._blocks.move_to_end(height)
+                    result[height] = self._blocks[height]
+                    self.stats["block_cache_hits"] += 1
+                else:
+                    missing.append(height)
+        fetched = list(self._executor.map(self._fetch_block, missing))
+        with self._lock:
+            for height, samples in fetched:
+                if samples is None:
+                    continue  # Не кешируем ошибки, высота будет запрошена снова
+                self.stats["blocks_fetched"] += 1
+                self._blocks[height] = samples
+                result[height] = samples
+            while len(self._blocks) > self.cache_size:
+                self._blocks.popitem(last=False)
+        return result
+
+    def _collect(self, matches):
+        """Идёт назад от последнего блока, пока не найдёт sample_blocks блоков с подходящими образцами"""
+        latest = self.client.get_latest_height()
+        found_blocks = 0
+        collected = []
+        for top in range(latest, max(latest - self.max_scan, 0), -self.batch):
+            heights = list(range(top, max(top - self.batch, 0), -1))
+            blocks = self._block_samples(heights)
+            for height in heights:
+                block_matches = [s for s in blocks.get(height) or [] if matches(s)]
+                if block_matches:
+                    collected.extend(block_matches)
+                    found_blocks += 1
+                    if found_blocks >= self.sample_blocks:
+                        return collected
+        return collected
+
+    # ------------------------------------------------------------------
+    # Оценки
+    # ------------------------------------------------------------------
+
+    def estimate(self, kind, validators=1):
+        """GasEstimate для вида сообщения; для withdraw - с учётом числа валидаторов"""
+        # Образцы снятия всегда с validators >= 1: ключ 0 никогда не нашёл бы совпадений
+        key = (kind, max(validators, 1) if kind == "withdraw" else 1)
+        while True:
+            with self._lock:
+                cached = self._estimates.get(key)
+                if cached and self.clock() - cached.computed_at < self.ttl:
+                    return cached
+                pending = self._pending.get(key)
+                if pending is None:
+                    pending = self._pending[key] = threading.Event()
+                    break
+            pending.wait()
+        try:
+            with get_metrics().timer("gas_estimate_seconds", kind=kind) as labels:
+                estimate = self._compute(kind, key[1])
+                labels["source"] = estimate.source
+            with self._lock:
+                self._estimates[key] = estimate
+                self.stats["estimates"] += 1
+                if estimate.source == "fallback":
+                    self.stats["fallbacks"] += 1
+            if estimate.source == "fallback":
+                get_metrics().inc("gas_fallback_total", kind=kind)
+            return estimate
+        finally:
+            with self._lock:
+                del self._pending[key]
+            pending.set()
+
+    def _compute(self, kind, validators):
+        now = self.clock()
+        try:
+            samples = self._collect(lambda s: s[0] == kind and s[1] == validators)
+        except (RPCError, KeyError, ValueError):
+            samples = []
+        if samples:
+            average = sum(s[2] for s in samples) / len(samples)
+            return GasEstimate(int(round(average * GAS_MARGIN[kind])), "blocks", len(samples), now)
+        if kind == "withdraw":
+            model = self._withdraw_model(validators, now)
+            if model:
+                return model
+        return GasEstimate(self.fallback_gas[kind], "fallback", 0, now)
+
+    def _withdraw_model(self, validators, now):
+        """Линейная модель gas = a + b * валидаторы по всем закешированным снятиям"""
+        with self._lock:
+            points = [(s[1], s[2]) for samples in self._blocks.values() for s in samples if s[0] == "withdraw"]
+        if len({n for n, _ in points}) < 2:
+            return None
+        mean_n = sum(n for n, _ in points) / len(points)
+        mean_gas = sum(g for _, g in points) / len(points)
+        var = sum((n - mean_n) ** 2 for n, _ in points)
+        slope = sum((n - mean_n) * (g - mean_gas) for n, g in points) / var
+        gas = mean_gas + slope * (validators - mean_n)
+        if gas <= 0:
+            return None
+        return GasEstimate(int(round(gas * GAS_MARGIN["withdraw"])), "model", len(points), now)
+
+    def withdraw_gas(self, validators=1):
+        return self.estimate("withdraw", validators)
+
+    def send_gas(self):
+        return self.estimate("send")
+
+    def invalidate(self):
+        with self._lock:
+            self._estimates.clear()
+
+
+if __name__ == "__main__":
+    # Замена calculate_gas.sh / calculate_send_gas.sh: печатает одно число
+    from script import get_rpc_client
+
+    kind = sys.argv[1] if len(sys.argv) > 1 else "withdraw"
+    if kind not in FALLBACK_GAS:
+        print(f"Использование: python3 gas_oracle.py [{'|'.join(FALLBACK_GAS)}]", file=sys.stderr)
+        sys.exit(2)
+    print(GasOracle(get_rpc_client()).estimate(kind).gas)
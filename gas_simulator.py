@@ -0,0 +1,114 @@
+# gas_simulator.py - Точная оценка газа симуляцией конкретной транзакции кошелька
+
+import base64
+import re
+import subprocess
+import threading
+
+from broadcaster import SigningError
+from gas_oracle import GasEstimate
+from metrics import get_metrics
+from planner import fee_for
+from rpc_client import RPCError
+from signer import msg_send
+
+SIMULATION_GAS_ADJUSTMENT = 1.15    # Запас сверх результата симуляции
+SIMULATION_TIMEOUT = 60             # Таймаут вызова gaiad (сек)
+
+_GAS_ESTIMATE_RE = re.compile(r"gas estimate:\s*(\d+)")
+
+
+def parse_gas_estimate(output):
+    """Извлекает gas из вывода `gaiad tx ... --dry-run` ("gas estimate: N")"""
+    match = _GAS_ESTIMATE_RE.search(output or "")
+    return int(match.group(1)) if match else None
+
+
+class GasSimulator:
+    """Газ по симуляции реальной транзакции кошелька.
+
+    С Signer транзакция (withdraw-all-rewards по всем валидаторам кошелька
+    или bank send) подписывается внутри процесса и симулируется через REST
+    /cosmos/tx/v1beta1/simulate - без запуска процесса на каждую транзакцию.
+    Без Signer или если подписать не удалось - `gaiad tx ... --gas auto --dry-run`.
+    При ошибке симуляции используется историческая оценка GasOracle.
+    """
+
+    def __init__(self, oracle, adjustment=SIMULATION_GAS_ADJUSTMENT, gaiad_bin="gaiad",
+                 timeout=SIMULATION_TIMEOUT, signer=None, gas_price=None):
+        self.oracle = oracle
+        self.adjustment = adjustment
+        self.gaiad_bin = gaiad_bin
+        self.timeout = timeout
+        self.signer = signer
+        self.gas_price = gas_price
+        self._lock = threading.Lock()
+        self.stats = {"simulated": 0, "simulation_failed": 0, "signed_simulations": 0}
+
+    def _simulate(self, args, rpc):
+        command = [self.gaiad_bin, "tx", *args, "--gas", "auto", "--gas-adjustment", "1.0",
+                   "--dry-run", "--node", rpc, "-o", "json"]
+        try:
+            with get_metrics().timer("gas_simulation_seconds", mode="gaiad"):
+                result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        return parse_gas_estimate(result.stderr) or parse_gas_estimate(result.stdout)
+
+    def _estimate_gaiad(self, args, rpc, fallback):
+        gas = self._simulate(args, rpc)
+        with self._lock:
+            self.stats["simulated" if gas else "simulation_failed"] += 1
+        if not gas:
+            get_metrics().inc("gas_simulation_failed_total", mode="gaiad")
+            return fallback()
+        return GasEstimate(int(gas * self.adjustment), "simulation", 1)
+
+    def _estimate(self, wallet_name, address, msgs, denom, args, rpc, fallback):
+        """Симуляция подписанной внутри процесса транзакции, иначе через gaiad.
+        msgs - сообщения или функция, возвращающая их (вызывается только при подписи внутри процесса)"""
+        if self.signer is None or msgs is None:
+            return self._estimate_gaiad(args, rpc, fallback)
+        # Комиссия по исторической оценке: списание комиссии тоже расходует газ
+        fee_amount = fee_for(fallback().gas, self.gas_price) if self.gas_price else 0
+        try:
+            tx_raw, _ = self.signer.sign(msgs() if callable(msgs) else msgs, wallet_name, address,
+                                         fee_amount, 0, denom)
+        except (SigningError, RPCError):
+            return self._estimate_gaiad(args, rpc, fallback)
+        with self._lock:
+            self.stats["signed_simulations"] += 1
+        return self.signed_tx_gas(base64.b64encode(tx_raw).decode(), fallback)
+
+    def signed_tx_gas(self, tx_bytes, fallback):
+        """Газ по симуляции уже подписанной транзакции (base64) через REST, без gaiad"""
+        try:
+            with get_metrics().timer("gas_simulation_seconds", mode="rest"):
+                gas = self.oracle.client.simulate_tx(tx_bytes)
+        except RPCError:
+            gas = None
+        with self._lock:
+            self.stats["simulated" if gas else "simulation_failed"] += 1
+        if not gas:
+            get_metrics().inc("gas_simulation_failed_total", mode="rest")
+            return fallback()
+        return GasEstimate(int(gas * self.adjustment), "simulation", 1)
+
+    def withdraw_gas(self, wallet_name, validators, rpc, address=None, msgs=None, denom="uatom"):
+        """Газ для withdraw-all-rewards с учётом числа валидаторов кошелька.
+        msgs - снятия по валидаторам (или функция) для подписи внутри процесса"""
+        return self._estimate(
+            wallet_name, address, msgs, denom,
+            ["distribution", "withdraw-all-rewards", "--from", wallet_name],
+            rpc, lambda: self.oracle.withdraw_gas(max(validators, 1)),
+        )
+
+    def send_gas(self, wallet_name, from_addr, to_addr, amount, denom, rpc):
+        """Газ для bank send конкретной суммы на конкретный адрес"""
+        return self._estimate(
+            wallet_name, from_addr, [msg_send(from_addr, to_addr, amount, denom)], denom,
+            ["bank", "send", from_addr, to_addr, f"{amount}{denom}", "--from", wallet_name],
+            rpc, self.oracle.send_gas,
+        )
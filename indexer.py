@@ -0,0 +1,273 @@
+# indexer.py - Локальный индекс движений средств наших кошельков по блокам сети (SQLite)
+#
+# Индекс идёт по блокам от сохранённой высоты (checkpoint) и записывает
+# только снятия наград, переводы и комиссии, где участвует адрес из
+# множества наших кошельков, адресов бирж и ключа-контроллера. Отчёты
+# ("сколько отправлено на OKX за неделю", комиссии за день) - запросы к
+# локальной базе вместо тысяч запросов к узлам.
+#
+# Отчёт без прохода по кошелькам:
+#   python3 indexer.py --days 7
+
+import argparse
+import base64
+import hashlib
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from rpc_client import RPCError, parse_time
+from tx_confirmer import parse_wallet_events
+
+INDEX_PATH = "wallet_index.db"
+FETCH_BATCH = 20            # Блоков, запрашиваемых параллельно
+MAX_SYNC_BLOCKS = 5000      # Блоков за один вызов sync(); остальные - в следующий
+
+# Роли адресов индекса
+WALLET = "wallet"
+EXCHANGE = "exchange"
+CONTROLLER = "controller"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    height INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS addresses (
+    address TEXT PRIMARY KEY,
+    role TEXT NOT NULL,
+    label TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS txs (
+    hash TEXT PRIMARY KEY,
+    height INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    code INTEGER NOT NULL,
+    gas_used INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS movements (
+    tx_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    sender TEXT,
+    recipient TEXT,
+    amount INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS txs_time ON txs(time);
+CREATE INDEX IF NOT EXISTS movements_tx ON movements(tx_hash);
+"""
+
+
+def _tx_hash(tx_b64):
+    return hashlib.sha256(base64.b64decode(tx_b64)).hexdigest().upper()
+
+
+class WalletIndex:
+    """Инкрементальный индекс блоков: block_results каждого блока, /block - только для блоков с нашими транзакциями.
+
+    Адреса сравниваются с заранее построенным frozenset, поэтому фильтр
+    транзакции - O(1) на атрибут события. Строки пачки блоков и новый
+    checkpoint пишутся одной транзакцией SQLite: после сбоя индекс
+    продолжается с последней записанной высоты без пропусков и повторов.
+    Первая синхронизация только запоминает текущую высоту - индекс ведётся
+    с момента включения. Адреса, добавленные позже, учитываются с момента добавления.
+    """
+
+    def __init__(self, client, path=INDEX_PATH, batch=FETCH_BATCH, denom="uatom", clock=time.time):
+        self.client = client
+        self.path = path
+        self.batch = batch
+        self.denom = denom
+        self.clock = clock
+        self._addresses = frozenset()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._executor = ThreadPoolExecutor(max_workers=batch, thread_name_prefix="index")
+        self.stats = {"blocks": 0, "blocks_matched": 0, "txs": 0, "movements": 0, "errors": 0}
+
+    def _write(self, statements):
+        """[(sql, [строки])] одной транзакцией"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for sql, rows in statements:
+                    self._conn.executemany(sql, rows)
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # ------------------------------------------------------------------
+    # Адреса и высота
+    # ------------------------------------------------------------------
+
+    def set_addresses(self, addresses):
+        """Отслеживаемые адреса: {адрес: (роль, метка)}, роль - WALLET, EXCHANGE или CONTROLLER"""
+        self._addresses = frozenset(addresses)
+        self._write([
+            ("DELETE FROM addresses", [()]),
+            ("INSERT INTO addresses (address, role, label) VALUES (?, ?, ?)",
+             [(address, role, label) for address, (role, label) in addresses.items()]),
+        ])
+
+    def checkpoint(self):
+        """Последняя проиндексированная высота или None, если индекс не начат"""
+        rows = self._query("SELECT height FROM checkpoint WHERE id = 1")
+        return rows[0][0] if rows else None
+
+    def _save(self, tx_rows, movement_rows, height):
+        self._write([
+            ("INSERT OR IGNORE INTO txs (hash, height, time, code, gas_used) VALUES (?, ?, ?, ?, ?)", tx_rows),
+            ("INSERT INTO movements (tx_hash, kind, sender, recipient, amount) VALUES (?, ?, ?, ?, ?)",
+             movement_rows),
+            ("INSERT INTO checkpoint (id, height) VALUES (1, ?) "
+             "ON CONFLICT(id) DO UPDATE SET height = excluded.height", [(height,)]),
+        ])
+
+    # ------------------------------------------------------------------
+    # Блоки
+    # ------------------------------------------------------------------
+
+    def _fetch(self, height):
+        """(строки txs, строки movements) блока или None, если узел не ответил"""
+        try:
+            results = self.client.get_block_results(height).get("txs_results") or []
+            matched = []
+            for i, tx_result in enumerate(results):
+                movements = parse_wallet_events(tx_result, self._addresses, self.denom)
+                if movements:
+                    matched.append((i, tx_result, movements))
+            if not matched:
+                return [], []
+            block = self.client.get_block(height)["block"]
+        except (RPCError, KeyError, ValueError, TypeError, AttributeError):
+            return None
+        txs = (block.get("data") or {}).get("txs") or []
+        at = int(parse_time(block["header"].get("time")) or 0)
+        tx_rows, movement_rows = [], []
+        for i, tx_result, movements in matched:
+            tx_hash = _tx_hash(txs[i]) if i < len(txs) else f"{height}:{i}"
+            tx_rows.append((tx_hash, height, at, int(tx_result.get("code", 0)), int(tx_result.get("gas_used", 0))))
+            movement_rows += [(tx_hash, *movement) for movement in movements]
+        return tx_rows, movement_rows
+
+    def sync(self, max_blocks=MAX_SYNC_BLOCKS):
+        """Индексирует блоки после checkpoint до последнего (не больше max_blocks). Число пройденных блоков"""
+        latest = self.client.get_latest_height()
+        start = self.checkpoint()
+        if start is None:
+            self._save([], [], latest)
+            return 0
+        end = min(latest, start + max_blocks)
+        done = start
+        for top in range(start + 1, end + 1, self.batch):
+            heights = range(top, min(top + self.batch, end + 1))
+            tx_rows, movement_rows = [], []
+            for height, rows in zip(heights, self._executor.map(self._fetch, heights)):
+                if rows is None:
+                    self.stats["errors"] += 1
+                    break   # checkpoint двигается только по непрерывной последовательности блоков
+                tx_rows += rows[0]
+                movement_rows += rows[1]
+                done = height
+                self.stats["blocks_matched"] += bool(rows[0])
+            self._save(tx_rows, movement_rows, done)
+            self.stats["txs"] += len(tx_rows)
+            self.stats["movements"] += len(movement_rows)
+            if done < heights[-1]:
+                break
+        self.stats["blocks"] += done - start
+        return done - start
+
+    # ------------------------------------------------------------------
+    # Отчёты
+    # ------------------------------------------------------------------
+
+    def _period(self, since, until):
+        return since, until if until is not None else self.clock() + 1
+
+    def sent_to_exchanges(self, since, until=None):
+        """{биржа: uatom}, отправленные с наших кошельков на адреса бирж за период (unix time)"""
+        return dict(self._query(
+            "SELECT x.label, SUM(m.amount) FROM movements m JOIN txs t ON t.hash = m.tx_hash "
+            "JOIN addresses w ON w.address = m.sender AND w.role = ? "
+            "JOIN addresses x ON x.address = m.recipient AND x.role = ? "
+            "WHERE m.kind = 'transfer' AND t.time >= ? AND t.time < ? GROUP BY x.label ORDER BY x.label",
+            (WALLET, EXCHANGE, *self._period(since, until)),
+        ))
+
+    def withdrawn(self, since, until=None):
+        """{кошелёк: uatom} снятых наград за период"""
+        return dict(self._query(
+            "SELECT a.label, SUM(m.amount) FROM movements m JOIN txs t ON t.hash = m.tx_hash "
+            "JOIN addresses a ON a.address = m.recipient "
+            "WHERE m.kind = 'withdraw' AND t.time >= ? AND t.time < ? GROUP BY a.label ORDER BY a.label",
+            self._period(since, until),
+        ))
+
+    def fees(self, since, until=None):
+        """{плательщик: uatom} комиссий за период, включая неуспешные транзакции"""
+        return dict(self._query(
+            "SELECT a.label, SUM(m.amount) FROM movements m JOIN txs t ON t.hash = m.tx_hash "
+            "JOIN addresses a ON a.address = m.sender "
+            "WHERE m.kind = 'fee' AND t.time >= ? AND t.time < ? GROUP BY a.label ORDER BY a.label",
+            self._period(since, until),
+        ))
+
+    def summary(self, since, until=None):
+        """Итоги периода для статистики: отправки по биржам, снятия, комиссии, число транзакций"""
+        (txs, failed), = self._query(
+            "SELECT COUNT(*), COALESCE(SUM(code != 0), 0) FROM txs WHERE time >= ? AND time < ?",
+            self._period(since, until),
+        )
+        withdrawn, fees = self.withdrawn(since, until), self.fees(since, until)
+        return {
+            "checkpoint": self.checkpoint(),
+            "txs": txs,
+            "failed_txs": failed,
+            "sent": self.sent_to_exchanges(since, until),
+            "withdrawn": sum(withdrawn.values()),
+            "fees": sum(fees.values()),
+            "wallets_withdrawn": len(withdrawn),
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
+
+
+def main(argv=None):
+    import script   # Отложенный импорт: script сам использует WalletIndex
+    from colorama import Fore
+
+    parser = argparse.ArgumentParser(description="Отчёт по локальному индексу транзакций кошельков")
+    parser.add_argument("--days", type=float, default=7, help="Период отчёта в днях (по умолчанию 7)")
+    parser.add_argument("--no-sync", action="store_true", help="Не догонять сеть перед отчётом")
+    args = parser.parse_args(argv)
+
+    index = script.update_wallet_index(sync=not args.no_sync, force=True)
+    if index is None:
+        return 1
+    since = time.time() - args.days * 86400
+    summary = index.summary(since)
+    script.out(f"{Fore.CYAN}📒 Индекс до блока {summary['checkpoint']}, за {args.days:g} дн.: "
+               f"транзакций {summary['txs']} (неуспешных {summary['failed_txs']}){Fore.RESET}")
+    for exchange, amount in summary["sent"].items() or [("-", 0)]:
+        script.out(f"   {Fore.YELLOW}├─ Отправлено на {exchange}: {Fore.MAGENTA}{amount:,}{Fore.YELLOW} {script.denom()}{Fore.RESET}")
+    script.out(f"   {Fore.YELLOW}├─ Снято наград: {Fore.GREEN}{summary['withdrawn']:,}{Fore.YELLOW} {script.denom()} "
+               f"({summary['wallets_withdrawn']} кошельков){Fore.RESET}")
+    script.out(f"   {Fore.YELLOW}└─ Комиссии: {Fore.RED}{summary['fees']:,}{Fore.YELLOW} {script.denom()}{Fore.RESET}")
+    index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
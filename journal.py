@@ -0,0 +1,147 @@
+# journal.py - Журнал прохода в SQLite (WAL): продолжение после сбоя без повторной работы
+
+import json
+import sqlite3
+import threading
+import time
+
+JOURNAL_PATH = "run_journal.db"
+DEFAULT_CHAIN = "cosmoshub"    # Сеть проходов, записанных до появления столбца chain
+
+# Состояния кошелька в журнале
+PLANNED = "planned"         # Кошелёк взят в обработку
+BROADCAST = "broadcast"     # Транзакция отправлена (tx_hash)
+CONFIRMED = "confirmed"     # Транзакция включена в блок успешно
+FAILED = "failed"           # Транзакция отклонена, не подтверждена или out of gas
+DONE = "done"               # Обработка кошелька завершена
+SKIPPED = "skipped"         # Кошелёк ниже порогов, обрабатывать нечего
+
+FINISHED_STATES = (DONE, SKIPPED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    chain TEXT NOT NULL DEFAULT 'cosmoshub',
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    wallet_order TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    wallet TEXT NOT NULL,
+    state TEXT NOT NULL,
+    kind TEXT,
+    tx_hash TEXT,
+    detail TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS events_run_wallet ON events(run_id, wallet);
+"""
+
+_schema_lock = threading.Lock()     # Журналы нескольких сетей открывают один файл одновременно
+
+
+class RunJournal:
+    """Журнал только на добавление: каждое событие фиксируется на диске до возврата.
+
+    WAL и synchronous=FULL: запись переживает падение процесса и перезагрузку
+    хоста. Незавершённый проход (finished_at пуст) продолжается при
+    следующем запуске в том же порядке кошельков. Сети одного процесса
+    пишут в общий файл, каждая - свои проходы (столбец chain).
+    """
+
+    def __init__(self, path=JOURNAL_PATH, chain=DEFAULT_CHAIN, clock=time.time):
+        self.path = path
+        self.chain = chain
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with _schema_lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=FULL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}
+            if "chain" not in columns:
+                self._conn.execute(f"ALTER TABLE runs ADD COLUMN chain TEXT NOT NULL DEFAULT '{DEFAULT_CHAIN}'")
+        self.run_id = None
+
+    # ------------------------------------------------------------------
+    # Проходы
+    # ------------------------------------------------------------------
+
+    def unfinished_run(self):
+        """(run_id, порядок кошельков) последнего незавершённого прохода или None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, wallet_order FROM runs WHERE finished_at IS NULL AND chain = ? ORDER BY id DESC LIMIT 1",
+                (self.chain,),
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def start_run(self, wallet_order):
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO runs (chain, started_at, wallet_order) VALUES (?, ?, ?)",
+                (self.chain, self.clock(), json.dumps(wallet_order)),
+            )
+            self.run_id = cursor.lastrowid
+        return self.run_id
+
+    def resume_run(self, run_id):
+        self.run_id = run_id
+        return run_id
+
+    def finish_run(self, run_id=None):
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?",
+                               (self.clock(), run_id or self.run_id))
+
+    def abandon_unfinished(self):
+        """Закрывает незавершённые проходы без продолжения (запуск с --fresh)"""
+        with self._lock:
+            self._conn.execute("UPDATE runs SET finished_at = ? WHERE finished_at IS NULL AND chain = ?",
+                               (self.clock(), self.chain))
+
+    # ------------------------------------------------------------------
+    # События
+    # ------------------------------------------------------------------
+
+    def record(self, wallet, state, kind=None, tx_hash=None, detail=None):
+        if self.run_id is None:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO events (run_id, wallet, state, kind, tx_hash, detail, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.run_id, wallet, state, kind, tx_hash, detail, self.clock()),
+            )
+
+    def finished_wallets(self):
+        """Кошельки, обработка которых в текущем проходе завершена"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT wallet FROM events WHERE run_id = ? AND state IN "
+                f"({', '.join('?' * len(FINISHED_STATES))})",
+                (self.run_id, *FINISHED_STATES),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def pending_txs(self):
+        """[(кошелёк, вид, хеш)] отправленных транзакций без итога в журнале"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT wallet, kind, tx_hash FROM events e WHERE run_id = ? AND state = ? "
+                "AND NOT EXISTS (SELECT 1 FROM events r WHERE r.run_id = e.run_id AND r.tx_hash = e.tx_hash "
+                "AND r.state IN (?, ?)) ORDER BY id",
+                (self.run_id, BROADCAST, CONFIRMED, FAILED),
+            ).fetchall()
+        return rows
+
+    def close(self):
+        """Переносит WAL в основной файл и закрывает соединение"""
+        with self._lock:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.close()
@@ -1,98 +1,256 @@
+import atexit
+import csv
 import logging
 import json
-import os
-from datetime import datetime
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 from pathlib import Path
 from colorama import init, Fore, Style
 
+from config import get_settings
+
 init()
 
+LOG_FILE_NAME = "cosmos.jsonl"
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024    # Ротация по размеру: 10 МБ
+DEFAULT_BACKUP_COUNT = 14               # Сколько старых файлов хранить
+OUTPUT_EVENT = "output"                 # Строка вывода script.out(): только консоль
+
+# Оформление событий в консоли: (цвет, значок)
+EVENT_STYLES = {
+    "wallet_start": (Fore.CYAN, "🏦"),
+    "withdraw": (Fore.GREEN, "🎁"),
+    "send": (Fore.GREEN, "💸"),
+    "gas": (Fore.BLUE, "⛽"),
+    "success": (Fore.GREEN, "✅"),
+    "info": (Fore.WHITE, "ℹ️"),
+}
+LEVEL_STYLES = {
+    logging.WARNING: (Fore.YELLOW, "⚠️ "),
+    logging.ERROR: (Fore.RED, "❌"),
+}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Одна запись - одна JSON строка: время, уровень, событие, сообщение и поля"""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "event": getattr(record, "event", "info"),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Единственный путь вывода в консоль: строки script.out() как есть, события - с цветом и значком"""
+
+    def format(self, record):
+        if getattr(record, "event", None) == OUTPUT_EVENT:
+            return record.getMessage()
+        color, icon = LEVEL_STYLES.get(record.levelno) or \
+            EVENT_STYLES.get(getattr(record, "event", "info"), EVENT_STYLES["info"])
+        if not getattr(record, "fields", {}).get("success", True):
+            color = Fore.RED
+        return f"{color}{icon} {record.getMessage()}{Style.RESET_ALL}"
+
+
+class _ConsoleFilter(logging.Filter):
+    """События с console=False пишутся только в файл (их строку уже вывел script.out())"""
+
+    def filter(self, record):
+        return getattr(record, "console", True)
+
+
+class _FileFilter(logging.Filter):
+    """Строки вывода script.out() в JSON-лог не попадают: события пишутся отдельно"""
+
+    def filter(self, record):
+        return getattr(record, "event", None) != OUTPUT_EVENT
+
+
+class _StdoutHandler(logging.StreamHandler):
+    """StreamHandler, который пишет в текущий sys.stdout (его подменяют тесты и бенчмарки)"""
+
+    @property
+    def stream(self):
+        return sys.stdout
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _FastQueueHandler(QueueHandler):
+    """QueueHandler без форматирования и копирования записи в потоке вызова.
+
+    Сообщения уже собраны f-строками, а запись читают только хендлеры
+    слушателя, поэтому вся работа по форматированию уходит в фоновый поток.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class _SizeRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler, который форматирует запись один раз.
+
+    Стандартный shouldRollover форматирует запись повторно и проверяет файл
+    через os.path на каждое событие; здесь размер берётся из позиции потока.
+    """
+
+    def emit(self, record):
+        try:
+            message = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() + len(message.encode("utf-8")) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(message)
+            self.stream.flush()
+        except Exception:
+            self.handleError(record)
+
+
+def _file_handler(log_file, rotation, max_bytes, backup_count):
+    if rotation == "time":
+        return TimedRotatingFileHandler(log_file, when="midnight", backupCount=backup_count, encoding="utf-8")
+    return _SizeRotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+
+
 class CosmosLogger:
-    def __init__(self, log_dir="logs", log_level="INFO"):
+    """Логгер с очередью: вызов log_* только кладёт запись в очередь.
+
+    Запись в файл (JSON lines с ротацией по размеру или по времени) и вывод
+    в консоль делает один фоновый поток QueueListener, поэтому потоки
+    обработки кошельков не ждут диск и не конкурируют за консоль.
+    """
+
+    def __init__(self, log_dir="logs", log_level="INFO", rotation="size",
+                 max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT, to_file=True, console=True):
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(exist_ok=True)
-        
+        self.log_file = self.log_dir / LOG_FILE_NAME
+
         # Настройка логгера
         self.logger = logging.getLogger("cosmos_automation")
         self.logger.setLevel(getattr(logging, log_level.upper()))
-        
-        # Очищаем существующие хендлеры  
+        self.logger.propagate = False
+
+        # Очищаем существующие хендлеры
         self.logger.handlers.clear()
-        
-        # Файловый хендлер
-        log_file = self.log_dir / f"cosmos_{datetime.now().strftime('%Y%m%d')}.log"
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(logging.INFO)
-        
-        # Консольный хендлер
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        
-        # Форматтер
-        formatter = logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
-        
-    def log_wallet_start(self, wallet_name, balance):
-        message = f"[{wallet_name}] Начало обработки. Баланс: {balance:,} uatom"
-        self.logger.info(message)
-        print(f"{Fore.CYAN}🏦 {message}{Style.RESET_ALL}")
-    
-    def log_reward_withdrawal(self, wallet_name, rewards, tx_hash, success=True):
+
+        handlers = []
+        if to_file:
+            file_handler = _file_handler(self.log_file, rotation, max_bytes, backup_count)
+            file_handler.setFormatter(JsonLinesFormatter())
+            file_handler.addFilter(_FileFilter())
+            handlers.append(file_handler)
+        if console:
+            console_handler = _StdoutHandler()
+            console_handler.setFormatter(ConsoleFormatter())
+            console_handler.addFilter(_ConsoleFilter())
+            handlers.append(console_handler)
+
+        self._queue = queue.SimpleQueue()
+        self.logger.addHandler(_FastQueueHandler(self._queue))
+        self._listener = QueueListener(self._queue, *handlers, respect_handler_level=True)
+        self._listener.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Дописывает очередь и останавливает фоновый поток"""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+
+    def log_event(self, event, message, level=logging.INFO, console=True, **fields):
+        """Структурированное событие: поля (wallet, tx_hash, amount, gas, ...) попадают в JSON"""
+        fields = {key: value for key, value in fields.items() if value is not None}
+        self.logger.log(level, message, extra={"event": event, "fields": fields, "console": console})
+
+    def output(self, message):
+        """Строка вывода script.py: печатается как есть в порядке очереди, без учёта LOG_LEVEL"""
+        record = self.logger.makeRecord(self.logger.name, logging.INFO, __file__, 0, message, None, None,
+                                        extra={"event": OUTPUT_EVENT})
+        self.logger.handle(record)
+
+    def log_wallet_start(self, wallet_name, balance, denom=None):
+        denom = denom or get_settings().denom
+        message = f"[{wallet_name}] Начало обработки. Баланс: {balance:,} {denom}"
+        self.log_event("wallet_start", message, wallet=wallet_name, balance=balance, denom=denom)
+
+    def log_reward_withdrawal(self, wallet_name, rewards, tx_hash, success=True, denom=None):
+        denom = denom or get_settings().denom
         status = "SUCCESS" if success else "FAILED"
-        message = f"[{wallet_name}] Снятие наград: {rewards:,.2f} uatom - {status} - TX: {tx_hash}"
-        self.logger.info(message)
-        
-        color = Fore.GREEN if success else Fore.RED
-        print(f"{color}🎁 {message}{Style.RESET_ALL}")
-    
-    def log_send_transaction(self, wallet_name, amount, target, exchange, tx_hash, success=True):
+        message = f"[{wallet_name}] Снятие наград: {rewards:,.2f} {denom} - {status} - TX: {tx_hash}"
+        self.log_event("withdraw", message, wallet=wallet_name, operation="withdraw",
+                       amount=rewards, denom=denom, tx_hash=tx_hash, success=success)
+
+    def log_send_transaction(self, wallet_name, amount, target, exchange, tx_hash, success=True, denom=None):
+        denom = denom or get_settings().denom
         status = "SUCCESS" if success else "FAILED"
-        message = f"[{wallet_name}] Отправка {amount:,} uatom на {exchange} - {status} - TX: {tx_hash}"
-        self.logger.info(message)
-        
-        color = Fore.GREEN if success else Fore.RED
-        print(f"{color}💸 {message}{Style.RESET_ALL}")
-    
+        message = f"[{wallet_name}] Отправка {amount:,} {denom} на {exchange} - {status} - TX: {tx_hash}"
+        self.log_event("send", message, wallet=wallet_name, operation="send", amount=amount, denom=denom,
+                       target=target, exchange=exchange, tx_hash=tx_hash, success=success)
+
     def log_error(self, wallet_name, error_msg):
         message = f"[{wallet_name}] ОШИБКА: {error_msg}"
-        self.logger.error(message)
-        print(f"{Fore.RED}❌ {message}{Style.RESET_ALL}")
-    
+        self.log_event("error", message, logging.ERROR, wallet=wallet_name)
+
     def log_gas_calculation(self, operation, gas_value):
         message = f"Gas расчет для {operation}: {gas_value:,}"
-        self.logger.info(message)
-        print(f"{Fore.BLUE}⛽ {message}{Style.RESET_ALL}")
-    
+        self.log_event("gas", message, operation=operation, gas=gas_value)
+
     def log_info(self, message):
-        self.logger.info(message)
-        print(f"{Fore.WHITE}ℹ️ {message}{Style.RESET_ALL}")
-    
+        self.log_event("info", message)
+
     def log_warning(self, message):
-        self.logger.warning(message)
-        print(f"{Fore.YELLOW}⚠️  {message}{Style.RESET_ALL}")
-    
+        self.log_event("warning", message, logging.WARNING)
+
     def log_success(self, message):
-        self.logger.info(message)
-        print(f"{Fore.GREEN}✅ {message}{Style.RESET_ALL}")
-    
-    def export_daily_stats(self, stats_data):
-        """Экспорт ежедневной статистики"""
+        self.log_event("success", message)
+
+    def export_daily_stats(self, stats_data, csv_rows=None, chain=None):
+        """Экспорт ежедневной статистики (JSON, и CSV если переданы строки таблицы).
+
+        chain - имя сети в имени файла (stats_mantra_YYYYMMDD.json) для сетей из CHAINS
+        """
+        self._export("stats", stats_data, csv_rows, "Статистика сохранена", "статистики", chain)
+
+    def export_plan(self, plan_data, csv_rows=None, chain=None):
+        """Экспорт плана прохода (plan_YYYYMMDD.json/csv, последний план за день)"""
+        self._export("plan", plan_data, csv_rows, "План сохранен", "плана", chain)
+
+    def _export(self, prefix, data, csv_rows, saved, subject, chain=None):
+        if chain:
+            prefix = f"{prefix}_{chain}"
         try:
-            stats_file = self.log_dir / f"stats_{datetime.now().strftime('%Y%m%d')}.json"
-            
+            stats_file = self.log_dir / f"{prefix}_{datetime.now().strftime('%Y%m%d')}.json"
+
             with open(stats_file, 'w', encoding='utf-8') as f:
-                json.dump(stats_data, f, indent=2, ensure_ascii=False, default=str)
-            
-            self.log_success(f"Статистика сохранена: {stats_file}")
+                json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+
+            self.log_success(f"{saved}: {stats_file}")
+
+            if csv_rows:
+                csv_file = stats_file.with_suffix('.csv')
+                with open(csv_file, 'w', encoding='utf-8', newline='') as f:
+                    writer = csv.DictWriter(f, fieldnames=list(csv_rows[0].keys()))
+                    writer.writeheader()
+                    writer.writerows(csv_rows)
+                self.log_success(f"Таблица сохранена: {csv_file}")
         except Exception as e:
-            self.log_error("SYSTEM", f"Ошибка сохранения статистики: {e}")
+            self.log_error("SYSTEM", f"Ошибка сохранения {subject}: {e}")
 
 # Глобальный экземпляр логгера
 _logger_instance = None
@@ -100,7 +258,7 @@ _logger_instance = None
 def get_logger():
     global _logger_instance
     if _logger_instance is None:
-        log_level = os.getenv('LOG_LEVEL', 'INFO')
-        log_dir = os.getenv('LOG_DIR', 'logs')
-        _logger_instance = CosmosLogger(log_dir, log_level)
-    return _logger_instance
\ No newline at end of file
+        s = get_settings()
+        _logger_instance = CosmosLogger(s.log_dir, s.log_level, s.log_rotation, s.log_max_bytes,
+                                        s.log_backup_count, s.log_to_file, s.log_to_console)
+    return _logger_instance
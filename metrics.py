@@ -0,0 +1,184 @@
+# metrics.py - Гистограммы задержек и счётчики операций с экспортом в JSON и Prometheus
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Границы корзин гистограмм (сек): от быстрых RPC до ожидания включения в блок
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+METRICS_PREFIX = "cosmos_"
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+def _label_text(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Распределение значений по корзинам с суммой, минимумом и максимумом"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина - +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min), self.max)
+            seen += count
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Metrics:
+    """Потокобезопасный реестр гистограмм и счётчиков с метками.
+
+    observe/inc дешевле одного системного вызова, поэтому их можно ставить
+    на каждый RPC запрос. snapshot() - для stats_YYYYMMDD.json,
+    prometheus_text() - для HTTP эндпоинта /metrics.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, clock=time.perf_counter):
+        self.buckets = buckets
+        self.clock = clock
+        self._histograms = {}   # имя -> {метки: Histogram}
+        self._counters = {}     # имя -> {метки: значение}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Замер длительности блока; метки можно дополнить внутри через yield-словарь"""
+        extra = {}
+        started = self.clock()
+        try:
+            yield extra
+        finally:
+            self.observe(name, self.clock() - started, **labels, **extra)
+
+    def snapshot(self):
+        """Все метрики в виде словаря для JSON статистики"""
+        def series_name(key):
+            return ",".join(f"{k}={v}" for k, v in key) or "all"
+
+        with self._lock:
+            return {
+                "histograms": {
+                    name: {series_name(key): h.to_dict() for key, h in sorted(series.items())}
+                    for name, series in sorted(self._histograms.items())
+                },
+                "counters": {
+                    name: {series_name(key): value for key, value in sorted(series.items())}
+                    for name, series in sorted(self._counters.items())
+                },
+            }
+
+    def prometheus_text(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = f"{METRICS_PREFIX}{name}"
+                lines.append(f"# TYPE {metric} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{metric}{_label_text(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                metric = f"{METRICS_PREFIX}{name}"
+                lines.append(f"# TYPE {metric} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_label_text(key, [('le', str(bound))])} {cumulative}")
+                    lines.append(f"{metric}_bucket{_label_text(key, [('le', '+Inf')])} {histogram.count}")
+                    lines.append(f"{metric}_sum{_label_text(key)} {histogram.sum}")
+                    lines.append(f"{metric}_count{_label_text(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+def start_http_server(metrics, port, host="127.0.0.1"):
+    """Отдаёт /metrics в формате Prometheus из фонового потока. Возвращает сервер"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # Нужен только с --metrics-port
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Не засоряем консоль запросами Prometheus
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+# Глобальный реестр метрик (создаётся сразу: к нему обращаются из многих потоков)
+_metrics_instance = Metrics()
+
+def get_metrics():
+    return _metrics_instance
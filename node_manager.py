@@ -0,0 +1,141 @@
+# node_manager.py - Выбор RPC узлов по здоровью: задержка, ошибки, высота блока, circuit breaker
+
+import threading
+import time
+
+EWMA_ALPHA = 0.3            # Вес нового замера в скользящих средних
+FAILURE_THRESHOLD = 3       # Подряд идущих ошибок до размыкания цепи
+OPEN_TIMEOUT = 30.0         # Начальная пауза для разомкнутого узла (сек)
+MAX_OPEN_TIMEOUT = 300.0    # Максимальная пауза (сек)
+MAX_BLOCK_LAG = 3           # Допустимое отставание от лучшей высоты (блоков)
+DEFAULT_LATENCY = 1.0       # Оценка задержки узла без замеров (сек)
+
+CLOSED = "closed"           # Узел здоров
+OPEN = "open"               # Узел исключён до истечения паузы
+HALF_OPEN = "half_open"     # Пауза истекла, узел проверяется реальными запросами
+
+
+class NodeHealth:
+    """Состояние одного узла"""
+
+    def __init__(self, url):
+        self.url = url
+        self.latency = None         # EWMA задержки (сек)
+        self.error_rate = 0.0       # EWMA доли ошибок
+        self.height = 0             # Последняя известная высота блока
+        self.failures = 0           # Ошибок подряд
+        self.state = CLOSED
+        self.open_timeout = OPEN_TIMEOUT
+        self.opened_at = 0.0
+        self.requests = 0
+        self.errors = 0
+
+    def to_dict(self):
+        return {
+            "url": self.url,
+            "state": self.state,
+            "latency_ms": round(self.latency * 1000) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 3),
+            "height": self.height,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
+
+
+class NodeManager:
+    """Отслеживает задержку, ошибки и высоту каждого узла и ранжирует их.
+
+    Чтения идут на самый быстрый синхронизированный узел. После
+    FAILURE_THRESHOLD ошибок подряд узел исключается (цепь размыкается) на
+    open_timeout, затем пропускается пробными запросами: успех возвращает
+    узел, ошибка снова исключает его с удвоенной паузой.
+    """
+
+    def __init__(self, urls, alpha=EWMA_ALPHA, failure_threshold=FAILURE_THRESHOLD,
+                 max_lag=MAX_BLOCK_LAG, clock=time.monotonic):
+        if not urls:
+            raise ValueError("Должен быть указан хотя бы один RPC узел")
+        self.nodes = {url: NodeHealth(url) for url in urls}
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.max_lag = max_lag
+        self.clock = clock
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Замеры
+    # ------------------------------------------------------------------
+
+    def record_success(self, url, latency, height=None):
+        with self._lock:
+            node = self.nodes.get(url)
+            if node is None:
+                return
+            node.requests += 1
+            node.latency = latency if node.latency is None else \
+                self.alpha * latency + (1 - self.alpha) * node.latency
+            node.error_rate = (1 - self.alpha) * node.error_rate
+            node.failures = 0
+            if node.state != CLOSED:
+                node.state = CLOSED
+                node.open_timeout = OPEN_TIMEOUT
+            if height:
+                node.height = max(node.height, int(height))
+
+    def record_failure(self, url):
+        with self._lock:
+            node = self.nodes.get(url)
+            if node is None:
+                return
+            node.requests += 1
+            node.errors += 1
+            node.error_rate = self.alpha + (1 - self.alpha) * node.error_rate
+            node.failures += 1
+            if node.state == HALF_OPEN:
+                node.open_timeout = min(node.open_timeout * 2, MAX_OPEN_TIMEOUT)
+                self._open(node)
+            elif node.state == CLOSED and node.failures >= self.failure_threshold:
+                self._open(node)
+
+    def _open(self, node):
+        node.state = OPEN
+        node.opened_at = self.clock()
+
+    # ------------------------------------------------------------------
+    # Выбор
+    # ------------------------------------------------------------------
+
+    def _refresh_states(self):
+        now = self.clock()
+        for node in self.nodes.values():
+            if node.state == OPEN and now - node.opened_at >= node.open_timeout:
+                node.state = HALF_OPEN
+
+    def _score(self, node):
+        latency = node.latency if node.latency is not None else DEFAULT_LATENCY
+        return latency * (1 + 4 * node.error_rate)
+
+    def ranked(self):
+        """Доступные узлы от лучшего к худшему; если все исключены - все узлы"""
+        with self._lock:
+            self._refresh_states()
+            best_height = max(node.height for node in self.nodes.values())
+            available = [node for node in self.nodes.values() if node.state != OPEN]
+            if not available:
+                available = sorted(self.nodes.values(), key=lambda node: node.opened_at)
+                return [node.url for node in available]
+            available.sort(key=lambda node: (
+                best_height - node.height > self.max_lag,   # Отстающие узлы - в конец
+                self._score(node),
+            ))
+            return [node.url for node in available]
+
+    def pick(self):
+        """Лучший узел для чтения или отправки"""
+        return self.ranked()[0]
+
+    def snapshot(self):
+        """Состояние всех узлов для экспорта статистики"""
+        with self._lock:
+            self._refresh_states()
+            return [node.to_dict() for node in self.nodes.values()]
@@ -0,0 +1,188 @@
+# planner.py - План прохода: какие снятия и отправки будут выполнены, без отправки транзакций
+
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+
+# Запас сверх комиссии отправки, как в process_wallet
+SEND_FEE_MARGIN = 3000
+
+
+def fee_for(gas, gas_price):
+    """Комиссия в uatom для газа по цене gas_price (округление вверх)"""
+    return int(gas * gas_price) + 1
+
+
+@dataclass
+class WalletPlan:
+    """Действия прохода для одного кошелька по строке снимка.
+
+    Остаток на кошельке выбирается случайно при отправке, поэтому сумма
+    отправки дана диапазоном: send_amount - при максимальном остатке,
+    send_amount_max - при минимальном.
+    """
+    wallet_name: str
+    address: str = ""
+    exchange: str = ""
+    target: str = ""
+    balance: int = 0
+    rewards: float = 0.0
+    validators: int = 0
+    threshold: int = 0      # Порог наград для снятия с учётом комиссии
+    combined: bool = False
+    withdraw: bool = False
+    withdraw_gas: int = 0
+    withdraw_fees: int = 0
+    send: bool = False
+    send_amount: int = 0
+    send_amount_max: int = 0
+    send_gas: int = 0
+    send_fees: int = 0
+    gas_source: str = ""
+    note: str = ""          # Почему действие не планируется или ошибка снимка
+
+    @property
+    def fees(self):
+        """Комиссии всех транзакций кошелька (без повторов из-за out of gas)"""
+        fees = self.withdraw_fees if self.withdraw else 0
+        if self.send and not self.combined:
+            fees += self.send_fees
+        return fees
+
+    @property
+    def has_actions(self):
+        return self.withdraw or self.send
+
+
+def _remaining_range(balance, settings):
+    """Границы случайного остатка, как в pick_remaining_balance"""
+    low = min(settings.min_balance_remain, balance)
+    high = min(settings.max_balance_remain, balance)
+    return min(low, high), max(low, high)
+
+
+def _plan_combined(plan, settings, gas_oracle):
+    """Одна транзакция снятия и отправки; False, если проход перейдёт на две транзакции"""
+    withdraw = gas_oracle.withdraw_gas(plan.validators)
+    send = gas_oracle.send_gas()
+    gas = withdraw.gas + send.gas
+    fees = fee_for(gas, settings.gas_price)
+    # Награды каждого валидатора при снятии округляются вниз
+    total = plan.balance + max(int(plan.rewards) - plan.validators, 0) - fees
+    low, high = _remaining_range(total + fees, settings)
+    if total - high < settings.min_send_amount or plan.balance < fees:
+        return False
+    plan.combined = plan.withdraw = plan.send = True
+    plan.withdraw_gas, plan.withdraw_fees = gas, fees
+    plan.send_amount, plan.send_amount_max = total - high, total - low
+    plan.gas_source = withdraw.source
+    return True
+
+
+def plan_wallet(row, target, gas_oracle, settings, threshold=None):
+    """WalletPlan по строке снимка (WalletSnapshot) и адресу биржи (exchange, address).
+
+    Повторяет решения process_wallet на оценках GasOracle; симуляция
+    конкретных транзакций не выполняется, газ при отправке может отличаться.
+    threshold(validators) - порог наград для снятия (по умолчанию MIN_REWARDS_TO_WITHDRAW).
+    """
+    exchange, address = target
+    plan = WalletPlan(row.wallet_name, row.address, exchange, address, row.balance, row.rewards, row.validators,
+                      threshold(row.validators) if threshold else settings.min_rewards_to_withdraw)
+    if not row.ok:
+        plan.note = f"ошибка снимка: {row.error}"
+        return plan
+
+    withdraw = gas_oracle.withdraw_gas(row.validators)
+    plan.withdraw_gas = withdraw.gas
+    plan.withdraw_fees = fee_for(withdraw.gas, settings.gas_price)
+    plan.gas_source = withdraw.source
+    if row.balance < plan.withdraw_fees:
+        plan.note = "нет средств на комиссию"
+        return plan
+
+    balance = row.balance
+    if row.rewards >= plan.threshold:
+        if settings.combined and settings.broadcast_mode == "multi" and _plan_combined(plan, settings, gas_oracle):
+            return plan
+        plan.withdraw = True
+        balance += max(int(row.rewards) - row.validators, 0) - plan.withdraw_fees
+
+    send = gas_oracle.send_gas()
+    plan.send_gas = send.gas
+    plan.send_fees = fee_for(send.gas, settings.gas_price)
+    low, high = _remaining_range(balance, settings)
+    min_send_amount = max(plan.send_fees + SEND_FEE_MARGIN, settings.min_send_amount)
+    plan.send_amount, plan.send_amount_max = max(balance - high, 0), max(balance - low, 0)
+    if plan.send_amount_max >= min_send_amount and balance >= plan.send_fees:
+        plan.send = True
+        if plan.send_amount < min_send_amount:
+            plan.note = "отправка зависит от случайного остатка"
+    elif not plan.withdraw:
+        plan.note = "награды и баланс ниже порогов"
+    return plan
+
+
+class PassPlan:
+    """План прохода по всем кошелькам с итогами для решения, стоит ли запускать проход"""
+
+    def __init__(self, wallets, snapshot, gas_price, duration=0.0):
+        self.wallets = wallets
+        self.snapshot = snapshot
+        self.gas_price = gas_price
+        self.duration = duration
+        self.created_at = datetime.now()
+
+    def __iter__(self):
+        return iter(self.wallets)
+
+    def __len__(self):
+        return len(self.wallets)
+
+    def actions(self):
+        return [plan for plan in self.wallets if plan.has_actions]
+
+    def totals(self):
+        planned = self.actions()
+        return {
+            "wallets": len(self.wallets),
+            "with_actions": len(planned),
+            "withdrawals": sum(plan.withdraw for plan in planned),
+            "sends": sum(plan.send for plan in planned),
+            "combined": sum(plan.combined for plan in planned),
+            "transactions": sum(plan.withdraw + (plan.send and not plan.combined) for plan in planned),
+            "rewards": round(sum(plan.rewards for plan in planned if plan.withdraw), 6),
+            "send_min": sum(plan.send_amount for plan in planned if plan.send),
+            "send_max": sum(plan.send_amount_max for plan in planned if plan.send),
+            "fees": sum(plan.fees for plan in planned),
+            "errors": sum(1 for plan in self.wallets if plan.note.startswith("ошибка")),
+        }
+
+    @property
+    def worthwhile(self):
+        """Проход имеет смысл, если хотя бы у одного кошелька есть действие"""
+        return any(plan.has_actions for plan in self.wallets)
+
+    def to_rows(self):
+        """Строки для CSV экспорта"""
+        return [{**asdict(plan), "fees": plan.fees} for plan in self.wallets]
+
+    def to_dict(self):
+        """Представление для JSON экспорта"""
+        return {
+            "created_at": self.created_at.isoformat(timespec="seconds"),
+            "duration_sec": round(self.duration, 3),
+            "snapshot_duration_sec": round(self.snapshot.duration, 3),
+            "gas_price": self.gas_price,
+            "worthwhile": self.worthwhile,
+            "totals": self.totals(),
+            "wallets": self.to_rows(),
+        }
+
+
+def build_plan(snapshot, wallet_targets, gas_oracle, settings, threshold=None):
+    """План прохода по снимку портфеля. Использует только запросы чтения (оценки газа по блокам)"""
+    started = time.monotonic()
+    wallets = [plan_wallet(row, wallet_targets.get(row.wallet_name, ("", "")), gas_oracle, settings, threshold)
+               for row in snapshot]
+    return PassPlan(wallets, snapshot, settings.gas_price, time.monotonic() - started + snapshot.duration)
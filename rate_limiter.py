@@ -0,0 +1,151 @@
+# rate_limiter.py - Адаптивный лимит одновременных запросов к узлу (AIMD) и классификация ошибок
+#
+# Публичные узлы (publicnode, polkachu, itrocket) ограничивают частоту
+# запросов. Лимит каждого узла растёт на единицу за "окно" успешных ответов
+# и уменьшается вдвое на 429/5xx/таймаут, поэтому параллельность держится
+# у реальной пропускной способности узла, а не у заданного NODE_CONCURRENCY.
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# Виды ошибок обращения к узлу
+THROTTLED = "throttled"         # HTTP 429: узел ограничивает частоту запросов
+UNAVAILABLE = "unavailable"     # HTTP 5xx: перегрузка или сбой за балансировщиком
+TIMEOUT = "timeout"             # Нет ответа за RPC_TIMEOUT
+CONNECTION = "connection"       # Соединение не установлено или оборвано
+NOT_FOUND = "not_found"         # Данных нет - это ответ, а не сбой
+REJECTED = "rejected"           # Прочие 4xx и осмысленные ошибки узла: повтор не поможет
+
+RETRYABLE = frozenset({THROTTLED, UNAVAILABLE, TIMEOUT, CONNECTION})
+OVERLOAD = frozenset({THROTTLED, UNAVAILABLE, TIMEOUT})    # Сигналы снизить лимит узла
+
+DECREASE_FACTOR = 0.5       # Множитель лимита при перегрузке
+DECREASE_INTERVAL = 1.0     # Не уменьшать лимит чаще (сек): ответы одной волны - одна перегрузка
+THROTTLE_COOLDOWN = 2.0     # Пауза узла после 429 без Retry-After (сек)
+MAX_COOLDOWN = 60.0         # Верхняя граница паузы по Retry-After (сек)
+RETRY_BASE_DELAY = 0.5      # Пауза перед первым повтором (сек), далее удваивается
+MAX_RETRY_DELAY = 30.0
+
+_TEXT_MARKERS = (
+    (THROTTLED, ("429", "too many requests", "rate limit")),
+    (UNAVAILABLE, ("502", "503", "504", "bad gateway", "service unavailable", "gateway timeout")),
+    (TIMEOUT, ("timeout", "timed out", "deadline exceeded")),
+    (CONNECTION, ("connection refused", "connection reset", "no such host", "eof")),
+)
+
+
+def classify_status(status):
+    """Вид ошибки по HTTP статусу (None для 2xx)"""
+    if status < 400:
+        return None
+    if status == 429:
+        return THROTTLED
+    if status >= 500:
+        return UNAVAILABLE
+    if status == 404:
+        return NOT_FOUND
+    return REJECTED
+
+
+def classify_text(text):
+    """Вид ошибки по тексту (stderr gaiad, сообщение исключения)"""
+    text = (text or "").lower()
+    for kind, markers in _TEXT_MARKERS:
+        if any(marker in text for marker in markers):
+            return kind
+    return REJECTED
+
+
+def parse_retry_after(value):
+    """Retry-After в секундах (только числовая форма), не больше MAX_COOLDOWN"""
+    try:
+        return min(max(float(value), 0.0), MAX_COOLDOWN)
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt, wait=0.0):
+    """Пауза перед повтором attempt (с 0): экспонента со случайным разбросом, не меньше wait"""
+    delay = min(RETRY_BASE_DELAY * 2 ** attempt, MAX_RETRY_DELAY) * random.uniform(0.5, 1.0)
+    return max(delay, wait)
+
+
+class AdaptiveLimiter:
+    """Лимит одновременных запросов к одному узлу по схеме AIMD.
+
+    Успешный ответ увеличивает лимит на 1/limit (примерно +1 за limit
+    ответов), перегрузка (429, 5xx, таймаут) умножает его на DECREASE_FACTOR,
+    но не чаще раза в DECREASE_INTERVAL. После 429 узел получает паузу
+    (Retry-After или THROTTLE_COOLDOWN): новые запросы ждут её окончания.
+    """
+
+    def __init__(self, max_limit, min_limit=1, initial=None, clock=time.monotonic):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = float(initial or max((self.max_limit + 1) // 2, min_limit))
+        self.clock = clock
+        self.inflight = 0
+        self.cooldown_until = 0.0
+        self._decreased_at = None
+        self._cond = threading.Condition()
+        self.stats = {"requests": 0, "throttled": 0, "overloaded": 0, "decreases": 0, "waits": 0}
+
+    def acquire(self):
+        with self._cond:
+            waited = False
+            while True:
+                now = self.clock()
+                if now < self.cooldown_until:
+                    self._cond.wait(self.cooldown_until - now)
+                elif self.inflight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    break
+                waited = True
+            self.inflight += 1
+            self.stats["requests"] += 1
+            self.stats["waits"] += waited
+
+    def release(self):
+        with self._cond:
+            self.inflight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, kind=None, retry_after=None):
+        """Итог запроса: None - узел ответил, иначе вид ошибки (см. classify_*)"""
+        with self._cond:
+            if kind not in OVERLOAD:
+                if kind is None or kind in (NOT_FOUND, REJECTED):
+                    self.limit = min(self.limit + 1 / self.limit, self.max_limit)
+                self._cond.notify_all()
+                return
+            now = self.clock()
+            self.stats["overloaded"] += 1
+            if kind == THROTTLED:
+                self.stats["throttled"] += 1
+                cooldown = retry_after if retry_after is not None else THROTTLE_COOLDOWN
+                self.cooldown_until = max(self.cooldown_until, now + cooldown)
+            if self._decreased_at is None or now - self._decreased_at >= DECREASE_INTERVAL:
+                self.limit = max(self.limit * DECREASE_FACTOR, self.min_limit)
+                self._decreased_at = now
+                self.stats["decreases"] += 1
+            self._cond.notify_all()
+
+    def cooldown_remaining(self):
+        with self._cond:
+            return max(self.cooldown_until - self.clock(), 0.0)
+
+    def to_dict(self):
+        with self._cond:
+            return {"limit": round(self.limit, 2), "inflight": self.inflight,
+                    "cooldown": round(max(self.cooldown_until - self.clock(), 0.0), 1), **self.stats}
@@ -0,0 +1,168 @@
+# read_cache.py - Кеш чтений состояния сети по высоте блока
+#
+# Баланс кошелька читается при снимке, после снятия наград, после каждой
+# попытки с out of gas и перед отправкой; оценка газа каждый раз узнаёт
+# последнюю высоту. Внутри одного блока ответ узла не меняется, поэтому
+# результат запроса хранится вместе с высотой и годен, пока она последняя.
+
+import threading
+import time
+from collections import OrderedDict
+
+from rpc_client import RPCError
+
+DEFAULT_MAX_ENTRIES = 10000     # Записей в кеше (LRU)
+HEIGHT_TTL = 1.0                # Не запрашивать последнюю высоту чаще (сек); блок ~6 сек
+
+
+def _event_values(tx_result):
+    """Значения атрибутов событий транзакции: среди них адреса отправителей и получателей"""
+    return {
+        attr.get("value")
+        for event in (tx_result or {}).get("events") or []
+        for attr in event.get("attributes") or []
+    }
+
+
+class ReadCache:
+    """Read-through кеш запросов баланса, наград и валидаторов поверх CosmosRPCClient.
+
+    Запись (запрос, адрес) помечается высотой, известной до запроса, и
+    отдаётся, пока эта высота последняя. Высота перепроверяется только при
+    наличии записи и не чаще height_ttl, так что первое чтение адреса не
+    стоит лишнего /status; с новой высотой записи прежних удаляются. Включение или потеря нашей транзакции (TxConfirmer,
+    on_done) удаляет записи адресов из её событий и адресов, отмеченных
+    watch(). Число записей ограничено max_entries (LRU). Остальные методы
+    клиента вызываются напрямую, так что кеш подставляется вместо клиента.
+    Результаты общие для всех потоков - их нельзя изменять.
+    """
+
+    def __init__(self, client, max_entries=DEFAULT_MAX_ENTRIES, height_ttl=HEIGHT_TTL, clock=time.monotonic):
+        self.client = client
+        self.max_entries = max_entries
+        self.height_ttl = height_ttl
+        self.clock = clock
+        self._entries = OrderedDict()   # (запрос, адрес) -> (высота, результат)
+        self._watched = {}              # хеш транзакции -> адреса
+        self._height = None
+        self._height_at = None
+        self._generation = 0            # Растёт при каждой инвалидации
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "invalidated": 0, "evicted": 0, "heights": 0}
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    # ------------------------------------------------------------------
+    # Высота
+    # ------------------------------------------------------------------
+
+    def height(self):
+        """Последняя известная высота; None, если узлы недоступны"""
+        now = self.clock()
+        with self._lock:
+            if self._height_at is not None and now - self._height_at < self.height_ttl:
+                return self._height
+            # Высоту обновляет один поток, остальные до его ответа берут прежнюю
+            self._height_at = now
+        try:
+            height = self.client.get_latest_height()
+        except (RPCError, KeyError, ValueError, TypeError):
+            with self._lock:
+                self._height_at = None
+            return None
+        self.advance(height)
+        with self._lock:
+            return self._height
+
+    def advance(self, height):
+        """Сеть дошла до height: записи прежних высот больше не нужны"""
+        with self._lock:
+            if self._height is not None and height <= self._height:
+                return
+            self._height = height
+            self.stats["heights"] += 1
+            for key in [key for key, (entry_height, _) in self._entries.items() if entry_height < height]:
+                del self._entries[key]
+
+    def get_latest_height(self, node=None):
+        if node is not None:
+            return self.client.get_latest_height(node=node)
+        height = self.height()
+        return height if height is not None else self.client.get_latest_height()
+
+    # ------------------------------------------------------------------
+    # Записи
+    # ------------------------------------------------------------------
+
+    def _cached(self, query, address, fetch):
+        key = (query, address)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == self.height():
+            with self._lock:
+                if self._entries.get(key) is entry:     # Не удалена инвалидацией за это время
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[1]
+        with self._lock:
+            self.stats["misses"] += 1
+            height, generation = self._height, self._generation
+        value = fetch()
+        with self._lock:
+            # Ответ не старше высоты height; пока шёл запрос, транзакция могла изменить состояние
+            if height is not None and self._generation == generation:
+                self._entries[key] = (height, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evicted"] += 1
+        return value
+
+    def get_balance(self, address, denom="uatom", node=None):
+        return self._cached(f"balance:{denom}", address, lambda: self.client.get_balance(address, denom, node=node))
+
+    def get_rewards(self, address, node=None):
+        return self._cached("rewards", address, lambda: self.client.get_rewards(address, node=node))
+
+    def get_delegator_validators(self, address, node=None):
+        return self._cached("validators", address,
+                            lambda: self.client.get_delegator_validators(address, node=node))
+
+    # ------------------------------------------------------------------
+    # Инвалидация
+    # ------------------------------------------------------------------
+
+    def invalidate(self, addresses):
+        """Удаляет записи адресов; ответы, полученные до этого момента, не сохраняются"""
+        addresses = set(addresses)
+        with self._lock:
+            self._generation += 1
+            stale = [key for key in self._entries if key[1] in addresses]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidated"] += len(stale)
+
+    def watch(self, tx_hash, *addresses):
+        """Адреса, состояние которых меняет транзакция (в событиях их может не быть, например при out of gas)"""
+        with self._lock:
+            self._watched.setdefault(tx_hash.upper(), set()).update(addresses)
+
+    def tx_done(self, pending):
+        """Итог транзакции из TxConfirmer: её адреса читаются заново"""
+        with self._lock:
+            addresses = self._watched.pop(pending.tx_hash, set())
+        self.invalidate(addresses | _event_values(pending.tx_result))
+        if pending.height:
+            self.advance(pending.height)
+
+    def hit_rate(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return self.stats["hits"] / lookups if lookups else 0.0
+
+    def to_dict(self):
+        """Статистика для экспорта"""
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries), height=self._height)
+        return dict(stats, hit_rate=round(self.hit_rate(), 3))
@@ -0,0 +1,443 @@
+# rpc_client.py - Нативный клиент Tendermint/CometBFT RPC и REST (LCD) API
+
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from metrics import get_metrics
+from node_manager import NodeManager
+from rate_limiter import (CONNECTION, NOT_FOUND, OVERLOAD, REJECTED, RETRYABLE, TIMEOUT, UNAVAILABLE,
+                          AdaptiveLimiter, classify_status, classify_text, parse_retry_after, retry_delay)
+
+DEFAULT_TIMEOUT = 15        # Таймаут одного HTTP запроса (сек)
+DEFAULT_POOL_SIZE = 16      # Максимум keep-alive соединений на один хост
+DEFAULT_NODE_LIMIT = 8      # Максимум одновременных запросов к одному узлу
+DEFAULT_RETRIES = 3         # Повторов запроса, когда все узлы перегружены (429, 5xx, таймаут)
+
+
+class RPCError(Exception):
+    """Ошибка обращения к RPC/REST узлу. kind - вид ошибки из rate_limiter (throttled, timeout, ...)"""
+
+    def __init__(self, message="", kind=REJECTED):
+        super().__init__(message)
+        self.kind = kind
+
+    @property
+    def retryable(self):
+        """Узел перегружен или недоступен: повтор позже может дать ответ"""
+        return self.kind in RETRYABLE
+
+
+def _prefer(current, error):
+    """Ошибка для вызывающего: ответ узла по существу важнее перегрузки другого узла"""
+    if current is None or current.retryable:
+        return error
+    return current
+
+
+class CosmosRPCClient:
+    """Клиент Cosmos узлов поверх пула keep-alive HTTP соединений.
+
+    rpc_nodes - адреса Tendermint RPC, rest_nodes - словарь
+    {rpc_url: rest_url} с LCD эндпоинтами тех же провайдеров.
+    Если REST адрес для узла не указан, используется сам RPC адрес.
+    node_limit - верхняя граница адаптивного лимита одновременных запросов
+    к каждому узлу (AdaptiveLimiter). Порядок обхода узлов и их здоровье
+    ведёт NodeManager. Если все узлы ответили перегрузкой, запрос
+    повторяется до retries раз с растущей паузой.
+    """
+
+    def __init__(self, rpc_nodes, rest_nodes=None, timeout=DEFAULT_TIMEOUT, pool_size=DEFAULT_POOL_SIZE,
+                 node_limit=DEFAULT_NODE_LIMIT, node_manager=None, metrics=None, retries=DEFAULT_RETRIES,
+                 sleep=time.sleep):
+        if not rpc_nodes:
+            raise ValueError("Должен быть указан хотя бы один RPC узел")
+        self.rpc_nodes = list(rpc_nodes)
+        self.rest_nodes = dict(rest_nodes or {})
+        self.timeout = timeout
+        self.retries = retries
+        self.sleep = sleep
+        self.nodes = node_manager or NodeManager(self.rpc_nodes)
+        self.metrics = metrics or get_metrics()
+
+        # Отложенный импорт: requests грузится ~70 мс, а --help и проверка настроек без него обходятся
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self._request_errors = requests.RequestException
+        self._timeout_errors = requests.Timeout
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": "Cosmos-Automation/1.0"})
+        adapter = HTTPAdapter(pool_connections=len(self.rpc_nodes) * 2, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.limiters = {rpc: AdaptiveLimiter(node_limit) for rpc in self.rpc_nodes}
+        self._lock = threading.Lock()
+        self._chain_id = None
+        self.stats = {"requests": 0, "errors": 0, "overloaded": 0, "retries": 0}
+
+    # ------------------------------------------------------------------
+    # Транспорт
+    # ------------------------------------------------------------------
+
+    def rest_url(self, rpc):
+        return self.rest_nodes.get(rpc, rpc).rstrip("/")
+
+    def _ordered_nodes(self, node=None):
+        """Узлы в порядке обхода: указанный узел первым, остальные по здоровью"""
+        nodes = self.nodes.ranked()
+        if node in nodes:
+            nodes.remove(node)
+            nodes.insert(0, node)
+        return nodes
+
+    @contextmanager
+    def node_slot(self, rpc):
+        """Слот адаптивного лимита узла, в том числе для вызовов `gaiad --node`"""
+        limiter = self.limiters.get(rpc)
+        if limiter is None:
+            yield
+            return
+        with limiter.slot():
+            yield
+
+    def record_outcome(self, rpc, kind=None, retry_after=None, op="get"):
+        """Итог обращения к узлу для его лимита: None - узел ответил, иначе вид ошибки"""
+        limiter = self.limiters.get(rpc)
+        if limiter is not None:
+            limiter.record(kind, retry_after)
+        if kind in OVERLOAD:
+            with self._lock:
+                self.stats["overloaded"] += 1
+            self.metrics.inc("rpc_overloaded_total", kind=kind, op=op, node=rpc)
+
+    def _request(self, rpc, method, url, op, **kwargs):
+        """HTTP запрос в слоте узла: (HTTP статус, JSON или None, задержка в секундах). op - метка для метрик"""
+        with self._lock:
+            self.stats["requests"] += 1
+        started = time.monotonic()
+        try:
+            with self.node_slot(rpc):
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except self._request_errors as e:
+            kind = TIMEOUT if isinstance(e, self._timeout_errors) else CONNECTION
+            with self._lock:
+                self.stats["errors"] += 1
+            self.nodes.record_failure(rpc)
+            self.record_outcome(rpc, kind, op=op)
+            self.metrics.inc("rpc_errors_total", op=op, node=rpc)
+            raise RPCError(f"{url}: {e}", kind) from e
+        latency = time.monotonic() - started
+        self.metrics.observe("rpc_request_seconds", latency, op=op, node=rpc)
+        kind = classify_status(response.status_code)
+        self.record_outcome(rpc, kind, parse_retry_after(response.headers.get("Retry-After")), op)
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        return response.status_code, data, latency
+
+    def _get_json(self, rpc, url, params=None, op="get"):
+        """GET запрос: (HTTP статус, JSON или None, задержка в секундах)"""
+        return self._request(rpc, "GET", url, op, params=params)
+
+    def _post_json(self, rpc, url, payload, op="post"):
+        """POST запрос с JSON телом: (HTTP статус, JSON или None, задержка в секундах)"""
+        return self._request(rpc, "POST", url, op, json=payload)
+
+    def retrying(self, request):
+        """Выполняет request(); если все узлы перегружены - повторяет с паузой до retries раз.
+        request - любая операция над узлами клиента, бросающая RPCError (например, рассылка транзакции)"""
+        for attempt in range(self.retries + 1):
+            try:
+                return request()
+            except RPCError as e:
+                if not e.retryable or attempt == self.retries:
+                    raise
+                # Ждём хотя бы окончания паузы ближайшего узла после 429
+                wait = min(limiter.cooldown_remaining() for limiter in self.limiters.values())
+                with self._lock:
+                    self.stats["retries"] += 1
+                self.metrics.inc("rpc_retries_total", kind=e.kind)
+                self.sleep(retry_delay(attempt, wait))
+
+    def limits_snapshot(self):
+        """Адаптивные лимиты узлов для экспорта статистики"""
+        return {rpc: limiter.to_dict() for rpc, limiter in self.limiters.items()}
+
+    def rpc_call(self, method, params=None, node=None, not_found_ok=False):
+        """JSON-RPC вызов Tendermint (GET /<method>), возвращает поле result.
+
+        При not_found_ok ответ узла "not found" возвращается как None.
+        """
+        return self.retrying(lambda: self._rpc_call(method, params, node, not_found_ok))
+
+    def _rpc_call(self, method, params, node, not_found_ok):
+        last_error = None
+        for rpc in self._ordered_nodes(node):
+            try:
+                status, data, latency = self._get_json(rpc, f"{rpc.rstrip('/')}/{method}", params, op=method)
+            except RPCError as e:
+                last_error = _prefer(last_error, e)
+                continue
+            if status == 200 and isinstance(data, dict) and "result" in data:
+                self.nodes.record_success(rpc, latency, _status_height(method, data["result"]))
+                return data["result"]
+            error = data.get("error") if isinstance(data, dict) else None
+            if not_found_ok and error and "not found" in str(error).lower():
+                self.nodes.record_success(rpc, latency)
+                return None
+            self.nodes.record_failure(rpc)
+            last_error = _prefer(last_error, RPCError(f"{rpc}/{method}: HTTP {status} {error or ''}".strip(),
+                                                      _error_kind(status)))
+        raise last_error or RPCError(f"{method}: нет доступных узлов", UNAVAILABLE)
+
+    def rest_get(self, path, params=None, node=None, not_found_ok=False):
+        """GET запрос к REST (LCD) API. При not_found_ok возвращает None на 404"""
+        return self.retrying(lambda: self._rest_get(path, params, node, not_found_ok))
+
+    def _rest_get(self, path, params, node, not_found_ok):
+        last_error = None
+        for rpc in self._ordered_nodes(node):
+            try:
+                status, data, latency = self._get_json(rpc, f"{self.rest_url(rpc)}{path}", params,
+                                                       op=_path_label(path))
+            except RPCError as e:
+                last_error = _prefer(last_error, e)
+                continue
+            if status == 200 and isinstance(data, dict):
+                self.nodes.record_success(rpc, latency)
+                return data
+            if not_found_ok and _is_not_found(status, data):
+                self.nodes.record_success(rpc, latency)
+                return None
+            self.nodes.record_failure(rpc)
+            message = data.get("message") if isinstance(data, dict) else None
+            last_error = _prefer(last_error, RPCError(
+                f"{self.rest_url(rpc)}{path}: HTTP {status} {message or ''}".strip(), _error_kind(status)))
+        raise last_error or RPCError(f"{path}: нет доступных узлов", UNAVAILABLE)
+
+    # ------------------------------------------------------------------
+    # Запросы состояния
+    # ------------------------------------------------------------------
+
+    def get_balances(self, address, node=None):
+        """Все балансы адреса, аналог `gaiad q bank balances`"""
+        balances = []
+        next_key = None
+        while True:
+            params = {"pagination.key": next_key} if next_key else None
+            data = self.rest_get(f"/cosmos/bank/v1beta1/balances/{address}", params, node=node)
+            balances.extend(data.get("balances", []))
+            next_key = (data.get("pagination") or {}).get("next_key")
+            if not next_key:
+                return balances
+
+    def get_balance(self, address, denom="uatom", node=None):
+        """Баланс адреса в указанном денноме (int)"""
+        balances = self.get_balances(address, node=node)
+        return next((int(b["amount"]) for b in balances if b["denom"] == denom), 0)
+
+    def get_account(self, address, node=None):
+        """(account_number, sequence) аккаунта для офлайн-подписи"""
+        data = self.rest_get(f"/cosmos/auth/v1beta1/accounts/{address}", node=node)
+        account = data.get("account") or {}
+        # У вестинговых аккаунтов поля лежат в base_vesting_account.base_account
+        while "account_number" not in account:
+            nested = account.get("base_account") or account.get("base_vesting_account")
+            if not nested:
+                raise RPCError(f"Неизвестный формат аккаунта {address}")
+            account = nested
+        return int(account["account_number"]), int(account.get("sequence", 0))
+
+    def get_delegator_validators(self, address, node=None):
+        """Адреса валидаторов, у которых есть делегации адреса"""
+        data = self.rest_get(f"/cosmos/distribution/v1beta1/delegators/{address}/validators", node=node)
+        return data.get("validators", [])
+
+    def get_chain_id(self):
+        """chain-id сети из /status (кешируется)"""
+        if self._chain_id is None:
+            self._chain_id = self.rpc_call("status")["node_info"]["network"]
+        return self._chain_id
+
+    def get_rewards(self, address, node=None):
+        """Ответ `gaiad q distribution rewards`: rewards по валидаторам и total"""
+        return self.rest_get(f"/cosmos/distribution/v1beta1/delegators/{address}/rewards", node=node)
+
+    def get_total_rewards(self, address, denom="uatom", node=None):
+        """Сумма неснятых наград в указанном денноме (float)"""
+        return rewards_total(self.get_rewards(address, node=node), denom)
+
+    def get_grants(self, granter, grantee, msg_type_url=None, node=None):
+        """Разрешения authz granter -> grantee (authorization, expiration). Пустой список, если их нет"""
+        params = {"granter": granter, "grantee": grantee}
+        if msg_type_url:
+            params["msg_type_url"] = msg_type_url
+        data = self.rest_get("/cosmos/authz/v1beta1/grants", params, node=node, not_found_ok=True)
+        return (data or {}).get("grants") or []
+
+    # ------------------------------------------------------------------
+    # Транзакции и блоки
+    # ------------------------------------------------------------------
+
+    def get_tx(self, tx_hash, node=None):
+        """tx_response транзакции, аналог `gaiad q tx`. None если не найдена"""
+        data = self.rest_get(f"/cosmos/tx/v1beta1/txs/{tx_hash}", node=node, not_found_ok=True)
+        if data is None:
+            return None
+        return data.get("tx_response")
+
+    def broadcast_tx_sync(self, tx_bytes, node):
+        """broadcast_tx_sync подписанных байт (base64) на один конкретный узел.
+
+        Возвращает результат CheckTx (code, log, hash). Ошибки JSON-RPC
+        (например, "tx already exists in cache") поднимаются как RPCError.
+        """
+        payload = {"jsonrpc": "2.0", "id": 1, "method": "broadcast_tx_sync", "params": {"tx": tx_bytes}}
+        status, data, latency = self._post_json(node, node.rstrip("/"), payload, op="broadcast_tx_sync")
+        if status == 200 and isinstance(data, dict) and "result" in data:
+            self.nodes.record_success(node, latency)
+            return data["result"]
+        error = data.get("error") if isinstance(data, dict) else None
+        if isinstance(error, dict) and error.get("data"):
+            # Узел ответил осмысленной ошибкой - это не сбой узла
+            self.nodes.record_success(node, latency)
+            raise RPCError(str(error["data"]))
+        self.nodes.record_failure(node)
+        message = f"{node}/broadcast_tx_sync: HTTP {status} {error or ''}".strip()
+        raise RPCError(message, classify_status(status) or classify_text(message))
+
+    def simulate_tx(self, tx_bytes, node=None):
+        """gas_used симуляции подписанной транзакции (base64) через REST /simulate"""
+        return self.retrying(lambda: self._simulate_tx(tx_bytes, node))
+
+    def _simulate_tx(self, tx_bytes, node):
+        last_error = None
+        for rpc in self._ordered_nodes(node):
+            url = f"{self.rest_url(rpc)}/cosmos/tx/v1beta1/simulate"
+            try:
+                status, data, latency = self._post_json(rpc, url, {"tx_bytes": tx_bytes}, op="simulate")
+            except RPCError as e:
+                last_error = _prefer(last_error, e)
+                continue
+            if status == 200 and isinstance(data, dict) and "gas_info" in data:
+                self.nodes.record_success(rpc, latency)
+                return int(data["gas_info"]["gas_used"])
+            message = data.get("message") if isinstance(data, dict) else None
+            if message and status < 500 and status != 429:
+                # Транзакция не проходит симуляцию - другой узел ответит так же
+                self.nodes.record_success(rpc, latency)
+                raise RPCError(f"simulate: {message}")
+            self.nodes.record_failure(rpc)
+            last_error = _prefer(last_error, RPCError(f"{url}: HTTP {status}", _error_kind(status)))
+        raise last_error or RPCError("simulate: нет доступных узлов", UNAVAILABLE)
+
+    def get_tx_result(self, tx_hash, node=None):
+        """Результат транзакции через Tendermint /tx (hash, height, tx_result). None если не найдена"""
+        return self.rpc_call("tx", {"hash": f"0x{tx_hash}"}, node=node, not_found_ok=True)
+
+    def search_txs(self, query, page=1, per_page=30, order_by="desc", node=None):
+        """Поиск транзакций по событиям через Tendermint /tx_search"""
+        result = self.rpc_call("tx_search", {
+            "query": f'"{query}"',
+            "page": str(page),
+            "per_page": str(per_page),
+            "order_by": f'"{order_by}"',
+        }, node=node)
+        return result.get("txs", [])
+
+    def get_block(self, height=None, node=None):
+        """Блок по высоте (последний, если высота не указана)"""
+        params = {"height": str(height)} if height else None
+        return self.rpc_call("block", params, node=node)
+
+    def get_block_results(self, height, node=None):
+        """Результаты исполнения транзакций блока"""
+        return self.rpc_call("block_results", {"height": str(height)}, node=node)
+
+    def get_block_max_gas(self, node=None):
+        """Лимит газа блока из consensus_params. None, если лимита нет (max_gas = -1)"""
+        params = self.rpc_call("consensus_params", node=node).get("consensus_params") or {}
+        max_gas = int((params.get("block") or {}).get("max_gas", -1))
+        return max_gas if max_gas > 0 else None
+
+    def get_latest_height(self, node=None):
+        status = self.rpc_call("status", node=node)
+        return int(status["sync_info"]["latest_block_height"])
+
+    def probe_nodes(self):
+        """Опрашивает /status всех узлов параллельно (как js/health-check.js)"""
+        def probe(rpc):
+            try:
+                status, data, latency = self._get_json(rpc, f"{rpc.rstrip('/')}/status", op="status")
+            except RPCError:
+                return
+            result = data.get("result") if isinstance(data, dict) else None
+            if status != 200 or not isinstance(result, dict) or "sync_info" not in result:
+                self.nodes.record_failure(rpc)
+                return
+            # Для догоняющего сеть узла высота не учитывается
+            self.nodes.record_success(rpc, latency, _status_height("status", result))
+
+        with ThreadPoolExecutor(max_workers=len(self.rpc_nodes)) as pool:
+            list(pool.map(probe, self.rpc_nodes))
+        return self.nodes.snapshot()
+
+    def close(self):
+        self.session.close()
+
+
+def parse_time(value):
+    """RFC 3339 из RPC/REST ("2026-01-01T00:00:00Z", с наносекундами) -> unix time. None, если времени нет"""
+    if not value:
+        return None
+    value = value.rstrip("Z").split(".")[0]
+    try:
+        return datetime.fromisoformat(value + "+00:00").timestamp()
+    except ValueError:
+        return None
+
+
+def rewards_total(rewards_data, denom="uatom"):
+    """Сумма наград в денноме из ответа distribution rewards"""
+    return next((float(c["amount"]) for c in rewards_data.get("total") or [] if c["denom"] == denom), 0.0)
+
+
+# bech32 адрес любой сети (cosmos1..., mantravaloper1...) или хеш транзакции
+_ADDRESS_SEGMENT_RE = re.compile(r"^([a-z]+(valoper)?1[02-9ac-hj-np-z]{38,}|[0-9A-Fa-f]{64})$")
+
+
+def _path_label(path):
+    """REST путь без адресов и хешей - метка операции для метрик"""
+    return "/".join("{}" if _ADDRESS_SEGMENT_RE.match(part) else part for part in path.split("/"))
+
+
+def _status_height(method, result):
+    """Высота блока из ответа /status синхронизированного узла"""
+    if method != "status" or not isinstance(result, dict):
+        return None
+    sync_info = result.get("sync_info") or {}
+    if sync_info.get("catching_up"):
+        return None
+    return sync_info.get("latest_block_height")
+
+
+def _error_kind(status):
+    """Вид ошибки ответа узла не 200: 2xx без ожидаемых полей - ответ по существу"""
+    kind = classify_status(status)
+    return REJECTED if kind in (None, NOT_FOUND) else kind
+
+
+def _is_not_found(status, data):
+    if status == 404:
+        return True
+    # gRPC-gateway отдаёт NotFound (code 5) и при HTTP 400
+    if isinstance(data, dict) and data.get("code") == 5:
+        return True
+    message = str(data.get("message", "")) if isinstance(data, dict) else ""
+    return "not found" in message.lower()
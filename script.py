@@ -1,307 +1,1373 @@
+import argparse
+import base64
+import functools
 import subprocess
+import sys
+import threading
 import time
 import json
+import logging
 import random
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import datetime
 from colorama import init, Fore, Style
 
+from config import BROADCAST_MODES, SIGN_MODES, ConfigError, configure, get_settings, set_settings, use_settings
+from address_cache import DEFAULT_CACHE_FILE, AddressCache
+from authz import AuthzWithdrawer
+from broadcaster import Broadcaster, SigningError
+from chains import chain_file, chain_settings
+from signer import Signer, convert_address, msg_send, withdraw_all_msgs
+from gas_oracle import GasEstimate, GasOracle
+from fee_optimizer import FeeOptimizer
+from gas_simulator import GasSimulator
+from indexer import CONTROLLER, EXCHANGE, WALLET, WalletIndex
+from journal import BROADCAST, CONFIRMED, DONE, FAILED, PLANNED, SKIPPED, RunJournal
+from logger import get_logger
+from metrics import get_metrics, start_http_server
+from planner import build_plan, fee_for
+from read_cache import ReadCache
+from rate_limiter import THROTTLED, UNAVAILABLE, classify_text, retry_delay
+from rpc_client import CosmosRPCClient, RPCError
+from snapshot import snapshot_wallet, take_snapshot
+from tx_confirmer import TxConfirmer, parse_tx_parts
+
 init()
 
-GAS_PRICE = 0.005
-NUM_WALLETS = 119
+# Пороги, попытки, задержки, узлы и параллельность - в config.Settings (get_settings()).
+# Аргументы командной строки применяются к ним через config.configure().
 
-# RPC узлы для всех операций
-RPC_NODES = [
-    "https://cosmos-rpc.publicnode.com:443",
-    "https://cosmos-rpc.polkachu.com:443",
-    "https://cosmoshub-mainnet-rpc.itrocket.net"
-]
+# Код выхода режима плана без действий: `script.py --plan && script.py` запускает проход только при необходимости
+EXIT_NOTHING_TO_DO = 3
 
-def get_random_rpc():
-    """Получить случайный RPC узел"""
-    return random.choice(RPC_NODES)
+_address_caches = {}       # Бинарник сети -> AddressCache: сети с одним keyring делят кеш
+_address_caches_lock = threading.Lock()
 
-def run_command(command):
-    result = subprocess.run(command, shell=True, capture_output=True, text=True)
+# Функция паузы; benchmarks/bench_pipeline.py подменяет её через configure_waits()
+_sleep = time.sleep
+_pause_between_wallets = True
+
+_stats_lock = threading.Lock()
+
+_wallet_context = threading.local()
+_tag_output = False
+_tag_chains = False
+
+
+class ChainContext:
+    """Сеть процесса: её настройки и объекты - клиент узлов, кеши, журнал, статистика прохода.
+
+    settings=None - настройки процесса (одна сеть, запуск без CHAINS).
+    Объекты создаются get_*() при первом обращении внутри chain_scope().
+    """
+
+    def __init__(self, name, settings=None, suffix=None):
+        self.name = name
+        self.settings = settings
+        self.suffix = suffix        # Имя сети в файлах статистики и плана (None - без суффикса)
+        self.rpc_client = None
+        self.read_cache = None
+        self.tx_confirmer = None
+        self.gas_oracle = None
+        self.gas_simulator = None
+        self.fee_optimizer = None
+        self.broadcaster = None
+        self.journal = None
+        self.authz_withdrawer = None
+        self.wallet_index = None
+        # Статистика прохода: источники оценок газа, out of gas и исходы транзакций
+        self.run_stats = {"gas_sources": {}, "out_of_gas": {}, "transactions": {}}
+        self.tx_slots = None
+
+
+_default_chain = None
+_chain_local = threading.local()
+
+def current_chain():
+    """Сеть, с которой работает поток; вне chain_scope() - сеть настроек процесса"""
+    global _default_chain
+    chain = getattr(_chain_local, "chain", None)
+    if chain is not None:
+        return chain
+    if _default_chain is None:
+        _default_chain = ChainContext(get_settings().chain)
+    return _default_chain
+
+@contextmanager
+def chain_scope(chain):
+    """get_*() и get_settings() в этом потоке относятся к сети chain"""
+    previous = getattr(_chain_local, "chain", None)
+    _chain_local.chain = chain
+    try:
+        with use_settings(chain.settings):
+            yield chain
+    finally:
+        _chain_local.chain = previous
+
+def in_chain(fn):
+    """fn, выполняемая в сети вызывающего потока (задания пулов потоков и планировщика)"""
+    chain = current_chain()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with chain_scope(chain):
+            return fn(*args, **kwargs)
+    return run
+
+def chain_contexts(settings):
+    """Сети процесса из CHAINS (профили chains.py); без CHAINS - одна сеть настроек процесса.
+
+    ConfigError при ошибке в профилях. Несколько сетей помечают вывод своим именем.
+    """
+    global _tag_chains
+    if not settings.chains:
+        return [current_chain()]
+    chains = [ChainContext(chain.chain, chain, None if chain.chain == settings.chain else chain.chain)
+              for chain in chain_settings(settings)]
+    _tag_chains = len(chains) > 1
+    return chains
+
+def denom():
+    """Деном сети потока"""
+    return get_settings().denom
+
+def out(message=""):
+    """Вывод через консольный хендлер логгера (LOG_TO_CONSOLE), одной очередью с событиями журнала.
+
+    В параллельном режиме строки помечаются кошельком, при нескольких сетях - сетью.
+    """
+    wallet_name = getattr(_wallet_context, "name", None)
+    if _tag_output and wallet_name:
+        tag = f"[ {wallet_name} ]"
+        message = "\n".join(
+            line if not line.strip() or tag in line else f"{Fore.WHITE}{tag}{Fore.RESET} {line}"
+            for line in message.split("\n")
+        )
+    if _tag_chains:
+        tag = f"{Fore.MAGENTA}<{current_chain().name}>{Fore.RESET}"
+        message = "\n".join(line if not line.strip() else f"{tag} {line}" for line in message.split("\n"))
+    get_logger().output(message)
+
+def configure_waits(sleep=None, wallet_delay_range=None, block_time=None, pause_between_wallets=None):
+    """Подменяет ожидания прохода: функцию паузы, паузу между кошельками и время блока.
+
+    pause_between_wallets=False отключает паузу после кошелька с действиями
+    (daemon.py разносит кошельки по времени своим расписанием).
+    """
+    global _sleep, _pause_between_wallets
+    if sleep is not None:
+        _sleep = sleep
+    if pause_between_wallets is not None:
+        _pause_between_wallets = pause_between_wallets
+    overrides = {}
+    if wallet_delay_range is not None:
+        overrides["min_delay"], overrides["max_delay"] = wallet_delay_range
+    if block_time is not None:
+        overrides["block_time"] = block_time
+    if overrides:
+        set_settings(replace(get_settings(), **overrides))
+
+def tx_outcome(tx_status):
+    """Имя исхода транзакции для статистики"""
+    if tx_status is True:
+        return "confirmed"
+    return tx_status or "failed"
+
+def count_stat(section, key, amount=1):
+    with _stats_lock:
+        bucket = current_chain().run_stats.setdefault(section, {})
+        bucket[key] = bucket.get(key, 0) + amount
+
+@contextmanager
+def tx_slot():
+    """Ограничивает число транзакций сети, ожидающих подтверждения, во всех потоках"""
+    tx_slots = current_chain().tx_slots
+    if tx_slots is None:
+        yield
+        return
+    with tx_slots:
+        yield
+
+def get_rpc_client():
+    """Общий HTTP клиент сети с пулом соединений к RPC узлам"""
+    chain = current_chain()
+    if chain.rpc_client is None:
+        settings = get_settings()
+        chain.rpc_client = CosmosRPCClient(list(settings.rpc_nodes), dict(settings.rest_nodes),
+                                           timeout=settings.rpc_timeout, node_limit=settings.node_concurrency,
+                                           retries=settings.rpc_retries)
+    return chain.rpc_client
+
+def get_read_cache():
+    """Кеш баланса, наград и валидаторов в пределах блока поверх общего клиента"""
+    chain = current_chain()
+    if chain.read_cache is None:
+        chain.read_cache = ReadCache(get_rpc_client())
+    return chain.read_cache
+
+def get_best_rpc():
+    """Самый быстрый синхронизированный RPC узел"""
+    return get_rpc_client().nodes.pick()
+
+def _run(command):
+    # Метка - подкоманда gaiad без аргументов: "tx bank", "keys show", "query bank"
+    with get_metrics().timer("subprocess_seconds", command=" ".join(command.split()[1:3])):
+        result = subprocess.run(command, shell=True, capture_output=True, text=True)
     if result.returncode != 0:
-        print(f"{Fore.RED}Ошибка выполнения команды '{command}': {result.stderr}{Fore.RESET}")
+        out(f"{Fore.RED}Ошибка выполнения команды '{command}': {result.stderr}{Fore.RESET}")
+    return result
+
+def run_command(command):
+    return _run(command).stdout.strip()
+
+def broadcast_tx(command, rpc):
+    """Отправляет транзакцию gaiad через узел rpc с учётом его адаптивного лимита.
+
+    Отказ узла из-за перегрузки (429, 5xx в stderr) повторяется: транзакция
+    до узла не дошла. Таймаут не повторяется - она могла быть принята.
+    """
+    client = get_rpc_client()
+    for attempt in range(get_settings().rpc_retries + 1):
+        with client.node_slot(rpc):
+            result = _run(f"{command} --node {rpc} -y -o json")
+        if result.returncode == 0:
+            client.record_outcome(rpc, op="gaiad")
+            return result.stdout.strip()
+        kind = classify_text(result.stderr)
+        client.record_outcome(rpc, kind, op="gaiad")
+        if kind not in (THROTTLED, UNAVAILABLE) or attempt == get_settings().rpc_retries:
+            break
+        delay = retry_delay(attempt, client.limiters[rpc].cooldown_remaining() if rpc in client.limiters else 0.0)
+        out(f"{Fore.YELLOW}⚠️ Узел {rpc} перегружен ({kind}), повтор через {delay:.1f} сек{Fore.RESET}")
+        _sleep(delay)
     return result.stdout.strip()
 
-def get_withdraw_gas_estimate(retries=5):
-    for attempt in range(retries):
-        try:
-            result = subprocess.run(["bash", "calculate_gas.sh"], capture_output=True, text=True, check=True)
-            gas_used = result.stdout.strip()
-            if gas_used and gas_used.replace('.', '').isdigit():
-                gas_value = int(round(float(gas_used)))
-                print(f"{Fore.YELLOW}Получен актуальный gas_used для снятия наград: {gas_value}{Fore.RESET}")
-                return gas_value
-        except subprocess.CalledProcessError:
-            print(f"{Fore.RED}❌ Ошибка выполнения calculate_gas.sh. Попытка {attempt + 1}/{retries}{Fore.RESET}")
-    print(f"{Fore.YELLOW}⚠️ Не удалось получить gas_used для снятия наград. Используем запасное значение (900000).{Fore.RESET}")
-    return 900000
-
-def get_send_gas_estimate(retries=5):
-    for attempt in range(retries):
+def get_broadcaster():
+    """Подпись один раз и рассылка одних байт на несколько узлов"""
+    chain = current_chain()
+    if chain.broadcaster is None:
+        settings = get_settings()
+        signer = None
+        if settings.sign_mode == "local":
+            try:
+                signer = Signer(get_rpc_client(), settings.chain_bin, settings.bech32_prefix)
+            except SigningError as e:
+                out(f"{Fore.YELLOW}⚠️ {e}. Подписываем через {settings.chain_bin}{Fore.RESET}")
+        chain.broadcaster = Broadcaster(get_rpc_client(), gaiad_bin=settings.chain_bin, signer=signer)
+    return chain.broadcaster
+
+def submit_tx(tx_args, msgs, wallet_name, addr, fees, gas, kind):
+    """Подписывает и отправляет транзакцию, возвращает её хеш или None при отказе.
+
+    tx_args - аргументы после `gaiad tx`, например ["bank", "send", from, to, amount];
+    msgs - те же сообщения для подписи внутри процесса (см. signer.py);
+    kind - вид операции для журнала (withdraw, send, combined).
+    """
+    started = time.monotonic()
+    tx_hash = _broadcast_signed(tx_args, msgs, wallet_name, addr, fees, gas)
+    get_logger().log_event(
+        "broadcast", f"[{wallet_name}] {kind}: {tx_hash or 'не отправлена'}", console=False,
+        wallet=wallet_name, operation=kind, tx_hash=tx_hash, success=bool(tx_hash), fees=fees, gas=gas,
+        duration=round(time.monotonic() - started, 3),
+    )
+    if tx_hash:
+        get_read_cache().watch(tx_hash, addr)
+        journal_record(BROADCAST, kind=kind, tx_hash=tx_hash)
+    else:
+        journal_record(FAILED, kind=kind, detail="транзакция не отправлена")
+    return tx_hash
+
+def _broadcast_signed(tx_args, msgs, wallet_name, addr, fees, gas):
+    settings = get_settings()
+    if settings.broadcast_mode == "gaiad":
+        tx = broadcast_tx(f"{settings.chain_bin} tx {' '.join(tx_args)} --from {wallet_name} "
+                          f"--fees {fees}{settings.denom} --gas {gas}", get_best_rpc())
         try:
-            result = subprocess.run(["bash", "calculate_send_gas.sh"], capture_output=True, text=True, check=True)
-            gas_used = result.stdout.strip()
-            if gas_used and gas_used.replace('.', '').isdigit():
-                gas_value = int(round(float(gas_used)))
-                print(f"{Fore.YELLOW}Получен актуальный gas_used для отправки: {gas_value}{Fore.RESET}")
-                return gas_value
-        except subprocess.CalledProcessError:
-            print(f"{Fore.RED}❌ Ошибка выполнения calculate_send_gas.sh. Попытка {attempt + 1}/{retries}{Fore.RESET}")
-    print(f"{Fore.YELLOW}⚠️ Не удалось получить gas_used для отправки. Используем запасное значение (250000).{Fore.RESET}")
-    return 250000
+            tx_json = json.loads(tx)
+        except json.JSONDecodeError:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Ошибка разбора JSON транзакции{Style.RESET_ALL}{Fore.RESET}")
+            return None
+        if int(tx_json.get("code", 0)) != 0:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED} Транзакция отклонена (code {tx_json.get('code')}): {tx_json.get('raw_log', '')}{Fore.RESET}")
+            return None
+        return tx_json.get("txhash", "")
+
+    try:
+        result = get_broadcaster().sign_and_broadcast(tx_args, msgs, wallet_name, addr, fees, gas, settings.denom)
+    except (SigningError, RPCError) as e:
+        out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Ошибка подписи транзакции: {e}{Style.RESET_ALL}{Fore.RESET}")
+        return None
+    if not result.accepted:
+        out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED} Транзакция отклонена узлами (code {result.code}): {result.log}{Fore.RESET}")
+        return None
+    out(f"{Fore.WHITE}📡 [ {wallet_name} ]{Fore.CYAN} Принята узлом {result.node} за {result.latency:.2f} сек{Fore.RESET}")
+    return result.tx_hash
+
+def get_gas_oracle():
+    """Общая оценка газа: один расчёт на вид сообщения за ESTIMATE_TTL"""
+    chain = current_chain()
+    if chain.gas_oracle is None:
+        settings = get_settings()
+        chain.gas_oracle = GasOracle(get_read_cache(), ttl=settings.gas_estimate_ttl,
+                                     fallback_gas=settings.fallback_gas)
+    return chain.gas_oracle
+
+def _report_gas_estimate(estimate, operation):
+    if estimate.source == "fallback":
+        out(f"{Fore.YELLOW}⚠️ Не удалось получить gas_used для {operation}. Используем запасное значение ({estimate.gas}).{Fore.RESET}")
+    else:
+        out(f"{Fore.YELLOW}Получен актуальный gas_used для {operation}: {estimate.gas} "
+            f"(источник: {estimate.source}, образцов: {estimate.samples}){Fore.RESET}")
+    return estimate.gas
+
+def get_gas_simulator():
+    """Симуляция конкретных транзакций с откатом на историческую оценку"""
+    chain = current_chain()
+    if chain.gas_simulator is None:
+        settings = get_settings()
+        chain.gas_simulator = GasSimulator(get_gas_oracle(), gaiad_bin=settings.chain_bin,
+                                           signer=get_broadcaster().signer, gas_price=settings.gas_price)
+    return chain.gas_simulator
+
+def simulate_withdraw_gas(wallet_name, validators, addr=None):
+    msgs = (lambda: withdraw_all_msgs(addr, get_read_cache().get_delegator_validators(addr))) if addr else None
+    estimate = get_gas_simulator().withdraw_gas(wallet_name, validators, get_best_rpc(), addr, msgs, denom())
+    count_stat("gas_sources", f"withdraw:{estimate.source}")
+    return _report_gas_estimate(estimate, "снятия наград")
+
+def simulate_send_gas(wallet_name, addr, target_wallet, amount):
+    estimate = get_gas_simulator().send_gas(wallet_name, addr, target_wallet, amount, denom(), get_best_rpc())
+    count_stat("gas_sources", f"send:{estimate.source}")
+    return _report_gas_estimate(estimate, "отправки")
+
+def get_withdraw_gas_estimate(validators=1):
+    return _report_gas_estimate(get_gas_oracle().withdraw_gas(validators), "снятия наград")
+
+def get_send_gas_estimate():
+    return _report_gas_estimate(get_gas_oracle().send_gas(), "отправки")
+
+def get_fee_optimizer():
+    """Порог снятия по комиссии и расписание проверок кошельков по скорости начисления наград"""
+    chain = current_chain()
+    if chain.fee_optimizer is None:
+        settings = get_settings()
+        chain.fee_optimizer = FeeOptimizer(get_gas_oracle(), settings.gas_price, settings.max_withdraw_fee_ratio,
+                                           settings.min_rewards_to_withdraw, settings.max_recheck_interval,
+                                           path=settings.reward_rates_file)
+    return chain.fee_optimizer
+
+def withdraw_threshold(validators):
+    """Порог наград для снятия: MIN_REWARDS_TO_WITHDRAW или больше, если комиссия велика"""
+    return get_fee_optimizer().threshold(validators)[0]
 
 def calculate_fees(gas_used):
-    return int(gas_used * GAS_PRICE) + 1
+    return fee_for(gas_used, get_settings().gas_price)
+
+def get_tx_confirmer():
+    """Общий движок подтверждения транзакций для всех кошельков сети"""
+    chain = current_chain()
+    if chain.tx_confirmer is None:
+        settings = get_settings()
+        chain.tx_confirmer = TxConfirmer(get_rpc_client(), block_time=settings.block_time,
+                                         timeout=settings.tx_confirm_timeout, on_done=get_read_cache().tx_done)
+    return chain.tx_confirmer
+
+def wait_transaction(tx_hash, timeout=None):
+    """Ждёт включения транзакции в блок и печатает результат. Возвращает PendingTx"""
+    pending = get_tx_confirmer().wait(tx_hash, timeout=timeout)
+    record_tx_outcome(pending)
+    get_logger().log_event(
+        "tx_result", f"{tx_hash}: {tx_outcome(pending.status if pending.found else False)}", console=False,
+        chain=current_chain().name, wallet=getattr(_wallet_context, "name", None), tx_hash=tx_hash, success=pending.status is True,
+        code=pending.code, height=pending.height, duration=round(pending.latency or 0, 3), checks=pending.checks,
+    )
+    if not pending.found:
+        out(f"{Fore.YELLOW}⚠️ Транзакция {tx_hash} не подтверждена за {pending.latency:.0f} сек ({pending.checks} проверок){Fore.RESET}")
+    elif pending.status is not True:
+        out(f"{Fore.RED}[Ошибка] Код ошибки {pending.code}: {pending.log}{Fore.RESET}")
+    else:
+        out(f"{Fore.CYAN}Транзакция {tx_hash} включена в блок {pending.height} через {pending.latency:.1f} сек{Fore.RESET}")
+    return pending
+
+def get_journal():
+    """Журнал прохода для продолжения после сбоя: файл общий, проходы у каждой сети свои"""
+    chain = current_chain()
+    if chain.journal is None:
+        chain.journal = RunJournal(chain=chain.name)
+    return chain.journal
 
-def check_transaction(tx_hash, max_retries=10, wait_time=30):
+def journal_record(state, wallet_name=None, **fields):
+    """Событие журнала для кошелька (по умолчанию - обрабатываемого в этом потоке)"""
+    wallet_name = wallet_name or getattr(_wallet_context, "name", None)
+    if wallet_name and current_chain().journal is not None:
+        get_journal().record(wallet_name, state, **fields)
+
+def record_tx_outcome(pending, wallet_name=None):
+    if pending.status is True:
+        journal_record(CONFIRMED, wallet_name, tx_hash=pending.tx_hash, detail=f"height {pending.height}")
+    elif pending.found:
+        journal_record(FAILED, wallet_name, tx_hash=pending.tx_hash, detail=f"code {pending.code}")
+    else:
+        journal_record(FAILED, wallet_name, tx_hash=pending.tx_hash, detail="не найдена")
+
+def reconcile_journal(timeout=None):
+    """Итоги транзакций, отправленных до сбоя: все хеши проверяются одновременно"""
+    pending_txs = get_journal().pending_txs()
+    if not pending_txs:
+        return
+    out(f"{Fore.CYAN}🔁 Сверяем {len(pending_txs)} транзакций из журнала...{Fore.RESET}")
+    confirmer = get_tx_confirmer()
+    timeout = timeout or get_settings().reconcile_timeout
+    waits = [(wallet_name, kind, confirmer.submit(tx_hash, timeout=timeout))
+             for wallet_name, kind, tx_hash in pending_txs]
+    for wallet_name, kind, pending in waits:
+        pending.done.wait()
+        record_tx_outcome(pending, wallet_name)
+        result = "включена" if pending.status is True else ("ошибка" if pending.found else "не найдена")
+        out(f"   {Fore.YELLOW}├─ {wallet_name} {kind}: {pending.tx_hash[:16]}... {result}{Fore.RESET}")
+
+def check_transaction(tx_hash, timeout=None):
+    """Ждёт включения транзакции в блок. Возвращает True, "out_of_gas" или False"""
     if not tx_hash:
         return False
-    for attempt in range(max_retries):
-        for rpc in RPC_NODES:
-            tx_info = run_command(f"gaiad q tx {tx_hash} --node {rpc} -o json")
-            if not tx_info:
-                continue
-            try:
-                tx_data = json.loads(tx_info)
-                if tx_data.get("code", 1) == 0:
-                    return True
-                elif tx_data.get("code") == 11 and "out of gas" in tx_data.get("raw_log", "").lower():
-                    print(f"{Fore.RED}[Ошибка] Код ошибки {tx_data.get('code')}: {tx_data.get('raw_log')}{Fore.RESET}")
-                    return "out_of_gas"
-                else:
-                    print(f"{Fore.RED}[Ошибка] Код ошибки {tx_data.get('code')}: {tx_data.get('raw_log')}{Fore.RESET}")
-                    return False
-            except json.JSONDecodeError:
-                print(f"{Fore.CYAN}[Ожидание] Транзакция {tx_hash} не найдена на {rpc}. Попытка {attempt + 1}/{max_retries}...{Fore.RESET}")
-                continue
-        time.sleep(wait_time)
-    print(f"{Fore.YELLOW}⚠️ Транзакция {tx_hash} не подтверждена после {max_retries} попыток{Fore.RESET}")
-    return False
+    pending = wait_transaction(tx_hash, timeout)
+    return pending.status if pending.found else False
 
 def get_current_balance(addr):
-    rpc = get_random_rpc()
-    balance_json = run_command(f"gaiad q bank balances {addr} --node {rpc} -o json")
     try:
-        balance_data = json.loads(balance_json)
-        return next((int(b["amount"]) for b in balance_data.get("balances", []) if b["denom"] == "uatom"), 0)
-    except (json.JSONDecodeError, KeyError, ValueError):
-        return 0
+        return get_read_cache().get_balance(addr, denom(), node=get_best_rpc())
+    except (RPCError, KeyError, ValueError) as e:
+        out(f"{Fore.RED}Ошибка получения баланса {addr}: {e}{Fore.RESET}")
+        return None  # Не 0: недоступный узел не должен выглядеть пустым кошельком
 
-def main():
+def get_address_cache():
+    """Кеш адресов ключей keyring бинарника сети, переживающий перезапуски"""
+    settings = get_settings()
+    with _address_caches_lock:
+        cache = _address_caches.get(settings.chain_bin)
+        if cache is None:
+            path = DEFAULT_CACHE_FILE if settings.chain_bin == "gaiad" else chain_file(DEFAULT_CACHE_FILE,
+                                                                                        settings.chain_bin)
+            cache = _address_caches[settings.chain_bin] = AddressCache(path, settings.chain_home, settings.chain_bin)
+    return cache
+
+def chain_address(address):
+    """Адрес ключа с префиксом сети: keyring gaiad отдаёт cosmos1..., у сети может быть свой префикс"""
+    if not address:
+        return address
     try:
-        with open("okx_wallets") as f:
-            okx_wallets = f.read().splitlines()
-    except FileNotFoundError:
-        okx_wallets = []
-    
+        return convert_address(address, get_settings().bech32_prefix)
+    except ValueError:
+        return address
+
+def get_wallet_address(wallet_name):
     try:
-        with open("bitget_wallets") as f:
-            bitget_wallets = f.read().splitlines()
-    except FileNotFoundError:
-        bitget_wallets = []
+        addr = get_address_cache().get(wallet_name)
+    except (RuntimeError, ValueError, OSError) as e:
+        out(f"{Fore.RED}Ошибка чтения keyring: {e}{Fore.RESET}")
+        addr = None
+    return chain_address(addr or run_command(f"{get_settings().chain_bin} keys show {wallet_name} -a"))
 
-    if not okx_wallets and not bitget_wallets:
-        print(f"{Fore.RED}❌ Ошибка: нет доступных файлов кошельков!{Fore.RESET}")
-        return
-    
-    if len(okx_wallets) < NUM_WALLETS and len(bitget_wallets) < NUM_WALLETS:
-        print(f"{Fore.RED}❌ Ошибка: недостаточно адресов в файлах (okx: {len(okx_wallets)}, bitget: {len(bitget_wallets)}), требуется {NUM_WALLETS}{Fore.RESET}")
+def preload_wallet_addresses(wallet_names):
+    """Загружает адреса всех кошельков одним обращением к кешу"""
+    try:
+        addresses = get_address_cache().get_many(wallet_names)
+    except (RuntimeError, ValueError, OSError) as e:
+        out(f"{Fore.RED}Ошибка чтения keyring: {e}{Fore.RESET}")
         return
+    stats = get_address_cache().stats
+    out(f"{Fore.CYAN}🔑 Адреса кошельков: {len(addresses)}/{len(wallet_names)} "
+        f"(из кеша: {stats['hits']}, вызовов keyring: {stats['keyring_calls']}){Fore.RESET}")
+
+def get_wallet_index():
+    """Локальный индекс транзакций кошельков сети (INDEX_FILE)"""
+    chain = current_chain()
+    if chain.wallet_index is None:
+        settings = get_settings()
+        chain.wallet_index = WalletIndex(get_rpc_client(), settings.index_file, denom=settings.denom)
+    return chain.wallet_index
+
+def index_addresses():
+    """{адрес: (роль, метка)} для индекса: все кошельки, все адреса из файлов бирж и контроллер"""
+    settings = get_settings()
+    wallet_names = [f"Wallet{i+1}" for i in range(settings.num_wallets)]
+    addresses = {}
+    for exchange, path in settings.supported_exchanges.items():
+        try:
+            with open(path) as f:
+                addresses.update((line.strip(), (EXCHANGE, exchange)) for line in f if line.strip())
+        except FileNotFoundError:
+            continue
+    try:
+        wallets = get_address_cache().get_many(wallet_names)
+    except (RuntimeError, ValueError, OSError) as e:
+        out(f"{Fore.RED}Ошибка чтения keyring: {e}{Fore.RESET}")
+        wallets = {}
+    addresses.update((chain_address(address), (WALLET, name)) for name, address in wallets.items() if address)
+    if settings.authz_controller:
+        controller_address = get_wallet_address(settings.authz_controller)
+        if controller_address:
+            addresses[controller_address] = (CONTROLLER, settings.authz_controller)
+    return addresses
+
+def update_wallet_index(sync=True, force=False):
+    """Догоняет локальный индекс до последнего блока. Индекс или None, если он выключен (INDEX_WALLETS)"""
+    if not (force or get_settings().index_wallets):
+        return None
+    index = get_wallet_index()
+    index.set_addresses(index_addresses())
+    if not sync:
+        return index
+    started = time.monotonic()
+    try:
+        blocks = index.sync()
+    except (RPCError, KeyError, ValueError) as e:
+        out(f"{Fore.RED}Ошибка обновления индекса: {e}{Fore.RESET}")
+        return index
+    out(f"{Fore.CYAN}📒 Индекс транзакций: {blocks} блоков за {time.monotonic() - started:.1f} сек, "
+        f"высота {index.checkpoint()}{Fore.RESET}")
+    return index
 
-    available_wallets = []
-    if okx_wallets and len(okx_wallets) >= NUM_WALLETS:
-        available_wallets.append(("OKX", okx_wallets))
-    if bitget_wallets and len(bitget_wallets) >= NUM_WALLETS:
-        available_wallets.append(("Bitget", bitget_wallets))
+def load_wallet_targets():
+    """Загружает адреса бирж (config: *_WALLETS_FILE) и распределяет их по кошелькам. None при ошибке"""
+    num_wallets = get_settings().num_wallets
+    exchange_wallets = {}
+    for exchange, path in get_settings().supported_exchanges.items():
+        try:
+            with open(path) as f:
+                exchange_wallets[exchange] = f.read().splitlines()
+        except FileNotFoundError:
+            exchange_wallets[exchange] = []
+
+    if not any(exchange_wallets.values()):
+        out(f"{Fore.RED}❌ Ошибка: нет доступных файлов кошельков!{Fore.RESET}")
+        return None
 
+    available_wallets = [(exchange, wallets) for exchange, wallets in exchange_wallets.items()
+                         if len(wallets) >= num_wallets]
     if not available_wallets:
-        print(f"{Fore.RED}❌ Ошибка: нет файлов с достаточным количеством адресов!{Fore.RESET}")
-        return
+        counts = ", ".join(f"{exchange.lower()}: {len(wallets)}" for exchange, wallets in exchange_wallets.items())
+        out(f"{Fore.RED}❌ Ошибка: недостаточно адресов в файлах ({counts}), требуется {num_wallets}{Fore.RESET}")
+        return None
 
     wallet_targets = {}
-    for i in range(NUM_WALLETS):
+    for i in range(num_wallets):
         wallet_name = f"Wallet{i+1}"
-        if len(available_wallets) == 2:
-            exchange, wallet_list = random.choice(available_wallets)
-        else:
-            exchange, wallet_list = available_wallets[0]
+        exchange, wallet_list = random.choice(available_wallets)
         wallet_targets[wallet_name] = (exchange, wallet_list[i])
 
-    wallet_indices = list(range(NUM_WALLETS))
-    random.shuffle(wallet_indices)
+    return wallet_targets
 
-    for i in wallet_indices:
-        wallet_name = f"Wallet{i+1}"
-        addr = run_command(f"gaiad keys show {wallet_name} -a")
-        exchange, target_wallet = wallet_targets[wallet_name]
+def pick_remaining_balance(balance):
+    """Случайный остаток на кошельке в пределах MIN/MAX_BALANCE_REMAIN"""
+    settings = get_settings()
+    min_balance = min(settings.min_balance_remain, balance)
+    max_balance = min(settings.max_balance_remain, balance)
+    if min_balance > max_balance:
+        min_balance, max_balance = max_balance, min_balance
+    if min_balance == max_balance:
+        return min_balance
+    return random.randint(min_balance, max_balance)
 
-        # Красивый заголовок начала обработки кошелька
-        print(f"\n{Fore.CYAN}{'='*60}{Fore.RESET}")
-        print(f"{Fore.WHITE}{Style.BRIGHT}🏦 [ {wallet_name} ] {Style.RESET_ALL}{Fore.CYAN}Начинаем обработку... ({i+1}/{len(wallet_indices)}){Fore.RESET}")
-        print(f"{Fore.CYAN}{'='*60}{Fore.RESET}")
+def estimate_combined_gas(wallet_name, addr, msgs, validators, preliminary_fees):
+    """Газ составной транзакции: симуляция через REST, иначе сумма исторических оценок"""
+    def fallback():
+        withdraw = get_gas_oracle().withdraw_gas(validators)
+        send = get_gas_oracle().send_gas()
+        return GasEstimate(withdraw.gas + send.gas, withdraw.source, withdraw.samples + send.samples)
 
-        initial_balance = get_current_balance(addr)
-        print(f"{Fore.WHITE}💰 [ {wallet_name} ]{Fore.YELLOW} Начальный баланс: {Fore.GREEN}{Style.BRIGHT}{initial_balance:,}{Style.RESET_ALL}{Fore.YELLOW} uatom{Fore.RESET}")
+    signer = get_broadcaster().signer
+    try:
+        tx_raw, _ = signer.sign(msgs, wallet_name, addr, preliminary_fees, 0, denom())
+    except (SigningError, RPCError):
+        estimate = fallback()
+    else:
+        estimate = get_gas_simulator().signed_tx_gas(base64.b64encode(tx_raw).decode(), fallback)
+    count_stat("gas_sources", f"combined:{estimate.source}")
+    return _report_gas_estimate(estimate, "снятия и отправки")
 
-        withdraw_gas = get_withdraw_gas_estimate()
-        withdraw_fees = calculate_fees(withdraw_gas)
-        print(f"{Fore.WHITE}⛽ [ {wallet_name} ]{Fore.BLUE} Gas для снятия: {Fore.CYAN}{withdraw_gas:,}{Fore.BLUE}, комиссия: {Fore.CYAN}{withdraw_fees:,}{Fore.BLUE} uatom{Fore.RESET}")
+def process_wallet_combined(wallet_name, addr, balance, rewards, validators, exchange, target_wallet):
+    """Снятие наград и отправка одной транзакцией.
 
-        if initial_balance < withdraw_fees:
-            print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств для комиссии ({initial_balance:,} < {withdraw_fees:,} uatom){Style.RESET_ALL}{Fore.RESET}")
+    Баланс после снятия считается по уже известным наградам, все
+    MsgWithdrawDelegatorReward и MsgSend подписываются вместе. Возвращает
+    True/False (было ли действие) или None, если нужен обычный режим.
+    """
+    settings = get_settings()
+    if settings.broadcast_mode != "multi" or get_broadcaster().signer is None:
+        out(f"{Fore.YELLOW}⚠️ [ {wallet_name} ] Составная транзакция требует подписи внутри процесса, "
+            f"работаем двумя транзакциями{Fore.RESET}")
+        return None
+    try:
+        validator_addrs = get_read_cache().get_delegator_validators(addr)
+    except RPCError as e:
+        out(f"{Fore.RED}Ошибка получения валидаторов {addr}: {e}{Fore.RESET}")
+        return None
+    # Награды каждого валидатора при снятии округляются вниз
+    expected_rewards = max(int(rewards) - len(validator_addrs), 0)
+    withdraw_msgs = withdraw_all_msgs(addr, validator_addrs)
+    remaining_balance = pick_remaining_balance(balance + expected_rewards)
+
+    preliminary_gas = get_gas_oracle().withdraw_gas(validators).gas + get_gas_oracle().send_gas().gas
+    fees = calculate_fees(preliminary_gas)
+    send_amount = balance + expected_rewards - fees - remaining_balance
+    if send_amount < settings.min_send_amount:
+        return None  # Отправлять нечего - обычный режим только снимет награды
+    gas = estimate_combined_gas(wallet_name, addr, withdraw_msgs + [msg_send(addr, target_wallet, send_amount, denom())],
+                                validators, fees)
+    fees = calculate_fees(gas)
+
+    out(f"{Fore.WHITE}🧩 [ {wallet_name} ]{Fore.BLUE} Одна транзакция: снятие с {len(validator_addrs)} валидаторов + отправка{Fore.RESET}")
+    max_attempts = settings.max_withdraw_attempts
+    attempt = 0
+    while attempt < max_attempts:
+        send_amount = balance + expected_rewards - fees - remaining_balance
+        if send_amount < settings.min_send_amount or balance < fees:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств после попытки {attempt} "
+                f"(баланс {balance:,}, комиссия {fees:,} {denom()}){Style.RESET_ALL}{Fore.RESET}")
+            return False
+        out(f"   {Fore.YELLOW}├─ Награды: {Fore.CYAN}{expected_rewards:,}{Fore.YELLOW} {denom()}, комиссия: {Fore.CYAN}{fees:,}{Fore.YELLOW} {denom()} (gas {gas:,}){Fore.RESET}")
+        out(f"   {Fore.YELLOW}├─ Оставляем: {Fore.GREEN}{remaining_balance:,}{Fore.YELLOW} {denom()}{Fore.RESET}")
+        out(f"   {Fore.YELLOW}└─ Отправляем: {Fore.MAGENTA}{Style.BRIGHT}{send_amount:,}{Style.RESET_ALL}{Fore.YELLOW} {denom()} на {exchange} ({target_wallet}){Fore.RESET}")
+        with tx_slot():
+            tx_hash = submit_tx(
+                None, withdraw_msgs + [msg_send(addr, target_wallet, send_amount, denom())],
+                wallet_name, addr, fees, gas, "combined",
+            )
+            if not tx_hash:
+                return False
+            out(f"{Fore.WHITE}📤 [ {wallet_name} ]{Fore.CYAN} Хеш: {Fore.BLUE}{Style.BRIGHT}{tx_hash}{Style.RESET_ALL}{Fore.RESET}")
+            out(f"{Fore.WHITE}🔍 [ {wallet_name} ]{Fore.CYAN} Ожидаем включения транзакции в блок...{Fore.RESET}")
+            pending = wait_transaction(tx_hash)
+        status = pending.status if pending.found else False
+        count_stat("transactions", f"combined:{tx_outcome(status)}")
+        if status == "out_of_gas":
+            count_stat("out_of_gas", "combined")
+            get_metrics().inc("tx_retries_total", kind="combined", reason="out_of_gas")
+            attempt += 1
+            balance -= fees  # Комиссия списывается и при out of gas, сообщения откатываются
+            gas = int(gas * settings.gas_increase_multiplier["withdraw"])
+            fees = calculate_fees(gas)
+            out(f"{Fore.WHITE}⚠️  [ {wallet_name} ]{Fore.YELLOW} Увеличиваем gas до {Fore.CYAN}{gas:,}{Fore.YELLOW}, повторяем (попытка {attempt}/{max_attempts}){Fore.RESET}")
             continue
+        if status is not True:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Транзакция не прошла: ни снятие, ни отправка не выполнены{Style.RESET_ALL}{Fore.RESET}")
+            return False
+        parts = parse_tx_parts(pending.tx_result, addr, target_wallet, denom())
+        out(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN}{Style.BRIGHT} Снято {parts['withdrawn']:,} {denom()} "
+            f"с {parts['validators']} валидаторов{Style.RESET_ALL}{Fore.RESET}")
+        out(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN}{Style.BRIGHT} Отправлено {Fore.MAGENTA}{parts['sent']:,}{Fore.GREEN} "
+            f"{denom()} на {Fore.BLUE}{exchange}{Style.RESET_ALL}{Fore.RESET}")
+        out(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
+        return True
+    out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Не удалось выполнить транзакцию после {max_attempts} попыток{Style.RESET_ALL}{Fore.RESET}")
+    return False
 
-        rewards = run_command(f"gaiad q distribution rewards {wallet_name} --node {get_random_rpc()} -o json | jq -r '.total[] | select(test(\"uatom$\")) | split(\"uatom\")[0]'")
-        rewards = float(rewards) if rewards else 0.0
-        
-        if rewards > 0:
-            print(f"{Fore.WHITE}🎁 [ {wallet_name} ]{Fore.MAGENTA} Доступно наград: {Fore.YELLOW}{Style.BRIGHT}{rewards:,.2f}{Style.RESET_ALL}{Fore.MAGENTA} uatom{Fore.RESET}")
-        else:
-            print(f"{Fore.WHITE}🎁 [ {wallet_name} ]{Fore.RED} Награды отсутствуют{Fore.RESET}")
-
-        reward_tx_confirmed = False
-        action_performed = False  # Флаг для отслеживания выполненных действий
-        min_rewards_to_withdraw = 700000
-        if rewards >= min_rewards_to_withdraw:
-            print(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN} Начинаем снятие наград ({rewards:,.2f} uatom)...{Fore.RESET}")
-            max_attempts = 3
-            attempt = 0
-            current_balance = initial_balance
-            while attempt < max_attempts:
-                if current_balance < withdraw_fees:
-                    print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств после попытки {attempt} ({current_balance:,} < {withdraw_fees:,} uatom){Style.RESET_ALL}{Fore.RESET}")
-                    break
+def process_wallet(i, total, wallet_targets, scanned=None):
+    """Обрабатывает один кошелёк: снятие наград и отправка на биржу.
 
-                rpc = get_random_rpc()
-                reward_tx = run_command(
-                    f"gaiad tx distribution withdraw-all-rewards --from {wallet_name} "
-                    f"--fees {withdraw_fees}uatom --gas {withdraw_gas} --node {rpc} -y -o json"
+    scanned - строка снимка портфеля (WalletSnapshot), если он был сделан.
+    Возвращает True, если было выполнено снятие или отправка.
+    """
+    settings = get_settings()
+    wallet_name = f"Wallet{i+1}"
+    if scanned is None or not scanned.ok:
+        # Снимка нет или он неполный, запрашиваем кошелёк заново
+        scanned = snapshot_wallet(wallet_name, get_wallet_address, get_read_cache(), settings.denom)
+        if not scanned.ok:
+            # Баланс неизвестен, а не нулевой: кошелёк не завершён, его проверит следующий проход или возобновление
+            out(f"{Fore.RED}Ошибка получения состояния {wallet_name}: {scanned.error}{Fore.RESET}")
+            journal_record(FAILED, wallet_name, detail=f"состояние не получено: {scanned.error}")
+            return False
+    addr = scanned.address
+    validators = scanned.validators
+    exchange, target_wallet = wallet_targets[wallet_name]
+
+    # Красивый заголовок начала обработки кошелька
+    out(f"\n{Fore.CYAN}{'='*60}{Fore.RESET}")
+    out(f"{Fore.WHITE}{Style.BRIGHT}🏦 [ {wallet_name} ] {Style.RESET_ALL}{Fore.CYAN}Начинаем обработку... ({i+1}/{total}){Fore.RESET}")
+    out(f"{Fore.CYAN}{'='*60}{Fore.RESET}")
+
+    initial_balance = scanned.balance
+    out(f"{Fore.WHITE}💰 [ {wallet_name} ]{Fore.YELLOW} Начальный баланс: {Fore.GREEN}{Style.BRIGHT}{initial_balance:,}{Style.RESET_ALL}{Fore.YELLOW} {denom()}{Fore.RESET}")
+
+    withdraw_gas = get_withdraw_gas_estimate(validators)
+    withdraw_fees = calculate_fees(withdraw_gas)
+    out(f"{Fore.WHITE}⛽ [ {wallet_name} ]{Fore.BLUE} Gas для снятия: {Fore.CYAN}{withdraw_gas:,}{Fore.BLUE}, комиссия: {Fore.CYAN}{withdraw_fees:,}{Fore.BLUE} {denom()}{Fore.RESET}")
+
+    if initial_balance < withdraw_fees:
+        out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств для комиссии ({initial_balance:,} < {withdraw_fees:,} {denom()}){Style.RESET_ALL}{Fore.RESET}")
+        journal_record(DONE, detail="нет средств на комиссию")
+        return False
+
+    rewards = scanned.rewards
+
+    if rewards > 0:
+        out(f"{Fore.WHITE}🎁 [ {wallet_name} ]{Fore.MAGENTA} Доступно наград: {Fore.YELLOW}{Style.BRIGHT}{rewards:,.2f}{Style.RESET_ALL}{Fore.MAGENTA} {denom()}{Fore.RESET}")
+    else:
+        out(f"{Fore.WHITE}🎁 [ {wallet_name} ]{Fore.RED} Награды отсутствуют{Fore.RESET}")
+
+    min_rewards_to_withdraw = withdraw_threshold(validators)
+    if settings.combined and rewards >= min_rewards_to_withdraw:
+        combined = process_wallet_combined(wallet_name, addr, initial_balance, rewards,
+                                           validators, exchange, target_wallet)
+        if combined is not None:
+            if combined:
+                get_fee_optimizer().withdrawn(wallet_name)
+            return finish_wallet(wallet_name, combined)
+
+    reward_tx_confirmed = False
+    action_performed = False  # Флаг для отслеживания выполненных действий
+    sent = False
+    current_balance = initial_balance
+    if rewards >= min_rewards_to_withdraw:
+        out(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN} Начинаем снятие наград ({rewards:,.2f} {denom()})...{Fore.RESET}")
+        withdraw_gas = simulate_withdraw_gas(wallet_name, validators, addr)
+        withdraw_fees = calculate_fees(withdraw_gas)
+        max_attempts = settings.max_withdraw_attempts
+        attempt = 0
+        while attempt < max_attempts:
+            if current_balance < withdraw_fees:
+                out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств после попытки {attempt} ({current_balance:,} < {withdraw_fees:,} {denom()}){Style.RESET_ALL}{Fore.RESET}")
+                break
+
+            with tx_slot():
+                reward_tx_hash = submit_tx(
+                    ["distribution", "withdraw-all-rewards"],
+                    lambda: withdraw_all_msgs(addr, get_read_cache().get_delegator_validators(addr)),
+                    wallet_name, addr, withdraw_fees, withdraw_gas, "withdraw",
                 )
-                try:
-                    reward_tx_json = json.loads(reward_tx)
-                    reward_tx_hash = reward_tx_json.get("txhash", "")
-                    print(f"{Fore.WHITE}📤 [ {wallet_name} ]{Fore.CYAN} Хеш снятия: {Fore.BLUE}{Style.BRIGHT}{reward_tx_hash}{Style.RESET_ALL}{Fore.RESET}")
-                except json.JSONDecodeError:
-                    print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Ошибка разбора JSON транзакции снятия{Style.RESET_ALL}{Fore.RESET}")
+                if not reward_tx_hash:
                     break
+                out(f"{Fore.WHITE}📤 [ {wallet_name} ]{Fore.CYAN} Хеш снятия: {Fore.BLUE}{Style.BRIGHT}{reward_tx_hash}{Style.RESET_ALL}{Fore.RESET}")
 
-                print(f"{Fore.WHITE}🔍 [ {wallet_name} ]{Fore.CYAN} Проверяем транзакцию через 30 секунд...{Fore.RESET}")
-                time.sleep(30)
+                out(f"{Fore.WHITE}🔍 [ {wallet_name} ]{Fore.CYAN} Ожидаем включения транзакции в блок...{Fore.RESET}")
                 tx_status = check_transaction(reward_tx_hash)
+            count_stat("transactions", f"withdraw:{tx_outcome(tx_status)}")
+            if tx_status == "out_of_gas":
+                count_stat("out_of_gas", "withdraw")
+                get_metrics().inc("tx_retries_total", kind="withdraw", reason="out_of_gas")
+                attempt += 1
+                current_balance -= withdraw_fees  # Комиссия списывается и при out of gas
+                withdraw_gas = int(withdraw_gas * settings.gas_increase_multiplier["withdraw"])
+                withdraw_fees = calculate_fees(withdraw_gas)
+                out(f"{Fore.WHITE}💳 [ {wallet_name} ]{Fore.YELLOW} Баланс после попытки {attempt}: {Fore.CYAN}{current_balance:,}{Fore.YELLOW} {denom()}{Fore.RESET}")
+                out(f"{Fore.WHITE}⚠️  [ {wallet_name} ]{Fore.YELLOW} Увеличиваем gas до {Fore.CYAN}{withdraw_gas:,}{Fore.YELLOW}, повторяем (попытка {attempt}/{max_attempts}){Fore.RESET}")
+                continue
+            elif tx_status is True:
+                out(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN}{Style.BRIGHT} Награды успешно сняты!{Style.RESET_ALL}{Fore.RESET}")
+                reward_tx_confirmed = True
+                action_performed = True  # Действие выполнено
+                get_fee_optimizer().withdrawn(wallet_name)
+                break
+            else:
+                out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Транзакция не подтверждена{Style.RESET_ALL}{Fore.RESET}")
+                current_balance = None  # Исход неизвестен, баланс нужно перечитать
+                break
+        if not reward_tx_confirmed:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Не удалось снять награды после {max_attempts} попыток{Style.RESET_ALL}{Fore.RESET}")
+    else:
+        out(f"{Fore.WHITE}⏭️  [ {wallet_name} ]{Fore.YELLOW} Награды ({rewards:,.2f}) < порога ({min_rewards_to_withdraw:,}), пропускаем{Fore.RESET}")
+
+    if reward_tx_confirmed or current_balance is None:
+        current_balance = get_current_balance(addr)
+    if current_balance is None:
+        out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED} Баланс неизвестен, отправка отложена до следующей проверки{Fore.RESET}")
+        get_fee_optimizer().recheck(wallet_name)
+        return finish_wallet(wallet_name, action_performed)
+    out(f"{Fore.WHITE}💳 [ {wallet_name} ]{Fore.YELLOW} Баланс после снятия: {Fore.GREEN}{Style.BRIGHT}{current_balance:,}{Style.RESET_ALL}{Fore.YELLOW} {denom()}{Fore.RESET}")
+
+    remaining_balance = pick_remaining_balance(current_balance)
+    send_amount = current_balance - remaining_balance if current_balance > remaining_balance else 0
+
+    out(f"{Fore.WHITE}📊 [ {wallet_name} ]{Fore.BLUE} Расчет отправки:{Fore.RESET}")
+    out(f"   {Fore.YELLOW}├─ Баланс: {Fore.CYAN}{Style.BRIGHT}{current_balance:,}{Style.RESET_ALL}{Fore.YELLOW} {denom()}{Fore.RESET}")
+    out(f"   {Fore.YELLOW}├─ Оставляем: {Fore.GREEN}{remaining_balance:,}{Fore.YELLOW} {denom()}{Fore.RESET}")
+    out(f"   {Fore.YELLOW}└─ Отправляем: {Fore.MAGENTA}{Style.BRIGHT}{send_amount:,}{Style.RESET_ALL}{Fore.YELLOW} {denom()}{Fore.RESET}")
+
+    send_gas = get_send_gas_estimate()
+    send_fees = calculate_fees(send_gas)
+    min_send_amount = max(send_fees + 3000, settings.min_send_amount)  # Минимум MIN_SEND_AMOUNT для отправки
+    out(f"{Fore.WHITE}⛽ [ {wallet_name} ]{Fore.BLUE} Gas для отправки: {Fore.CYAN}{send_gas:,}{Fore.BLUE}, минимум: {Fore.CYAN}{min_send_amount:,}{Fore.BLUE} {denom()}{Fore.RESET}")
+
+    if send_amount >= min_send_amount:
+        if current_balance < send_fees:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств для комиссии ({current_balance:,} < {send_fees:,} {denom()}){Style.RESET_ALL}{Fore.RESET}")
+        else:
+            max_send_attempts = settings.max_send_attempts  # Ограничим количество попыток отправки
+            attempt = 0
+            current_send_gas = simulate_send_gas(wallet_name, addr, target_wallet, send_amount)
+            current_send_fees = calculate_fees(current_send_gas)
+            while attempt < max_send_attempts:
+                out(f"{Fore.WHITE}🚀 [ {wallet_name} ]{Fore.GREEN} Отправляем {Fore.MAGENTA}{Style.BRIGHT}{send_amount:,}{Style.RESET_ALL}{Fore.GREEN} {denom()} на {Fore.BLUE}{exchange}{Fore.GREEN} (попытка {attempt + 1}/{max_send_attempts}){Fore.RESET}")
+                out(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
+                with tx_slot():
+                    send_tx_hash = submit_tx(
+                        ["bank", "send", addr, target_wallet, f"{send_amount}{settings.denom}"],
+                        [msg_send(addr, target_wallet, send_amount, settings.denom)],
+                        wallet_name, addr, current_send_fees, current_send_gas, "send",
+                    )
+                    if not send_tx_hash:
+                        break
+                    out(f"{Fore.WHITE}📤 [ {wallet_name} ]{Fore.CYAN} Хеш отправки: {Fore.BLUE}{Style.BRIGHT}{send_tx_hash}{Style.RESET_ALL}{Fore.RESET}")
+
+                    out(f"{Fore.WHITE}🔍 [ {wallet_name} ]{Fore.CYAN} Ожидаем включения транзакции в блок...{Fore.RESET}")
+                    tx_status = check_transaction(send_tx_hash)
+                count_stat("transactions", f"send:{tx_outcome(tx_status)}")
                 if tx_status == "out_of_gas":
+                    count_stat("out_of_gas", "send")
+                    get_metrics().inc("tx_retries_total", kind="send", reason="out_of_gas")
                     attempt += 1
-                    withdraw_gas = int(withdraw_gas * 1.2)
-                    withdraw_fees = calculate_fees(withdraw_gas)
-                    current_balance = get_current_balance(addr)
-                    print(f"{Fore.WHITE}💳 [ {wallet_name} ]{Fore.YELLOW} Баланс после попытки {attempt}: {Fore.CYAN}{current_balance:,}{Fore.YELLOW} uatom{Fore.RESET}")
-                    print(f"{Fore.WHITE}⚠️  [ {wallet_name} ]{Fore.YELLOW} Увеличиваем gas до {Fore.CYAN}{withdraw_gas:,}{Fore.YELLOW}, повторяем (попытка {attempt}/{max_attempts}){Fore.RESET}")
+                    current_balance -= current_send_fees  # Комиссия списывается и при out of gas
+                    current_send_gas = int(current_send_gas * settings.gas_increase_multiplier["send"])
+                    current_send_fees = calculate_fees(current_send_gas)
+                    out(f"{Fore.WHITE}💳 [ {wallet_name} ]{Fore.YELLOW} Баланс после попытки {attempt}: {Fore.CYAN}{current_balance:,}{Fore.YELLOW} {denom()}{Fore.RESET}")
+                    out(f"{Fore.WHITE}⚠️  [ {wallet_name} ]{Fore.YELLOW} Увеличиваем газ до {Fore.CYAN}{current_send_gas:,}{Fore.YELLOW}, повторяем (попытка {attempt}/{max_send_attempts}){Fore.RESET}")
                     continue
                 elif tx_status is True:
-                    print(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN}{Style.BRIGHT} Награды успешно сняты!{Style.RESET_ALL}{Fore.RESET}")
-                    reward_tx_confirmed = True
+                    out(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN}{Style.BRIGHT} Отправлено {Fore.MAGENTA}{send_amount:,}{Fore.GREEN} {denom()} на {Fore.BLUE}{exchange}{Style.RESET_ALL}{Fore.RESET}")
+                    out(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
                     action_performed = True  # Действие выполнено
+                    sent = True
                     break
                 else:
-                    print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Транзакция не подтверждена{Style.RESET_ALL}{Fore.RESET}")
+                    out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Ошибка отправки {send_amount:,} {denom()} на {exchange}{Style.RESET_ALL}{Fore.RESET}")
+                    out(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
                     break
-            if not reward_tx_confirmed:
-                print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Не удалось снять награды после {max_attempts} попыток{Style.RESET_ALL}{Fore.RESET}")
-        else:
-            print(f"{Fore.WHITE}⏭️  [ {wallet_name} ]{Fore.YELLOW} Награды ({rewards:,.2f}) < порога ({min_rewards_to_withdraw:,}), пропускаем{Fore.RESET}")
+            if attempt >= max_send_attempts:
+                out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Не удалось отправить средства после {max_send_attempts} попыток{Style.RESET_ALL}{Fore.RESET}")
+    else:
+        out(f"{Fore.WHITE}⏭️  [ {wallet_name} ]{Fore.YELLOW} Сумма {Fore.RED}{send_amount:,}{Fore.YELLOW} < минимума {Fore.RED}{min_send_amount:,}{Fore.YELLOW}, пропускаем{Fore.RESET}")
+    if send_amount >= min_send_amount and not sent:
+        get_fee_optimizer().recheck(wallet_name)  # Средства остались на кошельке - проверить в следующем проходе
 
-        current_balance = get_current_balance(addr)
-        print(f"{Fore.WHITE}💳 [ {wallet_name} ]{Fore.YELLOW} Баланс после снятия: {Fore.GREEN}{Style.BRIGHT}{current_balance:,}{Style.RESET_ALL}{Fore.YELLOW} uatom{Fore.RESET}")
-
-        min_balance = min(15000, current_balance)
-        max_balance = min(25000, current_balance)
-        if min_balance > max_balance:
-            min_balance, max_balance = max_balance, min_balance
-        if min_balance == max_balance:
-            remaining_balance = min_balance
-        else:
-            remaining_balance = random.randint(min_balance, max_balance)
-        send_amount = current_balance - remaining_balance if current_balance > remaining_balance else 0
-        
-        print(f"{Fore.WHITE}📊 [ {wallet_name} ]{Fore.BLUE} Расчет отправки:{Fore.RESET}")
-        print(f"   {Fore.YELLOW}├─ Баланс: {Fore.CYAN}{Style.BRIGHT}{current_balance:,}{Style.RESET_ALL}{Fore.YELLOW} uatom{Fore.RESET}")
-        print(f"   {Fore.YELLOW}├─ Оставляем: {Fore.GREEN}{remaining_balance:,}{Fore.YELLOW} uatom{Fore.RESET}")
-        print(f"   {Fore.YELLOW}└─ Отправляем: {Fore.MAGENTA}{Style.BRIGHT}{send_amount:,}{Style.RESET_ALL}{Fore.YELLOW} uatom{Fore.RESET}")
-
-        send_gas = get_send_gas_estimate()
-        send_fees = calculate_fees(send_gas)
-        min_send_amount = max(send_fees + 3000, 50000)  # Минимум 50000 uatom для отправки
-        print(f"{Fore.WHITE}⛽ [ {wallet_name} ]{Fore.BLUE} Gas для отправки: {Fore.CYAN}{send_gas:,}{Fore.BLUE}, минимум: {Fore.CYAN}{min_send_amount:,}{Fore.BLUE} uatom{Fore.RESET}")
-        
-        if send_amount >= min_send_amount:
-            if current_balance < send_fees:
-                print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Недостаточно средств для комиссии ({current_balance:,} < {send_fees:,} uatom){Style.RESET_ALL}{Fore.RESET}")
-            else:
-                max_send_attempts = 3  # Ограничим количество попыток отправки
-                attempt = 0
-                current_send_gas = send_gas
-                current_send_fees = send_fees
-                while attempt < max_send_attempts:
-                    print(f"{Fore.WHITE}🚀 [ {wallet_name} ]{Fore.GREEN} Отправляем {Fore.MAGENTA}{Style.BRIGHT}{send_amount:,}{Style.RESET_ALL}{Fore.GREEN} uatom на {Fore.BLUE}{exchange}{Fore.GREEN} (попытка {attempt + 1}/{max_send_attempts}){Fore.RESET}")
-                    print(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
-                    rpc = get_random_rpc()
-                    send_tx = run_command(
-                        f"gaiad tx bank send {addr} {target_wallet} {send_amount}uatom "
-                        f"--from {wallet_name} --fees {current_send_fees}uatom --gas {current_send_gas} --node {rpc} -y -o json"
-                    )
-                    try:
-                        send_tx_json = json.loads(send_tx)
-                        send_tx_hash = send_tx_json.get("txhash", "")
-                        print(f"{Fore.WHITE}📤 [ {wallet_name} ]{Fore.CYAN} Хеш отправки: {Fore.BLUE}{Style.BRIGHT}{send_tx_hash}{Style.RESET_ALL}{Fore.RESET}")
-                    except json.JSONDecodeError:
-                        print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Ошибка разбора JSON транзакции отправки{Style.RESET_ALL}{Fore.RESET}")
-                        break
+    return finish_wallet(wallet_name, action_performed)
 
-                    print(f"{Fore.WHITE}🔍 [ {wallet_name} ]{Fore.CYAN} Проверяем транзакцию через 30 секунд...{Fore.RESET}")
-                    time.sleep(30)
-                    tx_status = check_transaction(send_tx_hash)
-                    if tx_status == "out_of_gas":
-                        attempt += 1
-                        current_send_gas = int(current_send_gas * 1.1)
-                        current_send_fees = calculate_fees(current_send_gas)
-                        current_balance = get_current_balance(addr)
-                        print(f"{Fore.WHITE}💳 [ {wallet_name} ]{Fore.YELLOW} Баланс после попытки {attempt}: {Fore.CYAN}{current_balance:,}{Fore.YELLOW} uatom{Fore.RESET}")
-                        print(f"{Fore.WHITE}⚠️  [ {wallet_name} ]{Fore.YELLOW} Увеличиваем газ до {Fore.CYAN}{current_send_gas:,}{Fore.YELLOW}, повторяем (попытка {attempt}/{max_send_attempts}){Fore.RESET}")
-                        continue
-                    elif tx_status is True:
-                        print(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN}{Style.BRIGHT} Отправлено {Fore.MAGENTA}{send_amount:,}{Fore.GREEN} uatom на {Fore.BLUE}{exchange}{Style.RESET_ALL}{Fore.RESET}")
-                        print(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
-                        action_performed = True  # Действие выполнено
-                        break
-                    else:
-                        print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Ошибка отправки {send_amount:,} uatom на {exchange}{Style.RESET_ALL}{Fore.RESET}")
-                        print(f"   {Fore.CYAN}└─ Адрес: {Fore.WHITE}{target_wallet}{Fore.RESET}")
-                        break
-                if attempt >= max_send_attempts:
-                    print(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Не удалось отправить средства после {max_send_attempts} попыток{Style.RESET_ALL}{Fore.RESET}")
-        else:
-            print(f"{Fore.WHITE}⏭️  [ {wallet_name} ]{Fore.YELLOW} Сумма {Fore.RED}{send_amount:,}{Fore.YELLOW} < минимума {Fore.RED}{min_send_amount:,}{Fore.YELLOW}, пропускаем{Fore.RESET}")
+def finish_wallet(wallet_name, action_performed):
+    """Итог обработки кошелька и пауза перед следующим, если были действия"""
+    journal_record(DONE, wallet_name, detail="с действиями" if action_performed else "без действий")
+    out(f"{Fore.GREEN}{'='*60}")
+    if action_performed:
+        out(f"{Fore.GREEN}{Style.BRIGHT}✅ [ {wallet_name} ] ЗАВЕРШЕНО С ДЕЙСТВИЯМИ{Style.RESET_ALL}")
+    else:
+        out(f"{Fore.BLUE}{Style.BRIGHT}⚡ [ {wallet_name} ] ЗАВЕРШЕНО БЕЗ ДЕЙСТВИЙ{Style.RESET_ALL}")
+    out(f"{Fore.GREEN}{'='*60}{Fore.RESET}")
 
-        # Завершение обработки кошелька
-        print(f"{Fore.GREEN}{'='*60}")
-        if action_performed:
-            print(f"{Fore.GREEN}{Style.BRIGHT}✅ [ {wallet_name} ] ЗАВЕРШЕНО С ДЕЙСТВИЯМИ{Style.RESET_ALL}")
-        else:
-            print(f"{Fore.BLUE}{Style.BRIGHT}⚡ [ {wallet_name} ] ЗАВЕРШЕНО БЕЗ ДЕЙСТВИЙ{Style.RESET_ALL}")
-        print(f"{Fore.GREEN}{'='*60}{Fore.RESET}")
-
-        # Задержка только если было выполнено какое-то действие (снятие наград или отправка)
-        if action_performed:
-            delay = random.randint(3600, 7200)
-            print(f"\n{Fore.CYAN}⏳ [ {wallet_name} ]{Fore.YELLOW} Ожидание {Fore.CYAN}{Style.BRIGHT}{delay:,}{Style.RESET_ALL}{Fore.YELLOW} секунд до следующего кошелька...{Fore.RESET}")
-            print(f"{Fore.CYAN}{'─'*60}{Fore.RESET}\n")
-            time.sleep(delay)
+    # Задержка только если было выполнено какое-то действие (снятие наград или отправка)
+    if not _pause_between_wallets:
+        out(f"{Fore.CYAN}{'─'*60}{Fore.RESET}\n")
+    elif action_performed:
+        delay = random.randint(get_settings().min_delay, get_settings().max_delay)
+        out(f"\n{Fore.CYAN}⏳ [ {wallet_name} ]{Fore.YELLOW} Ожидание {Fore.CYAN}{Style.BRIGHT}{delay:,}{Style.RESET_ALL}{Fore.YELLOW} секунд до следующего кошелька...{Fore.RESET}")
+        out(f"{Fore.CYAN}{'─'*60}{Fore.RESET}\n")
+        _sleep(delay)
+    else:
+        out(f"{Fore.WHITE}⚡ [ {wallet_name} ]{Fore.BLUE} Переходим к следующему кошельку без задержки{Fore.RESET}")
+        out(f"{Fore.CYAN}{'─'*60}{Fore.RESET}\n")
+
+    return action_performed
+
+def take_portfolio_snapshot(wallet_names, workers=None):
+    """Фаза сканирования: адреса, балансы и награды всех кошельков до любых транзакций"""
+    workers = workers or get_settings().scan_workers
+    out(f"{Fore.CYAN}🔎 Снимок портфеля: {len(wallet_names)} кошельков ({workers} потоков)...{Fore.RESET}")
+    snapshot = take_snapshot(wallet_names, in_chain(get_wallet_address), get_read_cache(), denom(), workers)
+    totals = snapshot.totals()
+    out(f"{Fore.GREEN}✅ Снимок готов за {snapshot.duration:.1f} сек: баланс {totals['balance']:,} {denom()}, "
+        f"награды {totals['rewards']:,.2f} {denom()}, ошибок {totals['errors']}{Fore.RESET}")
+    return snapshot
+
+def get_authz_withdrawer():
+    """Пакетное снятие наград ключом AUTHZ_CONTROLLER. None, если адрес контроллера неизвестен"""
+    chain = current_chain()
+    if chain.authz_withdrawer is None:
+        settings = get_settings()
+        controller_address = get_wallet_address(settings.authz_controller)
+        if not controller_address:
+            out(f"{Fore.RED}❌ Не найден адрес ключа-контроллера {settings.authz_controller}{Fore.RESET}")
+            return None
+        chain.authz_withdrawer = AuthzWithdrawer(
+            get_read_cache(), get_broadcaster(), get_gas_simulator(), settings.authz_controller,
+            controller_address, settings.gas_price, settings.authz_max_tx_gas, settings.authz_batch_size,
+            settings.denom,
+        )
+    return chain.authz_withdrawer
+
+def grant_authz(withdrawer, wallets, snapshot):
+    """Разрешения контроллеру от кошельков без них: MsgGrant от каждого, подтверждения ждём вместе.
+
+    Возвращает кошельки, разрешение которых включено в блок.
+    """
+    out(f"{Fore.CYAN}🔐 Выдаём разрешение на снятие наград контроллеру: {len(wallets)} кошельков...{Fore.RESET}")
+    submitted = []
+    for wallet in wallets:
+        wallet_name, addr, _ = wallet
+        tx_args, msgs, gas = withdrawer.grant_tx(addr)
+        fees = calculate_fees(gas)
+        if snapshot[wallet_name].balance < fees:
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED} Недостаточно средств для комиссии разрешения{Fore.RESET}")
+            continue
+        _wallet_context.name = wallet_name
+        try:
+            tx_hash = submit_tx(tx_args, msgs, wallet_name, addr, fees, gas, "grant")
+        finally:
+            _wallet_context.name = None
+        if tx_hash:
+            submitted.append((wallet, fees, get_tx_confirmer().submit(tx_hash)))
+    granted = []
+    for wallet, fees, pending in submitted:
+        pending.done.wait()
+        wallet_name = wallet[0]
+        record_tx_outcome(pending, wallet_name)
+        count_stat("transactions", f"grant:{tx_outcome(pending.status if pending.found else False)}")
+        if pending.found:
+            snapshot[wallet_name].balance -= fees
+        if pending.status is True:
+            granted.append(wallet)
         else:
-            print(f"{Fore.WHITE}⚡ [ {wallet_name} ]{Fore.BLUE} Переходим к следующему кошельку без задержки{Fore.RESET}")
-            print(f"{Fore.CYAN}{'─'*60}{Fore.RESET}\n")
+            out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED} Разрешение не выдано: {pending.log or 'не подтверждено'}{Fore.RESET}")
+    out(f"{Fore.GREEN}✅ Разрешений выдано: {len(granted)}/{len(wallets)}{Fore.RESET}")
+    return granted
+
+def run_authz_withdrawals(wallet_indices, snapshot):
+    """Снятие наград пакетами MsgExec контроллера до обработки кошельков (AUTHZ_CONTROLLER).
+
+    У кошельков, награды которых сняты, строка снимка получает новый баланс
+    и нулевые награды: дальше они только отправляют средства. Кошельки без
+    разрешения и из неудавшихся пакетов снимают награды сами, как обычно.
+    """
+    settings = get_settings()
+    if settings.broadcast_mode != "multi" or get_broadcaster().signer is None:
+        out(f"{Fore.YELLOW}⚠️ Пакетное снятие через authz требует подписи внутри процесса, "
+            f"кошельки снимают награды сами{Fore.RESET}")
+        return
+    rows = [snapshot[f"Wallet{i+1}"] for i in sorted(wallet_indices)]
+    wallets = [(row.wallet_name, row.address, row.validators) for row in rows
+               if row.ok and row.validators and row.rewards >= withdraw_threshold(row.validators)]
+    if not wallets:
+        return
+    withdrawer = get_authz_withdrawer()
+    if withdrawer is None:
+        return
+    out(f"\n{Fore.CYAN}{'='*60}{Fore.RESET}")
+    out(f"{Fore.WHITE}{Style.BRIGHT}🤝 Пакетное снятие через authz: {len(wallets)} кошельков, "
+        f"контроллер {settings.authz_controller}{Style.RESET_ALL}")
+    out(f"{Fore.CYAN}{'='*60}{Fore.RESET}")
+
+    ready, missing, unknown = withdrawer.check_grants(wallets)
+    if unknown:
+        out(f"{Fore.YELLOW}⚠️ Не удалось проверить разрешения {len(unknown)} кошельков, они снимут награды сами{Fore.RESET}")
+    if missing:
+        ready += grant_authz(withdrawer, missing, snapshot)
+    batches = [prepared for batch in withdrawer.plan(ready) for prepared in withdrawer.prepare(batch)]
+    if not batches:
+        return
+    out(f"{Fore.BLUE}📦 {len(ready)} кошельков в {len(batches)} транзакциях MsgExec "
+        f"(лимит газа транзакции {withdrawer.max_gas():,}){Fore.RESET}")
+
+    max_attempts = settings.max_withdraw_attempts
+    attempt = 0
+    while batches and attempt < max_attempts:
+        attempt += 1
+        # Все пакеты отправляются подряд, подтверждения ожидаются одновременно
+        submitted = []
+        for batch in batches:
+            out(f"{Fore.WHITE}📤 Пакет {len(batch.wallets)} кошельков, {len(batch.msgs)} снятий: "
+                f"gas {batch.gas:,} ({batch.gas_source}), комиссия {calculate_fees(batch.gas):,} {denom()}{Fore.RESET}")
+            try:
+                result = withdrawer.broadcast(batch)
+            except (SigningError, RPCError) as e:
+                out(f"{Fore.RED}❌ Ошибка подписи MsgExec: {e}{Fore.RESET}")
+                continue
+            if not result.accepted:
+                out(f"{Fore.RED}❌ MsgExec отклонена узлами (code {result.code}): {result.log}{Fore.RESET}")
+                continue
+            for wallet_name, _, _ in batch.wallets:
+                journal_record(BROADCAST, wallet_name, kind="authz", tx_hash=batch.tx_hash)
+            submitted.append((batch, get_tx_confirmer().submit(batch.tx_hash)))
+
+        retry = []
+        for batch, pending in submitted:
+            pending.done.wait()
+            status = pending.status if pending.found else False
+            batch.status = status
+            count_stat("transactions", f"authz:{tx_outcome(status)}")
+            for wallet_name, _, _ in batch.wallets:
+                record_tx_outcome(pending, wallet_name)
+            if status == "out_of_gas":
+                count_stat("out_of_gas", "authz")
+                get_metrics().inc("tx_retries_total", kind="authz", reason="out_of_gas")
+                batch.gas = int(batch.gas * settings.gas_increase_multiplier["withdraw"])
+                out(f"{Fore.YELLOW}⚠️  Пакет {batch.tx_hash[:16]}...: out of gas, повторяем с gas {batch.gas:,} "
+                    f"(попытка {attempt}/{max_attempts}){Fore.RESET}")
+                retry.append(batch)
+                continue
+            if status is not True:
+                out(f"{Fore.RED}❌ Пакет {batch.tx_hash[:16]}... не прошёл ({pending.log or 'не подтверждён'}): "
+                    f"{len(batch.wallets)} кошельков снимут награды сами{Fore.RESET}")
+                continue
+            out(f"{Fore.CYAN}Пакет {batch.tx_hash} включён в блок {pending.height} через {pending.latency:.1f} сек{Fore.RESET}")
+            for wallet_name, parts in withdrawer.breakdown(batch, pending.tx_result).items():
+                row = snapshot[wallet_name]
+                row.balance += parts["withdrawn"]
+                row.rewards = 0.0
+                get_fee_optimizer().withdrawn(wallet_name)
+                validators = f" с {parts['validators']} валидаторов" if parts["validators"] else ""
+                out(f"{Fore.WHITE}✅ [ {wallet_name} ]{Fore.GREEN} Снято {parts['withdrawn']:,} {denom()}{validators}{Fore.RESET}")
+        batches = retry
+
+    stats = withdrawer.stats
+    out(f"{Fore.GREEN}{Style.BRIGHT}✅ Через authz снято {stats['withdrawn']:,} {denom()} у {stats['wallets_withdrawn']} "
+        f"кошельков, комиссии контроллера {stats['fees']:,} {denom()}{Style.RESET_ALL}")
+
+def export_run_stats(snapshot):
+    """Итоги прохода в консоль и в stats_YYYYMMDD.json/csv (stats_<сеть>_YYYYMMDD для сетей из CHAINS)"""
+    chain = current_chain()
+    with _stats_lock:
+        run_stats = json.loads(json.dumps(chain.run_stats))
+    out_of_gas = sum(run_stats["out_of_gas"].values())
+    sent = sum(run_stats["transactions"].values())
+    out(f"{Fore.CYAN}📈 Транзакций: {sent}, повторов из-за out of gas: {out_of_gas}, "
+        f"источники газа: {run_stats['gas_sources'] or '-'}{Fore.RESET}")
+    read_cache = get_read_cache().to_dict()
+    out(f"{Fore.CYAN}🗃️  Кеш чтений: попаданий {read_cache['hits']}, промахов {read_cache['misses']} "
+        f"({read_cache['hit_rate']:.0%}){Fore.RESET}")
+    stats = {
+        "chain": chain.name,
+        "run": run_stats,
+        "gas_oracle": get_gas_oracle().stats,
+        "gas_simulator": get_gas_simulator().stats,
+        "address_cache": get_address_cache().stats,
+        "fee_optimizer": get_fee_optimizer().stats,
+        "authz": chain.authz_withdrawer.stats if chain.authz_withdrawer else None,
+        "wallet_index": _index_stats(),
+        "broadcaster": get_broadcaster().stats,
+        "signer": get_broadcaster().signer.stats if get_broadcaster().signer else None,
+        "rpc_nodes": get_rpc_client().nodes.snapshot(),
+        "rate_limits": get_rpc_client().limits_snapshot(),
+        "read_cache": read_cache,
+        "snapshot": snapshot.to_dict(),
+        "metrics": get_metrics().snapshot(),
+    }
+    get_logger().export_daily_stats(stats, csv_rows=snapshot.to_rows(), chain=chain.suffix)
+
+def _index_stats():
+    """Итоги за сегодня по локальному индексу (отправки на биржи, снятия, комиссии)"""
+    index = current_chain().wallet_index
+    if index is None:
+        return None
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    return dict(index.summary(today), stats=index.stats)
+
+def advance_read_cache(nodes):
+    """Высота из замера узлов для кеша чтений: без неё не кешируются чтения снимка"""
+    heights = [node["height"] for node in nodes if node["height"]]
+    if heights:
+        get_read_cache().advance(max(heights))
+    else:
+        get_read_cache().height()
+
+def probe_rpc_nodes():
+    """Замеряет узлы перед проходом и печатает их рейтинг"""
+    client = get_rpc_client()
+    nodes = client.probe_nodes()
+    advance_read_cache(nodes)
+    ranked = client.nodes.ranked()
+    nodes.sort(key=lambda n: ranked.index(n["url"]) if n["url"] in ranked else len(ranked))
+    for node in nodes:
+        latency = f"{node['latency_ms']} мс" if node["latency_ms"] is not None else "нет ответа"
+        color = Fore.GREEN if node["state"] == "closed" and node["latency_ms"] is not None else Fore.RED
+        out(f"{color}🌐 {node['url']}: {latency}, высота {node['height'] or '-'}{Fore.RESET}")
+
+def print_plan(plan):
+    """План прохода в консоль: действия по кошелькам и итоги"""
+    out(f"\n{Fore.CYAN}{'='*60}{Fore.RESET}")
+    out(f"{Fore.WHITE}{Style.BRIGHT}🧾 План прохода (транзакции не отправляются){Style.RESET_ALL}")
+    out(f"{Fore.CYAN}{'='*60}{Fore.RESET}")
+    for wallet in plan:
+        if not wallet.has_actions:
+            if wallet.note.startswith("ошибка"):
+                out(f"{Fore.RED}❌ [ {wallet.wallet_name} ] {wallet.note}{Fore.RESET}")
+            continue
+        send = f"{wallet.send_amount:,}–{wallet.send_amount_max:,} {denom()} на {wallet.exchange} ({wallet.target})"
+        if wallet.combined:
+            out(f"{Fore.WHITE}🧩 [ {wallet.wallet_name} ]{Fore.BLUE} Снятие {wallet.rewards:,.0f} + отправка {send}, "
+                f"gas {wallet.withdraw_gas:,}, комиссия {wallet.withdraw_fees:,} {denom()}{Fore.RESET}")
+            continue
+        if wallet.withdraw:
+            out(f"{Fore.WHITE}🎁 [ {wallet.wallet_name} ]{Fore.MAGENTA} Снятие {wallet.rewards:,.0f} {denom()} "
+                f"с {wallet.validators} валидаторов, gas {wallet.withdraw_gas:,}, комиссия {wallet.withdraw_fees:,} {denom()}{Fore.RESET}")
+        if wallet.send:
+            note = f" ({wallet.note})" if wallet.note else ""
+            out(f"{Fore.WHITE}🚀 [ {wallet.wallet_name} ]{Fore.GREEN} Отправка {send}, "
+                f"gas {wallet.send_gas:,}, комиссия {wallet.send_fees:,} {denom()}{note}{Fore.RESET}")
+    totals = plan.totals()
+    out(f"{Fore.CYAN}{'─'*60}{Fore.RESET}")
+    out(f"{Fore.YELLOW}Кошельков с действиями: {Fore.CYAN}{totals['with_actions']}/{totals['wallets']}{Fore.YELLOW} "
+        f"(снятий {totals['withdrawals']}, отправок {totals['sends']}, одной транзакцией {totals['combined']}), "
+        f"ошибок снимка: {totals['errors']}{Fore.RESET}")
+    out(f"{Fore.YELLOW}Транзакций: {Fore.CYAN}{totals['transactions']}{Fore.YELLOW}, комиссии: {Fore.CYAN}{totals['fees']:,}"
+        f"{Fore.YELLOW} {denom()}, награды к снятию: {Fore.CYAN}{totals['rewards']:,.0f}{Fore.YELLOW} {denom()}{Fore.RESET}")
+    out(f"{Fore.YELLOW}На биржи: {Fore.MAGENTA}{Style.BRIGHT}{totals['send_min']:,}–{totals['send_max']:,}"
+        f"{Style.RESET_ALL}{Fore.YELLOW} {denom()}{Fore.RESET}")
+    if plan.worthwhile:
+        out(f"{Fore.GREEN}{Style.BRIGHT}✅ Проход имеет смысл (план за {plan.duration:.1f} сек){Style.RESET_ALL}")
+    else:
+        out(f"{Fore.BLUE}{Style.BRIGHT}⚡ Делать нечего: все кошельки ниже порогов (план за {plan.duration:.1f} сек){Style.RESET_ALL}")
+
+def run_plan(wallet_targets, scan_all=False):
+    """Режим плана (DRY_RUN / --plan): только запросы чтения, без транзакций и записей в журнал.
+
+    Возвращает код выхода: 0 - проход имеет смысл, EXIT_NOTHING_TO_DO - действий нет.
+    """
+    settings = get_settings()
+    wallet_names = [f"Wallet{i+1}" for i in schedule_wallets(range(settings.num_wallets), scan_all)]
+    preload_wallet_addresses(wallet_names)
+    snapshot = take_portfolio_snapshot(wallet_names, settings.scan_workers)
+    get_fee_optimizer().observe(snapshot)
+    with get_metrics().timer("plan_seconds"):
+        plan = build_plan(snapshot, wallet_targets, get_gas_oracle(), settings, withdraw_threshold)
+    get_fee_optimizer().save()
+    print_plan(plan)
+    get_logger().export_plan(plan.to_dict(), csv_rows=plan.to_rows(), chain=current_chain().suffix)
+    return 0 if plan.worthwhile else EXIT_NOTHING_TO_DO
+
+def schedule_wallets(wallet_indices, scan_all=False):
+    """Индексы кошельков, которые пора проверять по прогнозу наград (SCHEDULE_WALLETS)"""
+    wallet_indices = list(wallet_indices)
+    if scan_all or not get_settings().schedule_wallets:
+        return wallet_indices
+    due, next_check = get_fee_optimizer().due([f"Wallet{i+1}" for i in wallet_indices])
+    if next_check is not None:
+        minutes = max(next_check - time.time(), 0) / 60
+        out(f"{Fore.BLUE}🗓️  Проверка отложена для {len(wallet_indices) - len(due)} кошельков: награды ещё не окупают "
+            f"комиссию (ближайший через {minutes:,.0f} мин){Fore.RESET}")
+    due = set(due)
+    return [i for i in wallet_indices if f"Wallet{i+1}" in due]
+
+def needs_processing(row):
+    """По строке снимка определяет, возможно ли для кошелька снятие или отправка"""
+    if not row.ok:
+        return True
+    settings = get_settings()
+    if row.rewards >= withdraw_threshold(row.validators):
+        return True
+    return row.balance - min(settings.min_balance_remain, row.balance) >= settings.min_send_amount
+
+def _timed_process_wallet(i, total, wallet_targets, scanned=None):
+    """Обработка кошелька в изоляции: ошибка одного кошелька не влияет на остальные"""
+    wallet_name = f"Wallet{i+1}"
+    _wallet_context.name = wallet_name
+    journal_record(PLANNED)
+    started = time.monotonic()
+    try:
+        action_performed = process_wallet(i, total, wallet_targets, scanned)
+        get_metrics().observe("wallet_seconds", time.monotonic() - started,
+                              outcome="action" if action_performed else "idle")
+        get_logger().log_event(
+            "wallet_done", f"[{wallet_name}] обработка завершена", console=False, chain=current_chain().name,
+            wallet=wallet_name,
+            action_performed=action_performed, duration=round(time.monotonic() - started, 3),
+        )
+        return action_performed, time.monotonic() - started
+    except Exception as e:
+        out(f"{Fore.WHITE}❌ [ {wallet_name} ]{Fore.RED}{Style.BRIGHT} Необработанная ошибка: {e}{Style.RESET_ALL}{Fore.RESET}")
+        get_logger().log_event("error", f"[{wallet_name}] {e}", logging.ERROR, console=False,
+                               chain=current_chain().name, wallet=wallet_name)
+        get_metrics().observe("wallet_seconds", time.monotonic() - started, outcome="error")
+        return False, time.monotonic() - started
+    finally:
+        _wallet_context.name = None
+
+def run_sequential(wallet_indices, wallet_targets, snapshot):
+    for i in wallet_indices:
+        _timed_process_wallet(i, len(wallet_indices), wallet_targets, snapshot.get(f"Wallet{i+1}"))
+
+def enable_concurrency(max_inflight_tx):
+    """Лимит транзакций сети в ожидании и пометка вывода кошельком для нескольких потоков"""
+    global _tag_output
+    current_chain().tx_slots = threading.BoundedSemaphore(max_inflight_tx)
+    _tag_output = True
+
+def run_concurrent(wallet_indices, wallet_targets, snapshot, workers, max_inflight_tx):
+    """Параллельная обработка кошельков пулом потоков"""
+    enable_concurrency(max_inflight_tx)
+    total = len(wallet_indices)
+    started = time.monotonic()
+
+    durations = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="wallet") as pool:
+        futures = [
+            pool.submit(in_chain(_timed_process_wallet), i, total, wallet_targets, snapshot.get(f"Wallet{i+1}"))
+            for i in wallet_indices
+        ]
+        for future in as_completed(futures):
+            durations.append(future.result()[1])
+
+    wall_time = time.monotonic() - started + snapshot.duration
+    sequential_time = sum(durations) + sum(row.scan_time for row in snapshot)
+    out(f"\n{Fore.CYAN}{'='*60}{Fore.RESET}")
+    out(f"{Fore.WHITE}{Style.BRIGHT}⏱️  Время прохода: {wall_time:,.1f} сек (потоков: {workers}, транзакций в полёте: {max_inflight_tx}){Style.RESET_ALL}")
+    out(f"{Fore.YELLOW}   Последовательный режим (оценка): {sequential_time:,.1f} сек, ускорение x{sequential_time / max(wall_time, 1e-6):.1f}{Fore.RESET}")
+    out(f"{Fore.CYAN}{'='*60}{Fore.RESET}")
+
+def parse_args(argv=None):
+    """Аргументы командной строки; не заданный аргумент - None (остаётся значение из настроек).
+
+    Настройки здесь не читаются: --help работает и при ошибках в .env.
+    """
+    parser = argparse.ArgumentParser(description="Снятие наград и отправка ATOM на биржи")
+    parser.add_argument("--workers", type=int,
+                        help="Кошельков в обработке одновременно (1 - последовательный режим)")
+    parser.add_argument("--max-inflight-tx", type=int,
+                        help="Максимум транзакций, ожидающих подтверждения")
+    parser.add_argument("--node-concurrency", type=int,
+                        help="Максимум одновременных запросов к одному RPC узлу")
+    parser.add_argument("--scan-workers", type=int,
+                        help="Потоков для сканирования балансов и наград")
+    parser.add_argument("--broadcast", choices=BROADCAST_MODES,
+                        help="multi - подпись один раз и рассылка на несколько узлов, gaiad - через один узел")
+    parser.add_argument("--sign", choices=SIGN_MODES,
+                        help="local - подпись внутри процесса (нужен ecdsa), gaiad - через `gaiad tx sign`")
+    parser.add_argument("--combined", action="store_true", default=None,
+                        help="Снятие наград и отправка одной транзакцией")
+    parser.add_argument("--authz", metavar="KEY",
+                        help="Снимать награды пакетами MsgExec через authz ключом-контроллером KEY")
+    parser.add_argument("--plan", action="store_true", default=None,
+                        help="Только план прохода: суммы, газ и комиссии без отправки транзакций (как DRY_RUN=true)")
+    parser.add_argument("--scan-all", action="store_true",
+                        help="Проверить все кошельки, не дожидаясь прогнозного времени порога наград")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Начать новый проход, не продолжая прерванный")
+    parser.add_argument("--metrics-port", type=int,
+                        help="Отдавать метрики в формате Prometheus на http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--chains", metavar="NAME[,NAME]",
+                        help="Сети одного процесса по профилям chains.py и CHAINS_FILE (например cosmoshub,mantra)")
+    return parser.parse_args(argv)
+
+def configure_from_args(argv=None):
+    """Аргументы командной строки поверх настроек: (args, settings, chains) или None при ошибках конфигурации"""
+    args = parse_args(argv)
+    overrides = {
+        "workers": args.workers, "max_inflight_tx": args.max_inflight_tx,
+        "node_concurrency": args.node_concurrency, "scan_workers": args.scan_workers,
+        "broadcast_mode": args.broadcast, "sign_mode": args.sign, "combined": args.combined,
+        "metrics_port": args.metrics_port, "dry_run": args.plan, "authz_controller": args.authz,
+    }
+    if args.chains is not None:
+        overrides["chains"] = tuple(name.strip() for name in args.chains.split(",") if name.strip())
+    try:
+        settings = configure(**{field: value for field, value in overrides.items() if value is not None})
+        chains = chain_contexts(settings)
+    except ConfigError as e:
+        # Логгер без настроек не создать: ошибки конфигурации печатаются напрямую
+        print(f"{Fore.RED}⚠️ Ошибки в конфигурации:{Fore.RESET}")
+        for error in e.errors:
+            print(f"{Fore.RED}  - {error}{Fore.RESET}")
+        print(f"{Fore.RED}Исправьте ошибки перед запуском системы.{Fore.RESET}")
+        return None
+    return args, settings, chains
+
+def run_chains(chains, run):
+    """run() в каждой сети: одна сеть - в этом потоке, несколько - параллельно, по потоку на сеть.
+
+    Возвращает результаты run() в порядке chains; необработанная ошибка сети не останавливает остальные.
+    """
+    if len(chains) == 1:
+        with chain_scope(chains[0]):
+            return [run()]
+
+    def run_chain(chain):
+        with chain_scope(chain):
+            try:
+                return run()
+            except Exception as e:
+                out(f"{Fore.RED}{Style.BRIGHT}❌ Необработанная ошибка сети: {e}{Style.RESET_ALL}")
+                get_logger().log_event("error", f"<{chain.name}> {e}", logging.ERROR, console=False, chain=chain.name)
+                return 1
+
+    out(f"{Fore.CYAN}🔗 Сети: {', '.join(chain.name for chain in chains)}{Fore.RESET}")
+    with ThreadPoolExecutor(max_workers=len(chains), thread_name_prefix="chain") as pool:
+        return list(pool.map(run_chain, chains))
+
+def run_pass(args):
+    """Проход по кошелькам сети потока: план (DRY_RUN) или снятие и отправка"""
+    settings = get_settings()
+    wallet_targets = load_wallet_targets()
+    if wallet_targets is None:
+        return
+
+    probe_rpc_nodes()
+    if settings.dry_run:
+        return run_plan(wallet_targets, args.scan_all)
+    update_wallet_index()
+
+    journal = get_journal()
+    if args.fresh:
+        journal.abandon_unfinished()
+    resumed = journal.unfinished_run()
+    if resumed:
+        run_id, wallet_indices = resumed
+        journal.resume_run(run_id)
+        reconcile_journal()
+        finished = journal.finished_wallets()
+        wallet_indices = [i for i in wallet_indices
+                          if f"Wallet{i+1}" not in finished and i < settings.num_wallets]
+        out(f"{Fore.CYAN}▶️  Продолжаем прерванный проход #{run_id}: осталось {len(wallet_indices)} "
+            f"кошельков, завершено {len(finished)}{Fore.RESET}")
+    else:
+        wallet_indices = schedule_wallets(range(settings.num_wallets), args.scan_all)
+        random.shuffle(wallet_indices)
+        journal.start_run(wallet_indices)
+
+    wallet_names = [f"Wallet{i+1}" for i in sorted(wallet_indices)]
+    preload_wallet_addresses(wallet_names)
+    snapshot = take_portfolio_snapshot(wallet_names, settings.scan_workers)
+    get_fee_optimizer().observe(snapshot)
+    skipped = [i for i in wallet_indices if not needs_processing(snapshot[f"Wallet{i+1}"])]
+    for i in skipped:
+        journal_record(SKIPPED, f"Wallet{i+1}")
+    skipped_set = set(skipped)
+    wallet_indices = [i for i in wallet_indices if i not in skipped_set]
+    if skipped:
+        out(f"{Fore.BLUE}⏭️  Пропускаем {len(skipped)} кошельков: награды и баланс ниже порогов{Fore.RESET}")
+
+    if settings.authz_controller:
+        run_authz_withdrawals(wallet_indices, snapshot)
+        done = {i for i in wallet_indices if not needs_processing(snapshot[f"Wallet{i+1}"])}
+        for i in done:
+            journal_record(DONE, f"Wallet{i+1}", detail="награды сняты через authz, отправлять нечего")
+        wallet_indices = [i for i in wallet_indices if i not in done]
+
+    if settings.workers > 1:
+        run_concurrent(wallet_indices, wallet_targets, snapshot, settings.workers, settings.max_inflight_tx)
+    else:
+        run_sequential(wallet_indices, wallet_targets, snapshot)
+
+    journal.finish_run()
+    get_fee_optimizer().save()
+    update_wallet_index()
+    export_run_stats(snapshot)
+
+def main(argv=None):
+    configured = configure_from_args(argv)
+    if configured is None:
+        return 1
+    args, settings, chains = configured
+
+    if settings.metrics_port:
+        start_http_server(get_metrics(), settings.metrics_port)
+        out(f"{Fore.CYAN}📊 Метрики: http://127.0.0.1:{settings.metrics_port}/metrics{Fore.RESET}")
+
+    codes = run_chains(chains, lambda: run_pass(args))
+    if len(codes) == 1:
+        return codes[0]
+    failed = [code for code in codes if code not in (None, 0, EXIT_NOTHING_TO_DO)]
+    if failed:
+        return failed[0]
+    return EXIT_NOTHING_TO_DO if all(code == EXIT_NOTHING_TO_DO for code in codes) else 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
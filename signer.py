@@ -0,0 +1,300 @@
+# signer.py - Сборка и подпись транзакций SIGN_MODE_DIRECT внутри процесса
+
+import hashlib
+import os
+import re
+import subprocess
+import threading
+
+try:
+    import ecdsa
+    from ecdsa.util import sigencode_string_canonize
+except ImportError:     # Без ecdsa подпись делает gaiad (broadcaster.py)
+    ecdsa = None
+
+from broadcaster import SigningError
+from metrics import get_metrics
+
+MSG_SEND = "/cosmos.bank.v1beta1.MsgSend"
+MSG_WITHDRAW = "/cosmos.distribution.v1beta1.MsgWithdrawDelegatorReward"
+MSG_GRANT = "/cosmos.authz.v1beta1.MsgGrant"
+MSG_EXEC = "/cosmos.authz.v1beta1.MsgExec"
+GENERIC_AUTHORIZATION = "/cosmos.authz.v1beta1.GenericAuthorization"
+PUBKEY_TYPE = "/cosmos.crypto.secp256k1.PubKey"
+SIGN_MODE_DIRECT = 1
+
+KEY_EXPORT_TIMEOUT = 60     # Таймаут `gaiad keys export` (сек)
+
+_EXPECTED_SEQUENCE_RE = re.compile(r"expected (\d+)")
+
+
+# ----------------------------------------------------------------------
+# Protobuf: только то, что нужно для Tx, без зависимости от protobuf
+# ----------------------------------------------------------------------
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field_bytes(number, value):
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    if not value:
+        return b""  # proto3: пустые значения не кодируются
+    return _varint(number << 3 | 2) + _varint(len(value)) + value
+
+
+def _field_uint(number, value):
+    if not value:
+        return b""
+    return _varint(number << 3) + _varint(value)
+
+
+def _any(type_url, value):
+    return _field_bytes(1, type_url) + _field_bytes(2, value)
+
+
+def _coin(amount, denom):
+    return _field_bytes(1, denom) + _field_bytes(2, str(amount))
+
+
+def msg_send(from_address, to_address, amount, denom="uatom"):
+    """MsgSend в виде Any"""
+    value = (_field_bytes(1, from_address) + _field_bytes(2, to_address)
+             + _field_bytes(3, _coin(amount, denom)))
+    return _any(MSG_SEND, value)
+
+
+def msg_withdraw_reward(delegator_address, validator_address):
+    """MsgWithdrawDelegatorReward в виде Any"""
+    return _any(MSG_WITHDRAW, _field_bytes(1, delegator_address) + _field_bytes(2, validator_address))
+
+
+def withdraw_all_msgs(delegator_address, validators):
+    """Аналог `withdraw-all-rewards`: по сообщению на каждого валидатора"""
+    return [msg_withdraw_reward(delegator_address, validator) for validator in validators]
+
+
+def msg_grant(granter, grantee, msg_type_url, expiration):
+    """MsgGrant с GenericAuthorization на сообщения msg_type_url до expiration (unix time) в виде Any"""
+    authorization = _any(GENERIC_AUTHORIZATION, _field_bytes(1, msg_type_url))
+    grant = _field_bytes(1, authorization) + _field_bytes(2, _field_uint(1, int(expiration)))
+    value = _field_bytes(1, granter) + _field_bytes(2, grantee) + _field_bytes(3, grant)
+    return _any(MSG_GRANT, value)
+
+
+def msg_exec(grantee, msgs):
+    """MsgExec: grantee выполняет сообщения (Any) от имени выдавших разрешение"""
+    return _any(MSG_EXEC, _field_bytes(1, grantee) + b"".join(_field_bytes(2, msg) for msg in msgs))
+
+
+def encode_body(msgs, memo=""):
+    return b"".join(_field_bytes(1, msg) for msg in msgs) + _field_bytes(2, memo)
+
+
+def encode_auth_info(public_key, sequence, fee_amount, gas, denom="uatom"):
+    pubkey_any = _any(PUBKEY_TYPE, _field_bytes(1, public_key))
+    mode_info = _field_bytes(1, _field_uint(1, SIGN_MODE_DIRECT))
+    signer_info = _field_bytes(1, pubkey_any) + _field_bytes(2, mode_info) + _field_uint(3, sequence)
+    fee = _field_bytes(1, _coin(fee_amount, denom)) + _field_uint(2, gas)
+    return _field_bytes(1, signer_info) + _field_bytes(2, fee)
+
+
+def encode_sign_doc(body_bytes, auth_info_bytes, chain_id, account_number):
+    return (_field_bytes(1, body_bytes) + _field_bytes(2, auth_info_bytes)
+            + _field_bytes(3, chain_id) + _field_uint(4, account_number))
+
+
+def encode_tx_raw(body_bytes, auth_info_bytes, signature):
+    return _field_bytes(1, body_bytes) + _field_bytes(2, auth_info_bytes) + _field_bytes(3, signature)
+
+
+# ----------------------------------------------------------------------
+# Адреса
+# ----------------------------------------------------------------------
+
+_BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+
+
+def _bech32_polymod(values):
+    generator = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1FFFFFF) << 5 ^ value
+        for i in range(5):
+            checksum ^= generator[i] if (top >> i) & 1 else 0
+    return checksum
+
+
+def bech32_address(prefix, data):
+    """Bech32 адрес из байт (20 байт хеша ключа)"""
+    words, acc, bits = [], 0, 0
+    for byte in data:
+        acc = acc << 8 | byte
+        bits += 8
+        while bits >= 5:
+            bits -= 5
+            words.append(acc >> bits & 31)
+    if bits:
+        words.append(acc << (5 - bits) & 31)
+    expanded = [ord(c) >> 5 for c in prefix] + [0] + [ord(c) & 31 for c in prefix]
+    polymod = _bech32_polymod(expanded + words + [0] * 6) ^ 1
+    checksum = [polymod >> 5 * (5 - i) & 31 for i in range(6)]
+    return prefix + "1" + "".join(_BECH32_CHARSET[w] for w in words + checksum)
+
+
+def bech32_decode(address):
+    """(префикс, байты) bech32 адреса; ValueError при неверной записи или контрольной сумме"""
+    address = address.strip().lower()
+    prefix, sep, rest = address.rpartition("1")
+    if not sep or not prefix or len(rest) < 6 or any(c not in _BECH32_CHARSET for c in rest):
+        raise ValueError(f"Неверный bech32 адрес: {address!r}")
+    words = [_BECH32_CHARSET.index(c) for c in rest]
+    expanded = [ord(c) >> 5 for c in prefix] + [0] + [ord(c) & 31 for c in prefix]
+    if _bech32_polymod(expanded + words) != 1:
+        raise ValueError(f"Неверная контрольная сумма адреса: {address!r}")
+    data, acc, bits = [], 0, 0
+    for word in words[:-6]:
+        acc = acc << 5 | word
+        bits += 5
+        if bits >= 8:
+            bits -= 8
+            data.append(acc >> bits & 0xFF)
+    return prefix, bytes(data)
+
+
+def convert_address(address, prefix):
+    """Тот же аккаунт с другим префиксом: ключ coin type 118 подходит всем таким сетям"""
+    current, data = bech32_decode(address)
+    return address if current == prefix else bech32_address(prefix, data)
+
+
+def pubkey_address(public_key, prefix="cosmos"):
+    """Адрес аккаунта: bech32(RIPEMD160(SHA256(pubkey))). None, если в OpenSSL нет RIPEMD160"""
+    try:
+        ripemd = hashlib.new("ripemd160", hashlib.sha256(public_key).digest()).digest()
+    except ValueError:
+        return None
+    return bech32_address(prefix, ripemd)
+
+
+# ----------------------------------------------------------------------
+# Подпись
+# ----------------------------------------------------------------------
+
+class _Account:
+    def __init__(self, account_number, sequence):
+        self.account_number = account_number
+        self.sequence = sequence
+
+
+class Signer:
+    """Подписывает транзакции без запуска gaiad на каждую операцию.
+
+    Ключ кошелька экспортируется из keyring один раз (`gaiad keys export
+    --unarmored-hex`) и хранится только в памяти процесса. account_number
+    кешируется навсегда, sequence ведётся локально: берётся из REST при
+    первой подписи и увеличивается после каждой принятой узлом транзакции.
+    При отказе "account sequence mismatch" sequence берётся из ответа узла.
+    """
+
+    def __init__(self, client, gaiad_bin="gaiad", prefix="cosmos", timeout=KEY_EXPORT_TIMEOUT):
+        if ecdsa is None:
+            raise SigningError("Для подписи внутри процесса нужен пакет ecdsa (pip install ecdsa)")
+        self.client = client
+        self.gaiad_bin = gaiad_bin
+        self.prefix = prefix
+        self.timeout = timeout
+        self._keys = {}         # имя кошелька -> SigningKey
+        self._accounts = {}     # адрес -> _Account
+        self._lock = threading.Lock()
+        self.stats = {"keys_loaded": 0, "signed": 0, "account_queries": 0, "sequence_resyncs": 0}
+
+    def _export_key(self, wallet_name):
+        command = [self.gaiad_bin, "keys", "export", wallet_name, "--unarmored-hex", "--unsafe", "-y"]
+        passphrase = os.getenv("KEYRING_PASSPHRASE")
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=self.timeout,
+                                    input=f"{passphrase}\n" if passphrase else None)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise SigningError(f"gaiad keys export {wallet_name}: {e}") from e
+        key_hex = result.stdout.strip().splitlines()[-1] if result.stdout.strip() else ""
+        if result.returncode != 0 or not re.fullmatch(r"[0-9a-fA-F]{64}", key_hex):
+            raise SigningError(f"gaiad keys export {wallet_name}: {result.stderr.strip() or 'нет ключа'}")
+        return bytes.fromhex(key_hex)
+
+    def _key(self, wallet_name, address):
+        with self._lock:
+            key = self._keys.get(wallet_name)
+        if key is not None:
+            return key
+        key = ecdsa.SigningKey.from_string(self._export_key(wallet_name), curve=ecdsa.SECP256k1)
+        derived = pubkey_address(self.public_key(key), self.prefix)
+        if derived is not None and derived != address:
+            raise SigningError(f"Ключ {wallet_name} не соответствует адресу {address}")
+        with self._lock:
+            self._keys[wallet_name] = key
+            self.stats["keys_loaded"] += 1
+        return key
+
+    @staticmethod
+    def public_key(key):
+        return key.get_verifying_key().to_string("compressed")
+
+    def _account(self, address):
+        with self._lock:
+            account = self._accounts.get(address)
+        if account is None:
+            account_number, sequence = self.client.get_account(address)
+            account = _Account(account_number, sequence)
+            with self._lock:
+                self._accounts[address] = account
+                self.stats["account_queries"] += 1
+        return account
+
+    def sign(self, msgs, wallet_name, address, fee_amount, gas, denom="uatom", memo=""):
+        """Подписанный TxRaw (bytes) и использованный sequence"""
+        with get_metrics().timer("sign_seconds", mode="local"):
+            return self._sign(msgs, wallet_name, address, fee_amount, gas, denom, memo)
+
+    def _sign(self, msgs, wallet_name, address, fee_amount, gas, denom, memo):
+        key = self._key(wallet_name, address)
+        account = self._account(address)
+        chain_id = self.client.get_chain_id()
+        with self._lock:
+            sequence = account.sequence
+        body = encode_body(msgs, memo)
+        auth_info = encode_auth_info(self.public_key(key), sequence, fee_amount, gas, denom)
+        sign_doc = encode_sign_doc(body, auth_info, chain_id, account.account_number)
+        signature = key.sign_deterministic(sign_doc, hashfunc=hashlib.sha256,
+                                           sigencode=sigencode_string_canonize)
+        with self._lock:
+            self.stats["signed"] += 1
+        return encode_tx_raw(body, auth_info, signature), sequence
+
+    def mark_accepted(self, address, sequence):
+        """Транзакция с этим sequence принята в мемпул - следующая получает sequence + 1"""
+        with self._lock:
+            account = self._accounts.get(address)
+            if account is not None and account.sequence <= sequence:
+                account.sequence = sequence + 1
+
+    def resync(self, address, log=""):
+        """Сбрасывает sequence по ответу узла ("expected N") или перечитывает аккаунт"""
+        match = _EXPECTED_SEQUENCE_RE.search(log or "")
+        with self._lock:
+            self.stats["sequence_resyncs"] += 1
+            account = self._accounts.get(address)
+            if match and account is not None:
+                account.sequence = int(match.group(1))
+                return
+            self._accounts.pop(address, None)
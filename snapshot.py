@@ -0,0 +1,100 @@
+# snapshot.py - Снимок портфеля: адреса, балансы и награды всех кошельков за одну фазу
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime
+
+from rpc_client import RPCError, rewards_total
+
+
+@dataclass
+class WalletSnapshot:
+    """Состояние одного кошелька на момент снимка"""
+    wallet_name: str
+    address: str = ""
+    balance: int = 0
+    rewards: float = 0.0
+    validators: int = 0
+    error: str = ""
+    scan_time: float = 0.0
+
+    @property
+    def ok(self):
+        return not self.error
+
+
+class PortfolioSnapshot:
+    """Таблица состояний кошельков, из которой читают последующие стадии"""
+
+    def __init__(self, rows, taken_at=None, duration=0.0):
+        self.rows = {row.wallet_name: row for row in rows}
+        self.taken_at = taken_at or datetime.now()
+        self.duration = duration
+
+    def __getitem__(self, wallet_name):
+        return self.rows[wallet_name]
+
+    def get(self, wallet_name):
+        return self.rows.get(wallet_name)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows.values())
+
+    def totals(self):
+        ok_rows = [row for row in self if row.ok]
+        return {
+            "wallets": len(self.rows),
+            "errors": len(self.rows) - len(ok_rows),
+            "balance": sum(row.balance for row in ok_rows),
+            "rewards": round(sum(row.rewards for row in ok_rows), 6),
+        }
+
+    def to_rows(self):
+        """Строки для CSV экспорта"""
+        return [asdict(row) for row in self]
+
+    def to_dict(self):
+        """Представление для JSON экспорта"""
+        return {
+            "taken_at": self.taken_at.isoformat(timespec="seconds"),
+            "duration_sec": round(self.duration, 3),
+            "totals": self.totals(),
+            "wallets": self.to_rows(),
+        }
+
+
+def snapshot_wallet(wallet_name, resolve_address, client, denom="uatom"):
+    """Снимок одного кошелька: адрес, баланс, награды и число валидаторов"""
+    started = time.monotonic()
+    row = WalletSnapshot(wallet_name, resolve_address(wallet_name) or "")
+    if not row.address:
+        row.error = "адрес не найден"
+    else:
+        try:
+            row.balance = client.get_balance(row.address, denom)
+            rewards_data = client.get_rewards(row.address)
+            row.rewards = rewards_total(rewards_data, denom)
+            row.validators = len(rewards_data.get("rewards") or [])
+        except (RPCError, KeyError, ValueError) as e:
+            row.error = str(e)
+    row.scan_time = round(time.monotonic() - started, 3)
+    return row
+
+
+def take_snapshot(wallet_names, resolve_address, client, denom="uatom", workers=32):
+    """Параллельно запрашивает адреса, балансы и награды всех кошельков.
+
+    resolve_address(wallet_name) -> bech32 адрес. Кошельки с ошибкой
+    запроса попадают в таблицу с заполненным полем error.
+    """
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="snapshot") as pool:
+        rows = list(pool.map(
+            lambda name: snapshot_wallet(name, resolve_address, client, denom),
+            wallet_names,
+        ))
+    return PortfolioSnapshot(rows, duration=time.monotonic() - started)
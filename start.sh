@@ -153,10 +153,10 @@ case $choice in
     4)
         echo "⚙️  Тестирование расчета газа..."
         echo "Тест расчета газа для снятия наград:"
-        ./calculate_gas.sh
+        python3 gas_oracle.py withdraw
         echo " "
         echo "Тест расчета газа для отправки:"
-        ./calculate_send_gas.sh
+        python3 gas_oracle.py send
         echo " "
         echo "Современный JS расчет:"
         npm run gas-withdraw
@@ -0,0 +1,116 @@
+# conftest.py - Общие фикстуры: локальный узел из benchmarks/fake_node.py, ключи fake_gaiad
+# и HTTP узел с заданными ответами
+#
+# Запуск из корня проекта:
+#   python3 -m pytest tests
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+sys.path[:0] = [ROOT, BENCH_DIR]
+
+from fake_gaiad import private_key, write_keyring  # noqa: E402
+from fake_node import FakeChain, FakeNode  # noqa: E402
+from rpc_client import CosmosRPCClient  # noqa: E402
+
+FAKE_GAIAD = os.path.join(BENCH_DIR, "fake_gaiad.py")
+BLOCK_TIME = 0.05
+
+
+class StubNode:
+    """HTTP узел, отвечающий по таблице routes: {path: (HTTP статус, JSON тело)}.
+    Тело может быть функцией от параметров запроса. Запросы пишутся в requests"""
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                stub.requests.append((url.path, params))
+                status, body = stub.routes.get(url.path, (404, {"code": 5, "message": "not found"}))
+                if callable(body):
+                    body = body(params)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_node():
+    node = StubNode()
+    node.start()
+    yield node
+    node.stop()
+
+
+@pytest.fixture
+def chain():
+    return FakeChain(block_time=BLOCK_TIME)
+
+
+@pytest.fixture
+def node(chain):
+    node = FakeNode(chain)
+    node.start()
+    yield node
+    node.stop()
+
+
+@pytest.fixture
+def client(node):
+    client = CosmosRPCClient([node.url], sleep=lambda seconds: None)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def keyring(tmp_path, monkeypatch):
+    """Ключи Wallet1..Wallet3 в keyring fake_gaiad; вызовы gaiad пишутся в gaiad_calls"""
+    pytest.importorskip("ecdsa")
+    write_keyring(str(tmp_path), 3)
+    monkeypatch.setenv("GAIAD_HOME", str(tmp_path))
+    monkeypatch.setenv("FAKE_GAIAD_LOG", str(tmp_path / "gaiad_calls"))
+    return tmp_path
+
+
+def gaiad_calls(keyring):
+    """Подкоманды gaiad, запущенные с начала теста ("keys export", "tx bank", ...)"""
+    path = keyring / "gaiad_calls"
+    return path.read_text(encoding="utf-8").splitlines() if path.exists() else []
+
+
+def wallet_address(name):
+    """Адрес ключа fake_gaiad"""
+    import ecdsa
+    from signer import pubkey_address
+
+    key = ecdsa.SigningKey.from_string(private_key(name), curve=ecdsa.SECP256k1)
+    return pubkey_address(key.get_verifying_key().to_string("compressed"))
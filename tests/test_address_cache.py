@@ -0,0 +1,55 @@
+# test_address_cache.py - Кеш адресов ключей: один keys list на промахи, файл между запусками и сброс по keyring
+
+import pytest
+
+from address_cache import AddressCache
+from conftest import FAKE_GAIAD, gaiad_calls, wallet_address
+from fake_gaiad import write_keyring
+
+
+@pytest.fixture
+def cache_path(keyring):
+    return keyring / "address_cache.json"
+
+
+def open_cache(keyring, cache_path):
+    return AddressCache(cache_path, gaiad_home=keyring, gaiad_bin=FAKE_GAIAD)
+
+
+def test_misses_filled_by_one_keys_list(keyring, cache_path):
+    cache = open_cache(keyring, cache_path)
+    addresses = cache.get_many(["Wallet1", "Wallet2", "Missing"])
+    assert addresses == {"Wallet1": wallet_address("Wallet1"), "Wallet2": wallet_address("Wallet2")}
+    assert gaiad_calls(keyring) == ["keys list"]
+
+    # Уже известные адреса и отсутствующий в keyring ключ повторно gaiad не запускают
+    assert cache.get("Wallet3") == wallet_address("Wallet3")
+    assert cache.get_many(["Wallet1", "Missing"]) == {"Wallet1": wallet_address("Wallet1")}
+    assert cache.stats == {"hits": 3, "misses": 3, "keyring_calls": 1}
+
+
+def test_file_reused_until_keyring_changes(keyring, cache_path):
+    open_cache(keyring, cache_path).get_many(["Wallet1", "Wallet2"])
+    cache = open_cache(keyring, cache_path)
+    assert cache.get("Wallet2") == wallet_address("Wallet2")
+    assert cache.stats["keyring_calls"] == 0
+
+    # Новый ключ меняет mtime каталога keyring: кеш из файла не используется
+    write_keyring(str(keyring), 4)
+    (keyring / "keyring-test" / "Wallet4.info").touch()
+    cache = open_cache(keyring, cache_path)
+    assert cache.get("Wallet4") == wallet_address("Wallet4")
+    assert cache.get("Wallet1") == wallet_address("Wallet1")
+    assert cache.stats["keyring_calls"] == 1
+
+
+def test_invalidate(keyring, cache_path):
+    cache = open_cache(keyring, cache_path)
+    assert cache.get("Missing") is None
+    cache.invalidate()
+    assert not cache_path.exists()
+
+    # После сброса забытые и неизвестные имена запрашиваются снова
+    assert cache.get("Wallet1") == wallet_address("Wallet1")
+    assert cache.get("Missing") is None
+    assert cache.stats["keyring_calls"] == 3
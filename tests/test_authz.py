@@ -0,0 +1,99 @@
+# test_authz.py - Пакеты MsgExec: разбиение по газу, деление по симуляции, итог по кошелькам и срок разрешений
+
+import time
+
+import pytest
+
+from authz import GRANT_RENEW_BEFORE, GRANT_TTL, AuthzWithdrawer, plan_batches
+from broadcaster import Broadcaster
+from conftest import FAKE_GAIAD, wallet_address
+from fake_gaiad import CONTROLLER_KEY
+from fake_node import WITHDRAW_MSG_GAS
+from gas_oracle import GasOracle
+from gas_simulator import SIMULATION_GAS_ADJUSTMENT, GasSimulator
+from signer import Signer
+from tx_confirmer import TxConfirmer
+
+ecdsa = pytest.importorskip("ecdsa")
+
+
+def wallets(count):
+    return [(f"Wallet{i}", wallet_address(f"Wallet{i}"), 2) for i in range(1, count + 1)]
+
+
+@pytest.fixture
+def withdrawer(client, keyring):
+    signer = Signer(client, FAKE_GAIAD)
+    simulator = GasSimulator(GasOracle(client), gaiad_bin=FAKE_GAIAD, signer=signer, gas_price=0.005)
+    return AuthzWithdrawer(client, Broadcaster(client, gaiad_bin=FAKE_GAIAD, signer=signer), simulator,
+                           CONTROLLER_KEY, wallet_address(CONTROLLER_KEY), 0.005)
+
+
+def grant(chain, address, expires_at):
+    with chain._lock:
+        chain._grants[(address, wallet_address(CONTROLLER_KEY))] = expires_at
+
+
+def test_plan_batches_within_gas_limit():
+    batch_wallets = [("a", "addr_a", 2), ("b", "addr_b", 1), ("c", "addr_c", 0), ("d", "addr_d", 3)]
+    batches = plan_batches(batch_wallets, base_gas=100, msg_gas=50, max_gas=300)
+    assert [[name for name, _, _ in batch.wallets] for batch in batches] == [["a", "b", "c"], ["d"]]
+    # Кошелёк без валидаторов по снимку считается за одно снятие
+    assert [batch.gas for batch in batches] == [300, 250]
+
+    # Кошелёк, один превышающий лимит, идёт отдельным пакетом
+    batches = plan_batches([("a", "addr_a", 1), ("big", "addr_big", 10), ("b", "addr_b", 1)],
+                           base_gas=100, msg_gas=50, max_gas=300)
+    assert [[name for name, _, _ in batch.wallets] for batch in batches] == [["a"], ["big"], ["b"]]
+    assert batches[1].gas == 600
+    assert all(batch.gas_source == "model" for batch in batches)
+
+    batches = plan_batches(batch_wallets, base_gas=100, msg_gas=10, max_gas=10_000, max_wallets=3)
+    assert [len(batch.wallets) for batch in batches] == [3, 1]
+
+
+def test_prepare_halves_batch_over_limit(withdrawer, chain):
+    one = int((chain.gas_used + 2 * WITHDRAW_MSG_GAS) * SIMULATION_GAS_ADJUSTMENT)
+    two = int((chain.gas_used + 4 * WITHDRAW_MSG_GAS) * SIMULATION_GAS_ADJUSTMENT)
+    three = int((chain.gas_used + 6 * WITHDRAW_MSG_GAS) * SIMULATION_GAS_ADJUSTMENT)
+    withdrawer.max_tx_gas = (two + three) // 2
+
+    batch = withdrawer.plan(wallets(3))[0]
+    prepared = withdrawer.prepare(batch)
+    assert [len(batch.wallets) for batch in prepared] == [1, 2]
+    assert [batch.gas for batch in prepared] == [one, two]
+    assert all(batch.gas_source == "simulation" for batch in prepared)
+    assert withdrawer.stats["batch_splits"] == 1
+
+
+def test_breakdown_from_msg_exec_events(withdrawer, chain, client):
+    for _, address, _ in wallets(2):
+        grant(chain, address, time.time() + GRANT_TTL)
+    (batch,) = withdrawer.prepare(withdrawer.plan(wallets(2))[0])
+    result = withdrawer.broadcast(batch)
+    assert result.accepted
+
+    pending = TxConfirmer(client, block_time=chain.block_time).wait(batch.tx_hash, timeout=5)
+    assert pending.status is True
+    share = chain.initial_rewards // len(chain.validators)
+    expected = {"withdrawn": share * len(chain.validators), "validators": len(chain.validators)}
+    assert withdrawer.breakdown(batch, pending.tx_result) == {"Wallet1": expected, "Wallet2": expected}
+    assert withdrawer.stats["wallets_withdrawn"] == 2
+    assert client.get_balance(wallet_address("Wallet1")) == chain.initial_balance + expected["withdrawn"]
+
+
+def test_grant_status_renews_expiring_grant(withdrawer, chain, node):
+    valid, expiring, missing = (wallet_address(f"Wallet{i}") for i in (1, 2, 3))
+    grant(chain, valid, time.time() + GRANT_TTL)
+    grant(chain, expiring, time.time() + GRANT_RENEW_BEFORE - 3600)
+    assert withdrawer.grant_status(valid) is True
+    assert withdrawer.grant_status(expiring) is False
+    assert withdrawer.grant_status(missing) is False
+
+    granted, without, unknown = withdrawer.check_grants(wallets(3))
+    assert [name for name, _, _ in granted] == ["Wallet1"]
+    assert [name for name, _, _ in without] == ["Wallet2", "Wallet3"]
+    assert unknown == []
+
+    node.error_rate = 1.0
+    assert withdrawer.grant_status(valid) is None
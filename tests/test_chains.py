@@ -0,0 +1,90 @@
+# test_chains.py - Настройки сетей из профилей: проверка полей, пороги в денноме сети и файлы с суффиксом
+
+import json
+from dataclasses import replace
+
+import pytest
+
+from chains import CHAIN_FILES, DENOM_FIELDS, chain_file, chain_settings, derive_settings
+from config import ConfigError, Settings
+
+RPC = ["https://other-rpc.example:443"]
+THRESHOLDS = {"min_rewards_to_withdraw": 5_000_000, "min_send_amount": 1_000_000,
+              "min_balance_remain": 100_000, "max_balance_remain": 500_000}
+
+
+@pytest.fixture
+def base(tmp_path):
+    return replace(Settings(), chains_file=str(tmp_path / "chains.json"))
+
+
+def write_profiles(base, profiles):
+    with open(base.chains_file, "w", encoding="utf-8") as f:
+        json.dump(profiles, f)
+
+
+def test_chain_file_suffix():
+    assert chain_file("okx_wallets", "mantra") == "okx_wallets_mantra"
+    assert chain_file("wallet_index.db", "mantra") == "wallet_index_mantra.db"
+    assert chain_file(".reward_rates.json", "osmosis") == ".reward_rates_osmosis.json"
+
+
+def test_unknown_field(base):
+    with pytest.raises(ValueError, match="rpc_node"):
+        derive_settings(base, "other", {"rpc_node": RPC})
+    # chain задаёт процесс, а не профиль
+    with pytest.raises(ValueError, match="chain"):
+        derive_settings(base, "other", {"chain": "x", "rpc_nodes": RPC})
+
+
+def test_missing_rpc_nodes(base):
+    with pytest.raises(ValueError, match="rpc_nodes"):
+        derive_settings(base, "other", {"gas_price": 0.01})
+    # Базовой сети узлы профиля не нужны
+    assert derive_settings(base, base.chain, {}).rpc_nodes == base.rpc_nodes
+
+
+def test_other_denom_requires_thresholds(base):
+    with pytest.raises(ValueError, match="uother") as error:
+        derive_settings(base, "other", {"denom": "uother", "rpc_nodes": RPC, "min_send_amount": 1})
+    assert all(field in str(error.value) for field in DENOM_FIELDS if field != "min_send_amount")
+
+    settings = derive_settings(base, "other", {"denom": "uother", "rpc_nodes": RPC, **THRESHOLDS})
+    assert settings.denom == "uother" and settings.min_rewards_to_withdraw == 5_000_000
+    # Тот же деном - пороги наследуются
+    assert derive_settings(base, "other", {"rpc_nodes": RPC}).min_send_amount == base.min_send_amount
+
+
+def test_per_chain_files_and_nodes(base):
+    settings = derive_settings(base, "other", {"rpc_nodes": RPC, "fallback_gas": {"send": 1}})
+    assert settings.chain == "other"
+    for field in CHAIN_FILES:
+        assert getattr(settings, field) == chain_file(getattr(base, field), "other")
+    assert settings.rpc_nodes == tuple(RPC) and dict(settings.rest_nodes) == {}
+    # Словари профиля дополняют базовые
+    assert settings.fallback_gas["send"] == 1
+    assert settings.fallback_gas["withdraw"] == base.fallback_gas["withdraw"]
+
+    # Базовая сеть сохраняет свои файлы
+    assert derive_settings(base, base.chain, {}).okx_wallets_file == base.okx_wallets_file
+
+
+def test_chain_settings_collects_errors(base):
+    write_profiles(base, {"other": {"denom": "uother", "rpc_nodes": RPC}, "typo": {"rpc_node": RPC}})
+    with pytest.raises(ConfigError) as error:
+        chain_settings(replace(base, chains=("cosmoshub", "other", "typo", "missing")))
+    messages = "\n".join(error.value.errors)
+    assert "other:" in messages and "typo:" in messages and "'missing'" in messages
+
+    write_profiles(base, {"other": {"denom": "uother", "rpc_nodes": RPC, **THRESHOLDS}})
+    settings = chain_settings(replace(base, chains=("cosmoshub", "mantra", "other")))
+    assert [s.chain for s in settings] == ["cosmoshub", "mantra", "other"]
+    assert [s.denom for s in settings] == ["uatom", "uom", "uother"]
+    assert chain_settings(base) == [base]
+
+
+def test_unreadable_chains_file(base):
+    with open(base.chains_file, "w", encoding="utf-8") as f:
+        f.write("{not json")
+    with pytest.raises(ConfigError):
+        chain_settings(replace(base, chains=("cosmoshub",)))
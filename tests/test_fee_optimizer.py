@@ -0,0 +1,139 @@
+# test_fee_optimizer.py - Порог снятия по комиссии, прогноз следующей проверки и запись состояния в конце прохода
+
+import json
+import threading
+
+import pytest
+
+from fee_optimizer import MIN_SAMPLE_INTERVAL, UNKNOWN_RATE_RECHECK, FeeOptimizer
+from gas_oracle import GasEstimate
+from snapshot import WalletSnapshot
+
+BASE_GAS, VALIDATOR_GAS = 100_000, 50_000
+GAS_PRICE = 0.005
+MAX_FEE_RATIO = 0.05
+MAX_RECHECK = 86400
+
+
+class LinearOracle:
+    """Газ снятия растёт с числом валидаторов; отмечает, свободна ли блокировка оптимизатора при запросе"""
+
+    def __init__(self):
+        self.optimizer = None
+        self.lock_free = []
+
+    def withdraw_gas(self, validators=1):
+        if self.optimizer is not None:
+            probe = threading.Thread(target=self._probe_lock)
+            probe.start()
+            probe.join()
+        return GasEstimate(BASE_GAS + VALIDATOR_GAS * validators, "model")
+
+    def _probe_lock(self):
+        acquired = self.optimizer._lock.acquire(blocking=False)
+        if acquired:
+            self.optimizer._lock.release()
+        self.lock_free.append(acquired)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def oracle():
+    return LinearOracle()
+
+
+@pytest.fixture
+def optimizer(oracle, clock, tmp_path):
+    optimizer = FeeOptimizer(oracle, GAS_PRICE, MAX_FEE_RATIO, max_recheck=MAX_RECHECK,
+                             path=tmp_path / "reward_rates.json", clock=clock)
+    oracle.optimizer = optimizer
+    return optimizer
+
+
+def fee(validators):
+    return int((BASE_GAS + VALIDATOR_GAS * validators) * GAS_PRICE) + 1
+
+
+def row(rewards, validators=2, name="Wallet1"):
+    return WalletSnapshot(name, rewards=rewards, validators=validators)
+
+
+def test_threshold_scales_with_fee(optimizer):
+    assert optimizer.threshold(1) == (fee(1) / MAX_FEE_RATIO, fee(1))
+    assert optimizer.threshold(4) == (fee(4) / MAX_FEE_RATIO, fee(4))
+    assert optimizer.threshold(4)[0] > optimizer.threshold(1)[0]
+    # Кошелёк без валидаторов - как с одним
+    assert optimizer.threshold(0) == optimizer.threshold(1)
+
+    optimizer.min_threshold = 10 ** 9
+    assert optimizer.threshold(4)[0] == 10 ** 9
+
+
+def test_next_check_follows_rate(optimizer, clock):
+    threshold, _ = optimizer.threshold(2)
+    optimizer.observe([row(1000)])
+    # Скорость ещё не измерена
+    assert optimizer.next_check("Wallet1") == clock.now + UNKNOWN_RATE_RECHECK
+
+    clock.now += 1000
+    optimizer.observe([row(1000 + 1000 * 0.5)])
+    assert optimizer.rate("Wallet1") == 0.5
+    assert optimizer.next_check("Wallet1") == pytest.approx(clock.now + (threshold - 1500) / 0.5)
+
+    # Замер чаще MIN_SAMPLE_INTERVAL не меняет скорость; награда выше порога - проверить сразу
+    clock.now += MIN_SAMPLE_INTERVAL / 2
+    optimizer.observe([row(threshold)])
+    assert optimizer.rate("Wallet1") == 0.5
+    assert optimizer.next_check("Wallet1") == clock.now
+    assert optimizer.due(["Wallet1", "Wallet2"]) == (["Wallet1", "Wallet2"], None)
+
+
+def test_next_check_capped_and_reset_after_withdraw(optimizer, clock):
+    optimizer.observe([row(0)])
+    clock.now += MIN_SAMPLE_INTERVAL
+    optimizer.observe([row(MIN_SAMPLE_INTERVAL * 0.001)])
+    assert optimizer.next_check("Wallet1") == clock.now + MAX_RECHECK
+
+    optimizer.withdrawn("Wallet1")
+    due, upcoming = optimizer.due(["Wallet1"])
+    assert due == [] and upcoming == clock.now + MAX_RECHECK
+    optimizer.recheck("Wallet1")
+    assert optimizer.due(["Wallet1"])[0] == ["Wallet1"]
+
+
+def test_gas_lookup_outside_lock(optimizer, oracle):
+    optimizer.observe([row(100, validators=1), row(100, validators=3, name="Wallet2"),
+                       row(5, validators=1, name="Wallet3")])
+    optimizer.withdrawn("Wallet2")
+    # Пороги для 1 и 3 валидаторов при наблюдении и для 3 при снятии - все без блокировки
+    assert oracle.lock_free == [True, True, True]
+
+
+def test_state_written_on_save_only(optimizer, tmp_path):
+    path = tmp_path / "reward_rates.json"
+    optimizer.observe([row(100), row(0, name="Wallet2")])
+    optimizer.withdrawn("Wallet1")
+    optimizer.recheck("Wallet2")
+    assert not path.exists()
+
+    optimizer.save()
+    saved = json.loads(path.read_text(encoding="utf-8"))["wallets"]
+    assert set(saved) == {"Wallet1", "Wallet2"}
+    mtime = path.stat().st_mtime_ns
+    optimizer.save()    # Без изменений файл не переписывается
+    assert path.stat().st_mtime_ns == mtime
+
+    reloaded = FeeOptimizer(LinearOracle(), GAS_PRICE, MAX_FEE_RATIO, path=path, clock=optimizer.clock)
+    assert reloaded.next_check("Wallet1") == optimizer.next_check("Wallet1")
@@ -0,0 +1,135 @@
+# test_gas_oracle.py - Оценка газа по блокам: кеш высот, одно вычисление на ключ, TTL и линейная модель снятия
+
+import threading
+import time
+
+import pytest
+
+from gas_oracle import GAS_MARGIN, MSG_SEND, MSG_WITHDRAW, GasOracle
+
+LATEST = 1000
+BASE_GAS, VALIDATOR_GAS, SEND_GAS = 100_000, 50_000, 80_000
+
+
+def tx_result(action, gas_used, validators=0):
+    events = [{"type": "message", "attributes": [{"key": "action", "value": action}]}]
+    events += [{"type": "withdraw_rewards", "attributes": []} for _ in range(validators)]
+    return {"code": 0, "gas_used": str(gas_used), "events": events}
+
+
+class BlocksClient:
+    """Блоки со снятиями на 1 и 3 валидатора и отправкой; gate задерживает block_results"""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def get_latest_height(self):
+        return LATEST
+
+    def get_block_results(self, height):
+        with self._lock:
+            self.calls.append(height)
+        self.gate.wait()
+        return {"height": str(height), "txs_results": [
+            tx_result(MSG_WITHDRAW, BASE_GAS + VALIDATOR_GAS, 1),
+            tx_result(MSG_WITHDRAW, BASE_GAS + 3 * VALIDATOR_GAS, 3),
+            tx_result(MSG_SEND, SEND_GAS),
+            {"code": 11, "gas_used": "1", "events": []},
+        ]}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def blocks():
+    return BlocksClient()
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def oracle(blocks, clock):
+    return GasOracle(blocks, sample_blocks=5, batch=5, ttl=300, clock=clock)
+
+
+def test_estimates_from_blocks(oracle):
+    send = oracle.send_gas()
+    assert send.source == "blocks" and send.samples == 5
+    assert send.gas == round(SEND_GAS * GAS_MARGIN["send"])
+    withdraw = oracle.withdraw_gas(3)
+    assert withdraw.gas == round((BASE_GAS + 3 * VALIDATOR_GAS) * GAS_MARGIN["withdraw"])
+
+    # Ноль валидаторов считается как один: иначе ключ никогда не нашёл бы образцов
+    assert oracle.withdraw_gas(0) is oracle.withdraw_gas(1)
+
+
+def test_block_cache_reused_across_estimates(oracle, blocks):
+    oracle.send_gas()
+    fetched = len(blocks.calls)
+    assert fetched == oracle.stats["blocks_fetched"] == 5
+
+    oracle.withdraw_gas(1)
+    oracle.invalidate()
+    oracle.send_gas()
+    assert len(blocks.calls) == fetched
+    assert oracle.stats["block_cache_hits"] == 10
+
+
+def test_ttl(oracle, clock, blocks):
+    first = oracle.send_gas()
+    clock.now += 299
+    assert oracle.send_gas() is first
+    clock.now += 1
+    second = oracle.send_gas()
+    assert second is not first and second.computed_at == clock.now
+    assert oracle.stats["estimates"] == 2
+    assert len(blocks.calls) == 5
+
+
+def test_one_computation_per_key(oracle, blocks):
+    blocks.gate.clear()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(oracle.send_gas())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while not blocks.calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+    # Считает один поток, остальные ждут его Event
+    assert oracle._pending.keys() == {("send", 1)}
+    assert len(results) == 0
+    blocks.gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert len(results) == 4 and all(result is results[0] for result in results)
+    assert oracle.stats["estimates"] == 1
+    assert len(blocks.calls) == 5
+
+
+def test_linear_withdraw_model(oracle):
+    # Образцов с 5 валидаторами нет ни в одном блоке окна: газ по прямой через точки 1 и 3 валидатора
+    estimate = oracle.withdraw_gas(5)
+    assert estimate.source == "model"
+    assert estimate.samples == 2 * oracle.stats["blocks_fetched"]
+    assert estimate.gas == round((BASE_GAS + 5 * VALIDATOR_GAS) * GAS_MARGIN["withdraw"])
+
+
+def test_fallback_without_samples(blocks, clock):
+    oracle = GasOracle(blocks, sample_blocks=5, batch=5, max_scan=0, clock=clock)
+    estimate = oracle.withdraw_gas(2)
+    assert estimate.source == "fallback" and estimate.gas == oracle.fallback_gas["withdraw"]
+    assert oracle.stats["fallbacks"] == 1
@@ -0,0 +1,148 @@
+# test_indexer.py - Индекс движений по блокам fake_node: checkpoint, повторная синхронизация и отчёты
+
+import pytest
+
+from broadcaster import Broadcaster
+from conftest import FAKE_GAIAD, wallet_address
+from fake_node import START_HEIGHT, FakeChain, FakeNode
+from indexer import EXCHANGE, WALLET, WalletIndex
+from rate_limiter import UNAVAILABLE
+from rpc_client import CosmosRPCClient, RPCError
+from signer import Signer, msg_send, withdraw_all_msgs
+
+FEE = 5000
+
+
+class FlakyClient:
+    """Клиент, у которого block_results выбранных высот недоступны"""
+
+    def __init__(self, client):
+        self.client = client
+        self.failing = set()
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def get_block_results(self, height, node=None):
+        if height in self.failing:
+            raise RPCError(f"block_results {height}: HTTP 503", UNAVAILABLE)
+        return self.client.get_block_results(height, node=node)
+
+
+@pytest.fixture
+def still_chain():
+    return FakeChain(block_time=1000.0)    # Блоки создаёт только next_block()
+
+
+@pytest.fixture
+def flaky(still_chain):
+    node = FakeNode(still_chain)
+    node.start()
+    client = CosmosRPCClient([node.url], sleep=lambda seconds: None)
+    yield FlakyClient(client)
+    client.close()
+    node.stop()
+
+
+def open_index(client, path):
+    index = WalletIndex(client, str(path), batch=4)
+    index.set_addresses({
+        wallet_address("Wallet1"): (WALLET, "Wallet1"),
+        wallet_address("Wallet2"): (WALLET, "Wallet2"),
+        wallet_address("Wallet3"): (EXCHANGE, "OKX"),
+    })
+    return index
+
+
+@pytest.fixture
+def index(flaky, tmp_path, keyring):
+    index = open_index(flaky, tmp_path / "wallet_index.db")
+    yield index
+    index.close()
+
+
+def next_block(chain, count=1):
+    chain.started -= chain.block_time * count
+
+
+def send(flaky, name, amount):
+    """Отправка с кошелька name на адрес биржи, попадает в следующий блок"""
+    sender = wallet_address(name)
+    msgs = [msg_send(sender, wallet_address("Wallet3"), amount)]
+    broadcaster = Broadcaster(flaky.client, signer=Signer(flaky.client, FAKE_GAIAD))
+    assert broadcaster.sign_and_broadcast(None, msgs, name, sender, FEE, 200000).accepted
+
+
+def withdraw(flaky, still_chain, name):
+    address = wallet_address(name)
+    broadcaster = Broadcaster(flaky.client, signer=Signer(flaky.client, FAKE_GAIAD))
+    msgs = withdraw_all_msgs(address, still_chain.validators)
+    assert broadcaster.sign_and_broadcast(None, msgs, name, address, FEE, 300000).accepted
+
+
+def test_first_sync_only_remembers_height(index):
+    assert index.checkpoint() is None
+    assert index.sync() == 0
+    assert index.checkpoint() == START_HEIGHT
+
+
+def test_reports(index, flaky, still_chain):
+    index.sync()
+    send(flaky, "Wallet1", 1000)
+    withdraw(flaky, still_chain, "Wallet2")
+    next_block(still_chain)
+    send(flaky, "Wallet2", 2500)
+    next_block(still_chain)
+
+    assert index.sync() == 2
+    share = still_chain.initial_rewards // len(still_chain.validators)
+    assert index.sent_to_exchanges(0) == {"OKX": 3500}
+    assert index.withdrawn(0) == {"Wallet2": share * len(still_chain.validators)}
+    assert index.fees(0) == {"Wallet1": FEE, "Wallet2": 2 * FEE}
+    assert index.summary(0)["txs"] == 3
+
+    # Период без транзакций
+    assert index.sent_to_exchanges(index.clock() + 10) == {}
+
+
+def test_checkpoint_stops_at_unfetched_block(index, flaky, still_chain):
+    index.sync()
+    for amount in (100, 200, 300, 400, 500, 600):
+        send(flaky, "Wallet1", amount)
+        next_block(still_chain)
+    flaky.failing = {START_HEIGHT + 3, START_HEIGHT + 5}
+
+    # Блоки после недоступного не записываются, хотя запрошены той же пачкой
+    assert index.sync() == 2
+    assert index.checkpoint() == START_HEIGHT + 2
+    assert index.stats["errors"] == 1
+    assert index.sent_to_exchanges(0) == {"OKX": 300}
+
+    flaky.failing = set()
+    assert index.sync() == 4
+    assert index.checkpoint() == START_HEIGHT + 6
+    assert index.sync() == 0
+
+    # Каждый блок учтён ровно один раз
+    assert index.sent_to_exchanges(0) == {"OKX": 2100}
+    assert index.fees(0) == {"Wallet1": 6 * FEE}
+    assert index.summary(0)["txs"] == 6
+
+
+def test_resume_from_checkpoint_after_restart(flaky, still_chain, tmp_path, keyring):
+    index = open_index(flaky, tmp_path / "wallet_index.db")
+    index.sync()
+    send(flaky, "Wallet1", 700)
+    next_block(still_chain)
+    index.sync()
+    index.close()
+
+    send(flaky, "Wallet1", 800)
+    next_block(still_chain)
+    index = open_index(flaky, tmp_path / "wallet_index.db")
+    try:
+        assert index.checkpoint() == START_HEIGHT + 1
+        assert index.sync() == 1
+        assert index.sent_to_exchanges(0) == {"OKX": 1500}
+    finally:
+        index.close()
@@ -0,0 +1,55 @@
+# test_journal.py - Продолжение прохода после сбоя: незавершённые кошельки и сверка отправленных транзакций
+
+import base64
+
+from broadcaster import Broadcaster
+from conftest import FAKE_GAIAD, wallet_address
+from journal import BROADCAST, CONFIRMED, DONE, FAILED, PLANNED, SKIPPED, RunJournal
+from signer import Signer, msg_send
+from tx_confirmer import TxConfirmer
+
+
+def _broadcast_send(client):
+    sender = wallet_address("Wallet2")
+    tx_raw, _ = Signer(client, FAKE_GAIAD).sign([msg_send(sender, wallet_address("Wallet1"), 1000)],
+                                                "Wallet2", sender, 5000, 200000)
+    result = Broadcaster(client).broadcast(base64.b64encode(tx_raw).decode())
+    assert result.accepted
+    return result.tx_hash
+
+
+def test_resume_after_crash(tmp_path, client, chain, keyring):
+    path = str(tmp_path / "run_journal.db")
+    tx_hash = _broadcast_send(client)
+
+    # Проход прерван: Wallet4 завершён, Wallet1 пропущен, у Wallet2 транзакция без итога, Wallet3 не прочитан
+    journal = RunJournal(path)
+    run_id = journal.start_run([3, 0, 1, 2])
+    journal.record("Wallet4", PLANNED)
+    journal.record("Wallet4", DONE, detail="с действиями")
+    journal.record("Wallet1", SKIPPED)
+    journal.record("Wallet2", PLANNED)
+    journal.record("Wallet2", BROADCAST, kind="send", tx_hash=tx_hash)
+    journal.record("Wallet3", PLANNED)
+    journal.record("Wallet3", FAILED, detail="состояние не получено")
+    journal._conn.close()   # Без finish_run(), как при сбое
+
+    other_chain = RunJournal(path, chain="mantra")
+    assert other_chain.unfinished_run() is None
+    other_chain.close()
+    journal = RunJournal(path)
+    resumed = journal.unfinished_run()
+    assert resumed == (run_id, [3, 0, 1, 2])
+    journal.resume_run(run_id)
+    assert journal.finished_wallets() == {"Wallet4", "Wallet1"}
+    assert journal.pending_txs() == [("Wallet2", "send", tx_hash)]
+
+    # Сверка: хеш из журнала подтверждается, повторно транзакция не отправляется
+    pending = TxConfirmer(client, block_time=chain.block_time).wait(tx_hash, timeout=5)
+    assert pending.status is True
+    journal.record("Wallet2", CONFIRMED, tx_hash=tx_hash)
+    assert journal.pending_txs() == []
+
+    journal.finish_run()
+    assert journal.unfinished_run() is None
+    journal.close()
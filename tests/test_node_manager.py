@@ -0,0 +1,119 @@
+# test_node_manager.py - Выбор узла по EWMA задержки и ошибок, circuit breaker и полуоткрытое состояние
+
+import pytest
+
+from conftest import wallet_address
+from fake_node import FakeChain, FakeNode
+from node_manager import CLOSED, HALF_OPEN, MAX_OPEN_TIMEOUT, OPEN, OPEN_TIMEOUT, NodeManager
+from rpc_client import CosmosRPCClient
+
+FAST, SLOW, LAGGING = "http://fast", "http://slow", "http://lagging"
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def states(manager):
+    return {node["url"]: node["state"] for node in manager.snapshot()}
+
+
+def test_ewma_ranks_fast_node_first(clock):
+    manager = NodeManager([SLOW, FAST], clock=clock)
+    manager.record_success(SLOW, 0.8)
+    manager.record_success(FAST, 0.1)
+    assert manager.ranked() == [FAST, SLOW]
+
+    # Один медленный ответ сдвигает среднее на alpha, а не заменяет его
+    manager.record_success(FAST, 2.0)
+    assert manager.nodes[FAST].latency == pytest.approx(0.3 * 2.0 + 0.7 * 0.1)
+    assert manager.pick() == FAST
+
+    # Ошибки ухудшают оценку быстрого узла
+    manager.record_failure(FAST)
+    manager.record_failure(FAST)
+    assert manager.ranked() == [SLOW, FAST]
+
+
+def test_lagging_node_goes_last(clock):
+    manager = NodeManager([LAGGING, SLOW], clock=clock)
+    manager.record_success(LAGGING, 0.05, height=100)
+    manager.record_success(SLOW, 0.5, height=110)
+    assert manager.ranked() == [SLOW, LAGGING]
+
+
+def test_circuit_opens_then_half_opens(clock):
+    manager = NodeManager([FAST, SLOW], failure_threshold=3, clock=clock)
+    manager.record_success(FAST, 0.1)
+    manager.record_success(SLOW, 0.5)
+    for _ in range(2):
+        manager.record_failure(FAST)
+    assert states(manager)[FAST] == CLOSED
+    manager.record_failure(FAST)
+    assert states(manager)[FAST] == OPEN
+    assert manager.ranked() == [SLOW]
+
+    clock.now += OPEN_TIMEOUT
+    assert states(manager)[FAST] == HALF_OPEN
+    assert FAST in manager.ranked()
+
+    # Пробный запрос неудачен: снова открыт с удвоенной паузой
+    manager.record_failure(FAST)
+    assert states(manager)[FAST] == OPEN
+    clock.now += OPEN_TIMEOUT
+    assert states(manager)[FAST] == OPEN
+    clock.now += OPEN_TIMEOUT
+    assert states(manager)[FAST] == HALF_OPEN
+
+    # Успех закрывает цепь и сбрасывает паузу
+    manager.record_success(FAST, 0.1)
+    assert states(manager)[FAST] == CLOSED
+    assert manager.nodes[FAST].open_timeout == OPEN_TIMEOUT
+
+
+def test_open_timeout_is_capped(clock):
+    manager = NodeManager([FAST], failure_threshold=1, clock=clock)
+    manager.record_failure(FAST)
+    for _ in range(10):
+        clock.now += manager.nodes[FAST].open_timeout
+        manager.ranked()
+        manager.record_failure(FAST)
+    assert manager.nodes[FAST].open_timeout == MAX_OPEN_TIMEOUT
+
+
+def test_all_open_falls_back_to_oldest(clock):
+    manager = NodeManager([FAST, SLOW], failure_threshold=1, clock=clock)
+    manager.record_failure(SLOW)
+    clock.now += 1
+    manager.record_failure(FAST)
+    assert manager.ranked() == [SLOW, FAST]
+
+
+def test_traffic_avoids_slow_node():
+    # Длинный блок: пока отвечает медленный узел, высота быстрого не становится отстающей
+    chain = FakeChain(block_time=60)
+    fast, slow = FakeNode(chain), FakeNode(chain, latency=0.2)
+    fast.start()
+    slow.start()
+    client = CosmosRPCClient([slow.url, fast.url], sleep=lambda seconds: None)
+    try:
+        client.probe_nodes()
+        assert client.nodes.pick() == fast.url
+        fast_requests, slow_requests = fast.requests, slow.requests
+        for _ in range(10):
+            client.get_balance(wallet_address("Wallet1"))
+        assert fast.requests - fast_requests == 10
+        assert slow.requests == slow_requests
+    finally:
+        client.close()
+        fast.stop()
+        slow.stop()
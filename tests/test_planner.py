@@ -0,0 +1,103 @@
+# test_planner.py - План прохода: решения по кошелькам, комиссии, одна транзакция и итоги для экспорта
+
+import json
+from dataclasses import replace
+
+import pytest
+
+from config import Settings
+from gas_oracle import GasEstimate
+from planner import build_plan, plan_wallet
+from snapshot import PortfolioSnapshot, WalletSnapshot
+
+BASE_GAS, VALIDATOR_GAS, SEND_GAS = 100_000, 10_000, 80_000
+TARGET = ("OKX", "cosmos1exchange")
+
+
+class FixedOracle:
+    def withdraw_gas(self, validators=1):
+        return GasEstimate(BASE_GAS + VALIDATOR_GAS * validators, "blocks")
+
+    def send_gas(self):
+        return GasEstimate(SEND_GAS, "blocks")
+
+
+@pytest.fixture
+def settings():
+    return replace(Settings(), gas_price=0.01, min_rewards_to_withdraw=1_000_000, min_send_amount=500_000,
+                   min_balance_remain=100_000, max_balance_remain=200_000, combined=False)
+
+
+def plan(row, settings, threshold=None):
+    return plan_wallet(row, TARGET, FixedOracle(), settings, threshold)
+
+
+def rows():
+    return [
+        WalletSnapshot("Withdraw", balance=300_000, rewards=2_000_000.5, validators=2),
+        WalletSnapshot("Send", balance=800_000, rewards=10, validators=1),
+        WalletSnapshot("Random", balance=650_000, validators=1),
+        WalletSnapshot("Poor", balance=1000, rewards=5, validators=1),
+        WalletSnapshot("Broken", error="timeout"),
+        WalletSnapshot("Idle", balance=300_000, rewards=100, validators=1),
+    ]
+
+
+def test_withdraw_then_send(settings):
+    wallet = plan(rows()[0], settings)
+    assert wallet.withdraw and wallet.send and not wallet.combined
+    assert (wallet.withdraw_gas, wallet.withdraw_fees) == (120_000, 1201)
+    assert (wallet.send_gas, wallet.send_fees) == (80_000, 801)
+    # Награды валидаторов округляются вниз, комиссия снятия вычитается до отправки
+    balance = 300_000 + (2_000_000 - 2) - 1201
+    assert (wallet.send_amount, wallet.send_amount_max) == (balance - 200_000, balance - 100_000)
+    assert wallet.fees == 1201 + 801 and wallet.gas_source == "blocks" and wallet.note == ""
+
+
+def test_notes_without_actions(settings):
+    _, send, random, poor, broken, idle = (plan(row, settings) for row in rows())
+    assert send.send and not send.withdraw and send.fees == 801
+    assert random.send and random.note == "отправка зависит от случайного остатка"
+    assert not poor.has_actions and poor.note == "нет средств на комиссию"
+    assert not broken.has_actions and broken.note == "ошибка снимка: timeout"
+    assert not idle.has_actions and idle.note == "награды и баланс ниже порогов"
+
+
+def test_threshold_from_fee_optimizer(settings):
+    wallet = plan(rows()[0], settings, threshold=lambda validators: 3_000_000)
+    assert wallet.threshold == 3_000_000
+    assert not wallet.withdraw and not wallet.send
+
+
+def test_combined_single_fee(settings):
+    settings = replace(settings, combined=True)
+    wallet = plan(rows()[0], settings)
+    assert wallet.combined and wallet.withdraw and wallet.send
+    assert (wallet.withdraw_gas, wallet.withdraw_fees) == (200_000, 2001)
+    total = 300_000 + (2_000_000 - 2) - 2001
+    assert (wallet.send_amount, wallet.send_amount_max) == (total - 200_000, total - 100_000)
+    assert wallet.fees == 2001
+
+    # Одной транзакцией - только при рассылке подписанной транзакции (BROADCAST_MODE=multi)
+    assert not plan(rows()[0], replace(settings, broadcast_mode="gaiad")).combined
+
+
+def test_totals_and_export(settings):
+    pass_plan = build_plan(PortfolioSnapshot(rows(), duration=1.5), {"Withdraw": TARGET}, FixedOracle(), settings)
+    assert pass_plan.worthwhile and pass_plan.duration >= 1.5
+    assert [wallet.wallet_name for wallet in pass_plan.actions()] == ["Withdraw", "Send", "Random"]
+    assert pass_plan.totals() == {
+        "wallets": 6, "with_actions": 3, "withdrawals": 1, "sends": 3, "combined": 0, "transactions": 4,
+        "rewards": 2_000_000.5, "send_min": 2_098_797 + 600_000 + 450_000,
+        "send_max": 2_198_797 + 700_000 + 550_000, "fees": 2002 + 801 + 801, "errors": 1,
+    }
+
+    exported = json.loads(json.dumps(pass_plan.to_dict()))
+    assert exported["gas_price"] == 0.01 and exported["snapshot_duration_sec"] == 1.5
+    assert [row["wallet_name"] for row in exported["wallets"]] == [row.wallet_name for row in rows()]
+    assert exported["wallets"][0]["fees"] == 2002 and exported["wallets"][0]["exchange"] == "OKX"
+    # Кошелёк без адреса биржи в плане без цели
+    assert exported["wallets"][1]["target"] == ""
+
+    idle = build_plan(PortfolioSnapshot(rows()[3:]), {}, FixedOracle(), settings)
+    assert not idle.worthwhile and idle.totals()["transactions"] == 0
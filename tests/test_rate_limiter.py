@@ -0,0 +1,124 @@
+# test_rate_limiter.py - AIMD лимит узла, классификация ошибок и повтор запроса после 429
+
+import pytest
+
+from conftest import wallet_address
+from fake_node import FakeChain, FakeNode
+from rate_limiter import (CONNECTION, DECREASE_FACTOR, DECREASE_INTERVAL, NOT_FOUND, REJECTED, THROTTLE_COOLDOWN,
+                          THROTTLED, TIMEOUT, UNAVAILABLE, AdaptiveLimiter, classify_status, classify_text)
+from rpc_client import CosmosRPCClient, RPCError
+
+
+class Clock:
+    """Ручные часы для AdaptiveLimiter"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_classify_status_and_text():
+    assert classify_status(200) is None
+    assert classify_status(429) == THROTTLED
+    assert classify_status(502) == classify_status(503) == UNAVAILABLE
+    assert classify_status(404) == NOT_FOUND
+    assert classify_status(400) == REJECTED
+
+    assert classify_text("Error: 429 Too Many Requests") == THROTTLED
+    assert classify_text("post failed: 503 Service Unavailable") == UNAVAILABLE
+    assert classify_text("context deadline exceeded") == TIMEOUT
+    assert classify_text("dial tcp: connection refused") == CONNECTION
+    assert classify_text("insufficient funds") == REJECTED
+    assert classify_text(None) == REJECTED
+
+
+def test_additive_increase():
+    limiter = AdaptiveLimiter(4, initial=2, clock=Clock())
+    limiter.record()
+    assert limiter.limit == pytest.approx(2.5)
+    limiter.record(NOT_FOUND)     # Ответ по существу - тоже успех
+    assert limiter.limit == pytest.approx(2.9)
+    limiter.record(CONNECTION)    # Сетевой сбой не меняет лимит
+    assert limiter.limit == pytest.approx(2.9)
+    for _ in range(20):
+        limiter.record()
+    assert limiter.limit == 4
+
+
+@pytest.mark.parametrize("kind", [THROTTLED, UNAVAILABLE, TIMEOUT])
+def test_multiplicative_decrease(kind):
+    clock = Clock()
+    limiter = AdaptiveLimiter(8, initial=8, clock=clock)
+    limiter.record(kind)
+    assert limiter.limit == 8 * DECREASE_FACTOR
+
+    # Ответы той же волны - одна перегрузка
+    limiter.record(kind)
+    assert limiter.limit == 8 * DECREASE_FACTOR
+    clock.now += DECREASE_INTERVAL
+    limiter.record(kind)
+    assert limiter.limit == 8 * DECREASE_FACTOR ** 2
+    assert limiter.stats["decreases"] == 2 and limiter.stats["overloaded"] == 3
+
+    for _ in range(10):
+        clock.now += DECREASE_INTERVAL
+        limiter.record(kind)
+    assert limiter.limit == limiter.min_limit
+
+
+def test_throttle_cooldown():
+    clock = Clock()
+    limiter = AdaptiveLimiter(8, clock=clock)
+    limiter.record(THROTTLED)
+    assert limiter.cooldown_remaining() == THROTTLE_COOLDOWN
+    limiter.record(THROTTLED, retry_after=10.0)
+    assert limiter.cooldown_remaining() == 10.0
+    clock.now += 10.0
+    assert limiter.cooldown_remaining() == 0.0
+    assert limiter.stats["throttled"] == 2
+
+
+@pytest.fixture
+def throttling_node(chain):
+    node = FakeNode(chain, error_status=429, retry_after=0)
+    node.start()
+    yield node
+    node.stop()
+
+
+def test_value_after_retry_on_429(throttling_node, chain):
+    client = CosmosRPCClient([throttling_node.url], node_limit=8, sleep=lambda seconds: None)
+    limiter = client.limiters[throttling_node.url]
+    limit = limiter.limit
+    throttling_node.fail_next = 1
+    try:
+        assert client.get_balance(wallet_address("Wallet1")) == chain.initial_balance
+    finally:
+        client.close()
+    assert throttling_node.errors_injected == 1
+    assert client.stats["retries"] == 1
+    assert limiter.stats["throttled"] == 1
+    assert limiter.limit == pytest.approx(limit * DECREASE_FACTOR + 1 / (limit * DECREASE_FACTOR))
+
+
+def test_unavailable_and_timeout_decrease_client_limit(node, client):
+    limiter = client.limiters[node.url]
+    node.fail_next = client.retries + 1
+    with pytest.raises(RPCError) as error:
+        client.get_latest_height()
+    assert error.value.kind == UNAVAILABLE
+    assert limiter.stats["decreases"] == 1 and limiter.stats["overloaded"] == client.retries + 1
+
+    slow = FakeNode(FakeChain(), latency=0.5)
+    slow.start()
+    timeout_client = CosmosRPCClient([slow.url], timeout=0.05, retries=0, sleep=lambda seconds: None)
+    try:
+        with pytest.raises(RPCError) as error:
+            timeout_client.get_latest_height()
+    finally:
+        timeout_client.close()
+        slow.stop()
+    assert error.value.kind == TIMEOUT and error.value.retryable
+    assert timeout_client.limiters[slow.url].stats["decreases"] == 1
@@ -0,0 +1,116 @@
+# test_read_cache.py - Кеш чтений по высоте блока: попадания, смена высоты, LRU и высота из замера узлов
+
+import pytest
+
+import script
+from conftest import wallet_address
+from fake_node import START_HEIGHT, FakeChain, FakeNode
+from read_cache import ReadCache
+from rpc_client import CosmosRPCClient
+
+BLOCK_TIME = 1000.0     # Высота меняется только вызовом next_block()
+HEIGHT_TTL = 1.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def still_chain():
+    return FakeChain(block_time=BLOCK_TIME)
+
+
+@pytest.fixture
+def still_node(still_chain):
+    node = FakeNode(still_chain)
+    node.start()
+    yield node
+    node.stop()
+
+
+@pytest.fixture
+def still_client(still_node):
+    client = CosmosRPCClient([still_node.url], sleep=lambda seconds: None)
+    yield client
+    client.close()
+
+
+def next_block(chain):
+    chain.started -= chain.block_time
+
+
+def set_balance(chain, address, amount):
+    with chain._lock:
+        chain._balances[address] = amount
+
+
+def test_hit_within_block_and_refetch_on_next(still_chain, still_node, still_client):
+    clock = Clock()
+    cache = ReadCache(still_client, height_ttl=HEIGHT_TTL, clock=clock)
+    address = wallet_address("Wallet1")
+    assert cache.height() == START_HEIGHT
+
+    assert cache.get_balance(address) == still_chain.initial_balance
+    requests = still_node.requests
+    set_balance(still_chain, address, 1)
+    clock.now += HEIGHT_TTL
+    # Высота прежняя: ответ из кеша, узел видит только /status
+    assert cache.get_balance(address) == still_chain.initial_balance
+    assert still_node.requests == requests + 1
+    assert cache.stats["hits"] == 1
+
+    next_block(still_chain)
+    clock.now += HEIGHT_TTL
+    assert cache.get_balance(address) == 1
+    assert cache.to_dict()["height"] == START_HEIGHT + 1
+    assert cache.stats["misses"] == 2
+
+
+def test_advance_drops_older_entries(still_client):
+    cache = ReadCache(still_client, clock=Clock())
+    cache.advance(START_HEIGHT)
+    cache.get_balance(wallet_address("Wallet1"))
+    cache.get_delegator_validators(wallet_address("Wallet1"))
+    assert cache.to_dict()["entries"] == 2
+
+    cache.advance(START_HEIGHT - 1)     # Старая высота из замера не откатывает кеш
+    assert cache.to_dict()["entries"] == 2
+    cache.advance(START_HEIGHT + 1)
+    assert cache.to_dict()["entries"] == 0
+
+
+def test_lru_limit(still_client):
+    cache = ReadCache(still_client, max_entries=2, clock=Clock())
+    cache.advance(START_HEIGHT)
+    first, second, third = (wallet_address(f"Wallet{i}") for i in (1, 2, 3))
+    cache.get_balance(first)
+    cache.get_balance(second)
+    cache.get_balance(first)        # first - последний использованный, вытесняется second
+    cache.get_balance(third)
+    assert cache.stats["evicted"] == 1
+
+    hits = cache.stats["hits"]
+    cache.get_balance(first)
+    assert cache.stats["hits"] == hits + 1
+    cache.get_balance(second)
+    assert cache.stats["hits"] == hits + 1
+
+
+def test_height_seeded_from_probe(still_client, still_node, monkeypatch):
+    cache = ReadCache(still_client, clock=Clock())
+    monkeypatch.setattr(script, "get_read_cache", lambda: cache)
+    script.advance_read_cache(still_client.probe_nodes())
+    assert cache.to_dict()["height"] == START_HEIGHT
+
+    # Первое чтение снимка уже кешируется: повтор стоит только проверки высоты
+    address = wallet_address("Wallet1")
+    cache.get_balance(address)
+    requests = still_node.requests
+    assert cache.get_balance(address) == still_node.chain.initial_balance
+    assert still_node.requests == requests + 1
+    assert cache.stats["hits"] == 1
@@ -0,0 +1,136 @@
+# test_rpc_client.py - CosmosRPCClient и Broadcaster против локального узла fake_node.py
+# и HTTP узла с заданными ответами
+
+import base64
+
+import pytest
+
+from broadcaster import TX_IN_CACHE_CODE, Broadcaster
+from conftest import FAKE_GAIAD, gaiad_calls, wallet_address
+from fake_node import CHAIN_ID, START_HEIGHT
+from rpc_client import CosmosRPCClient, RPCError
+from signer import Signer, msg_send
+from tx_confirmer import TxConfirmer
+
+ADDRESS = "cosmos1" + "q" * 38
+
+
+def _signed_send(client, amount=1000):
+    """Подписанный MsgSend от Wallet1 к Wallet2 (base64)"""
+    sender = wallet_address("Wallet1")
+    signer = Signer(client, FAKE_GAIAD)
+    tx_raw, _ = signer.sign([msg_send(sender, wallet_address("Wallet2"), amount)], "Wallet1", sender, 5000, 200000)
+    return base64.b64encode(tx_raw).decode()
+
+
+def test_queries_match_chain_state(client, chain):
+    address = wallet_address("Wallet1")
+    assert client.get_balance(address) == chain.initial_balance
+    assert client.get_balance(address, "uother") == 0
+    assert client.get_total_rewards(address) == chain.initial_rewards
+    assert client.get_delegator_validators(address) == chain.validators
+    assert client.get_account(address)[0] == 7
+    assert client.get_chain_id() == CHAIN_ID
+    assert client.get_latest_height() >= START_HEIGHT
+
+
+def test_unknown_tx_is_none(client):
+    assert client.get_tx_result("A" * 64) is None
+
+
+def test_broadcast_and_confirm(client, chain, keyring):
+    broadcaster = Broadcaster(client)
+    tx_bytes = _signed_send(client)
+    result = broadcaster.broadcast(tx_bytes)
+    assert result.accepted and result.code == 0
+
+    pending = TxConfirmer(client, block_time=chain.block_time).wait(result.tx_hash, timeout=5)
+    assert pending.status is True
+    assert pending.height > START_HEIGHT
+    assert client.get_balance(wallet_address("Wallet1")) == chain.initial_balance - 1000 - 5000
+
+    # Повтор тех же байт - "already in cache", для нас это успешная отправка
+    again = broadcaster.broadcast(tx_bytes)
+    assert again.accepted and again.code == TX_IN_CACHE_CODE
+    assert again.tx_hash == result.tx_hash
+
+
+def test_broadcast_retries_overloaded_node(client, node, keyring):
+    tx_bytes = _signed_send(client)
+    node.error_rate = 1.0
+    result = Broadcaster(client).broadcast(tx_bytes)
+    assert not result.accepted and result.code is None
+    assert client.stats["retries"] == client.retries
+
+    node.error_rate = 0.0
+    assert Broadcaster(client).broadcast(tx_bytes).accepted
+
+
+def test_gaiad_signing_withdraw_all(client, node, keyring):
+    broadcaster = Broadcaster(client, gaiad_bin=FAKE_GAIAD)
+    result = broadcaster.sign_and_broadcast(["distribution", "withdraw-all-rewards"], None, "Wallet1",
+                                            wallet_address("Wallet1"), 5000, 200000)
+    assert result.accepted
+    assert broadcaster.stats["signed"] == 1
+    assert gaiad_calls(keyring) == ["tx distribution", "tx sign", "tx encode"]
+
+
+def test_signer_failure_falls_back_to_gaiad(client, keyring):
+    # Ключ Wallet1 не соответствует адресу Wallet2: Signer отказывает, подписывает gaiad
+    broadcaster = Broadcaster(client, gaiad_bin=FAKE_GAIAD, signer=Signer(client, FAKE_GAIAD))
+    result = broadcaster.sign_and_broadcast(["distribution", "withdraw-all-rewards"], lambda: [], "Wallet1",
+                                            wallet_address("Wallet2"), 5000, 200000)
+    assert result.accepted
+    assert broadcaster.stats["signer_fallbacks"] == 1 and broadcaster.stats["signed"] == 1
+
+
+@pytest.fixture
+def stub_client(stub_node):
+    client = CosmosRPCClient([stub_node.url], sleep=lambda seconds: None)
+    yield client
+    client.close()
+
+
+def test_balance_follows_pagination(stub_node, stub_client):
+    def balances(params):
+        if params.get("pagination.key") == "page2":
+            return {"balances": [{"denom": "uatom", "amount": "1500"}], "pagination": {"next_key": None}}
+        return {"balances": [{"denom": "uother", "amount": "7"}], "pagination": {"next_key": "page2"}}
+
+    stub_node.routes[f"/cosmos/bank/v1beta1/balances/{ADDRESS}"] = (200, balances)
+    assert stub_client.get_balance(ADDRESS) == 1500
+    assert stub_client.get_balance(ADDRESS, "uother") == 7
+    assert stub_client.get_balance(ADDRESS, "umissing") == 0
+
+
+def test_total_rewards(stub_node, stub_client):
+    stub_node.routes[f"/cosmos/distribution/v1beta1/delegators/{ADDRESS}/rewards"] = (200, {
+        "rewards": [],
+        "total": [{"denom": "uatom", "amount": "12345.678"}],
+    })
+    assert stub_client.get_total_rewards(ADDRESS) == 12345.678
+    assert stub_client.get_total_rewards(ADDRESS, "uother") == 0.0
+
+
+def test_unknown_tx_is_none_on_404(stub_client):
+    # Маршрут не задан: узел отвечает 404 с gRPC кодом NotFound
+    assert stub_client.get_tx("A" * 64) is None
+
+
+def test_rpc_call_result_and_error(stub_node, stub_client):
+    stub_node.routes["/status"] = (200, {"result": {"sync_info": {"latest_block_height": "1234"}}})
+    assert stub_client.get_latest_height() == 1234
+
+    stub_node.routes["/block"] = (500, {"error": "internal"})
+    with pytest.raises(RPCError):
+        stub_client.get_block(10)
+
+
+def test_falls_over_to_next_node(stub_node):
+    stub_node.routes["/status"] = (200, {"result": {"sync_info": {"latest_block_height": "99"}}})
+    dead = "http://127.0.0.1:9"   # Порт discard: соединение отклоняется
+    client = CosmosRPCClient([dead, stub_node.url], sleep=lambda seconds: None)
+    try:
+        assert client.get_latest_height(node=dead) == 99
+    finally:
+        client.close()
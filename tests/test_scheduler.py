@@ -0,0 +1,105 @@
+# test_scheduler.py - Планировщик службы: порядок по времени готовности, повтор после ошибки и предел потоков
+
+import threading
+import time
+
+import pytest
+
+import script
+from daemon import Scheduler
+
+
+@pytest.fixture
+def messages(monkeypatch):
+    """Вывод script.out() вместо консоли"""
+    messages = []
+    monkeypatch.setattr(script, "out", messages.append)
+    return messages
+
+
+def run(scheduler):
+    thread = threading.Thread(target=scheduler.run)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_ready_jobs_run_in_time_order():
+    scheduler = Scheduler(1, clock=lambda: 100.0)
+    order = []
+
+    def job(name):
+        def run_job():
+            order.append(name)
+        return run_job
+
+    for at, name in ((30, "c"), (10, "a"), (20, "b1"), (20, "b2")):
+        scheduler.schedule(at, name, job(name))
+    scheduler.schedule(99, "stop", scheduler.stop)
+    # Задание на будущее не запускается
+    scheduler.schedule(200, "later", job("later"))
+    run(scheduler)
+
+    # Одно время готовности - в порядке постановки
+    assert order == ["a", "b1", "b2", "c"]
+    assert scheduler.next_run() == 200 and len(scheduler) == 1
+    assert scheduler.stats == {"scheduled": 6, "started": 5, "errors": 0}
+
+
+def test_retry_after_exception(messages):
+    scheduler = Scheduler(1, retry_interval=0.01)
+    calls = []
+
+    def flaky():
+        calls.append(time.time())
+        if len(calls) == 1:
+            raise RuntimeError("узел недоступен")
+        scheduler.stop()
+
+    scheduler.schedule(time.time(), "Wallet1", flaky)
+    run(scheduler)
+
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.01
+    assert scheduler.stats == {"scheduled": 2, "started": 2, "errors": 1}
+    assert len(messages) == 1 and "Wallet1" in messages[0] and "узел недоступен" in messages[0]
+
+
+def test_returned_time_reschedules_until_stop():
+    scheduler = Scheduler(1)
+    calls = []
+
+    def job():
+        calls.append(1)
+        if len(calls) == 3:
+            scheduler.stop()
+        return time.time() + 0.01
+
+    scheduler.schedule(time.time(), "Wallet1", job)
+    run(scheduler)
+
+    # После stop() время от задания в очередь не ставится
+    assert len(calls) == 3 and len(scheduler) == 0
+    assert scheduler.stats["scheduled"] == 3
+
+
+def test_running_jobs_limited_by_workers():
+    scheduler = Scheduler(2)
+    lock = threading.Lock()
+    running, peak, done = [0], [0], []
+
+    def job():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+            done.append(1)
+            if len(done) == 5:
+                scheduler.stop()
+
+    for i in range(5):
+        scheduler.schedule(time.time(), f"Wallet{i + 1}", job)
+    run(scheduler)
+
+    assert len(done) == 5 and peak[0] == 2
@@ -0,0 +1,38 @@
+# test_script_args.py - Аргументы командной строки: --help без чтения настроек и аргументы поверх .env
+
+import pytest
+
+import config
+import script
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    """Настройки читаются заново из окружения; .env проекта не подхватывается"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(config, "_settings", None)
+    monkeypatch.setattr(script, "_default_chain", None)
+    return monkeypatch
+
+
+def test_help_with_invalid_settings(env, capsys):
+    env.setenv("WORKERS", "many")
+    with pytest.raises(SystemExit) as exit_info:
+        script.parse_args(["--help"])
+    assert exit_info.value.code == 0
+    assert "--workers" in capsys.readouterr().out
+
+    # Ошибка конфигурации выводится при запуске, а не при разборе аргументов
+    assert script.configure_from_args(["--workers", "4"]) is None
+    assert "WORKERS" in capsys.readouterr().out
+
+
+def test_arguments_override_settings(env):
+    env.setenv("WORKERS", "3")
+    env.setenv("COMBINED_TX", "true")
+    args, settings, chains = script.configure_from_args(["--scan-workers", "5", "--plan"])
+    assert (settings.workers, settings.scan_workers) == (3, 5)
+    # Не заданные флаги не сбрасывают значения из окружения
+    assert settings.combined is True and settings.dry_run is True
+    assert args.workers is None and not args.scan_all
+    assert [chain.name for chain in chains] == [settings.chain]
@@ -0,0 +1,89 @@
+# test_signer.py - Подпись SIGN_MODE_DIRECT внутри процесса и симуляция подписанной транзакции
+
+import hashlib
+
+import pytest
+
+from broadcaster import Broadcaster
+from conftest import FAKE_GAIAD, gaiad_calls, wallet_address
+from fake_gaiad import DRY_RUN_GAS, private_key
+from fake_node import ACCOUNT_NUMBER, CHAIN_ID, MSG_SEND, WITHDRAW_MSG_GAS, _fields, _first, decode_tx
+from gas_oracle import GasOracle
+from gas_simulator import SIMULATION_GAS_ADJUSTMENT, GasSimulator
+from signer import Signer, encode_sign_doc, msg_send, withdraw_all_msgs
+
+ecdsa = pytest.importorskip("ecdsa")
+
+
+@pytest.fixture
+def signer(client, keyring):
+    return Signer(client, FAKE_GAIAD)
+
+
+def _sequence(tx_raw):
+    """sequence из SignerInfo в AuthInfo"""
+    auth_info = _fields(_first(_fields(tx_raw), 2))
+    return _first(_fields(_first(auth_info, 1)), 3, 0)
+
+
+def test_sign_bytes_verify(signer):
+    sender, recipient = wallet_address("Wallet1"), wallet_address("Wallet2")
+    tx_raw, sequence = signer.sign([msg_send(sender, recipient, 1234)], "Wallet1", sender, 5000, 200000)
+
+    msgs, fee = decode_tx(tx_raw)
+    assert [type_url for type_url, _ in msgs] == [MSG_SEND]
+    assert msgs[0][1][1].decode() == sender and msgs[0][1][2].decode() == recipient
+    assert fee == 5000
+    assert sequence == _sequence(tx_raw) == 0
+
+    tx = _fields(tx_raw)
+    sign_doc = encode_sign_doc(_first(tx, 1), _first(tx, 2), CHAIN_ID, ACCOUNT_NUMBER)
+    key = ecdsa.SigningKey.from_string(private_key("Wallet1"), curve=ecdsa.SECP256k1).get_verifying_key()
+    assert key.verify(_first(tx, 3), sign_doc, hashfunc=hashlib.sha256, sigdecode=ecdsa.util.sigdecode_string)
+
+
+def test_key_and_account_loaded_once(signer, client, keyring):
+    sender = wallet_address("Wallet1")
+    broadcaster = Broadcaster(client, signer=signer)
+    for amount in (1000, 2000, 3000):
+        msgs = [msg_send(sender, wallet_address("Wallet2"), amount)]
+        assert broadcaster.sign_and_broadcast(None, msgs, "Wallet1", sender, 5000, 200000).accepted
+
+    # sequence ведётся локально: 0, 1, 2 без запросов аккаунта и запусков gaiad на каждую транзакцию
+    assert signer.stats["keys_loaded"] == 1
+    assert signer.stats["account_queries"] == 1
+    assert gaiad_calls(keyring) == ["keys export"]
+    _, sequence = signer.sign([msg_send(sender, sender, 1)], "Wallet1", sender, 5000, 200000)
+    assert sequence == 3
+
+
+def test_resync_from_node_log(signer):
+    sender = wallet_address("Wallet1")
+    signer.sign([msg_send(sender, sender, 1)], "Wallet1", sender, 5000, 200000)
+    signer.resync(sender, "account sequence mismatch, expected 7, got 0: incorrect account sequence")
+    tx_raw, sequence = signer.sign([msg_send(sender, sender, 1)], "Wallet1", sender, 5000, 200000)
+    assert sequence == _sequence(tx_raw) == 7
+
+
+def test_simulate_signed_tx_without_gaiad(signer, client, chain, node, keyring):
+    sender = wallet_address("Wallet1")
+    simulator = GasSimulator(GasOracle(client), gaiad_bin=FAKE_GAIAD, signer=signer, gas_price=0.005)
+
+    validators = client.get_delegator_validators(sender)
+    withdraw = simulator.withdraw_gas("Wallet1", len(validators), node.url, sender,
+                                      lambda: withdraw_all_msgs(sender, validators))
+    send = simulator.send_gas("Wallet1", sender, wallet_address("Wallet2"), 1000, "uatom", node.url)
+
+    assert withdraw.source == send.source == "simulation"
+    assert withdraw.gas == int((chain.gas_used + WITHDRAW_MSG_GAS * len(validators)) * SIMULATION_GAS_ADJUSTMENT)
+    assert send.gas == int(chain.gas_used * SIMULATION_GAS_ADJUSTMENT)
+    assert simulator.stats["signed_simulations"] == 2
+    assert gaiad_calls(keyring) == ["keys export"]
+
+
+def test_simulate_without_signer_uses_gaiad(client, node, keyring):
+    simulator = GasSimulator(GasOracle(client), gaiad_bin=FAKE_GAIAD)
+    estimate = simulator.withdraw_gas("Wallet1", 2, node.url, wallet_address("Wallet1"))
+    assert estimate.source == "simulation"
+    assert estimate.gas == int(DRY_RUN_GAS * SIMULATION_GAS_ADJUSTMENT)
+    assert gaiad_calls(keyring) == ["tx distribution"]
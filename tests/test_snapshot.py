@@ -0,0 +1,86 @@
+# test_snapshot.py - Снимок портфеля: все кошельки за одну параллельную фазу, ошибки по строкам и итоги
+
+import json
+import threading
+import time
+
+from conftest import wallet_address
+from rpc_client import RPCError
+from snapshot import take_snapshot
+
+WALLETS = ["Wallet1", "Wallet2", "Wallet3"]
+
+
+class SlowClient:
+    """Баланс и награды с задержкой; считает одновременные запросы"""
+
+    def __init__(self, delay=0.05, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.running = self.peak = 0
+        self._lock = threading.Lock()
+
+    def _request(self, address):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        if address in self.failing:
+            raise RPCError(f"balances {address}: HTTP 503")
+
+    def get_balance(self, address, denom="uatom"):
+        self._request(address)
+        return 1000
+
+    def get_rewards(self, address):
+        self._request(address)
+        return {"total": [{"denom": "uatom", "amount": "12.5"}],
+                "rewards": [{"validator_address": "v1"}, {"validator_address": "v2"}]}
+
+
+def resolve(name):
+    return f"cosmos1{name.lower()}"
+
+
+def test_snapshot_from_node(client, chain, keyring):
+    addresses = {name: wallet_address(name) for name in WALLETS}
+    snapshot = take_snapshot(WALLETS + ["Missing"], addresses.get, client)
+
+    assert [row.wallet_name for row in snapshot] == WALLETS + ["Missing"]
+    for name in WALLETS:
+        row = snapshot[name]
+        assert row.ok and row.address == addresses[name]
+        assert row.balance == chain.initial_balance
+        assert row.rewards > 0 and row.validators == len(chain.validators)
+    assert snapshot["Missing"].error == "адрес не найден"
+
+    totals = snapshot.totals()
+    assert totals["wallets"] == 4 and totals["errors"] == 1
+    assert totals["balance"] == 3 * chain.initial_balance
+    assert json.loads(json.dumps(snapshot.to_dict()))["totals"] == totals
+
+
+def test_wallets_scanned_in_parallel():
+    names = [f"Wallet{i}" for i in range(1, 9)]
+    client = SlowClient()
+    started = time.monotonic()
+    snapshot = take_snapshot(names, resolve, client, workers=8)
+
+    # Восемь кошельков по два запроса - за время примерно двух запросов, а не шестнадцати
+    assert client.peak == 8
+    assert time.monotonic() - started < 8 * 2 * client.delay
+    assert [row.wallet_name for row in snapshot] == names
+    assert all(row.rewards == 12.5 and row.validators == 2 for row in snapshot)
+
+
+def test_request_error_stays_in_row():
+    client = SlowClient(delay=0, failing={resolve("Wallet2")})
+    snapshot = take_snapshot(WALLETS, resolve, client, workers=2)
+
+    assert "HTTP 503" in snapshot["Wallet2"].error
+    assert snapshot["Wallet1"].ok and snapshot["Wallet3"].ok
+    # Строки с ошибкой не входят в итоги баланса и наград
+    assert snapshot.totals() == {"wallets": 3, "errors": 1, "balance": 2000, "rewards": 25.0}
+    assert [row["error"] for row in snapshot.to_rows()] == ["", snapshot["Wallet2"].error, ""]
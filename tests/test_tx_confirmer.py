@@ -0,0 +1,89 @@
+# test_tx_confirmer.py - Подтверждение опросом /tx: задержка следует за временем блока, а не за шагом 30 сек
+
+import base64
+import time
+
+import pytest
+
+from broadcaster import Broadcaster
+from conftest import FAKE_GAIAD, wallet_address
+from fake_node import FakeChain, FakeNode
+from rpc_client import CosmosRPCClient
+from signer import Signer, msg_send, withdraw_all_msgs
+from tx_confirmer import TxConfirmer, parse_tx_parts
+
+BLOCK_TIME = 0.2
+
+
+@pytest.fixture
+def slow_client():
+    node = FakeNode(FakeChain(block_time=BLOCK_TIME))
+    node.start()
+    client = CosmosRPCClient([node.url], sleep=lambda seconds: None)
+    yield client
+    client.close()
+    node.stop()
+
+
+def test_confirmation_tracks_block_time(slow_client, keyring):
+    signer = Signer(slow_client, FAKE_GAIAD)
+    broadcaster = Broadcaster(slow_client)
+    confirmer = TxConfirmer(slow_client, block_time=BLOCK_TIME)
+    hashes = []
+    for i in range(12):
+        name = f"Wallet{i % 3 + 1}"
+        sender = wallet_address(name)
+        tx_raw, _ = signer.sign([msg_send(sender, wallet_address("Wallet1"), 1000 + i)], name, sender, 5000, 200000)
+        result = broadcaster.broadcast(base64.b64encode(tx_raw).decode())
+        assert result.accepted
+        hashes.append(result.tx_hash)
+
+    started = time.monotonic()
+    pendings = [confirmer.submit(tx_hash, timeout=10) for tx_hash in hashes]
+    for pending in pendings:
+        pending.done.wait()
+
+    # Транзакция видна со следующего блока: ответ за несколько блоков, все хеши - одним опрашивающим потоком
+    assert all(pending.status is True for pending in pendings)
+    assert max(pending.latency for pending in pendings) < 5 * BLOCK_TIME
+    assert time.monotonic() - started < 5 * BLOCK_TIME
+
+
+def test_missing_tx_times_out(client, chain):
+    confirmer = TxConfirmer(client, block_time=chain.block_time, max_interval=0.1)
+    pending = confirmer.wait("B" * 64, timeout=0.5)
+    assert pending.status is False and not pending.found
+    assert pending.checks >= 2
+
+
+def event(kind, **attributes):
+    return {"type": kind, "attributes": [{"key": key, "value": value} for key, value in attributes.items()]}
+
+
+def test_parse_tx_parts_splits_withdraw_and_send():
+    tx_result = {"events": [
+        event("withdraw_rewards", validator="val1", amount="700uatom"),
+        event("withdraw_rewards", validator="val2", amount="300uatom,5ibc/27394FB0"),
+        event("withdraw_rewards", validator="val2", amount="100uatom"),
+        event("transfer", sender="distribution", recipient="cosmos1me", amount="1100uatom"),
+        event("transfer", sender="cosmos1me", recipient="cosmos1fee", amount="5000uatom"),
+        event("transfer", sender="cosmos1me", recipient="cosmos1okx", amount="42000uatom"),
+    ]}
+    # Перевод наград модулем distribution и комиссия не считаются отправкой на биржу
+    assert parse_tx_parts(tx_result, "cosmos1me", "cosmos1okx") == {"withdrawn": 1100, "validators": 2, "sent": 42000}
+    assert parse_tx_parts(tx_result, "cosmos1me", "cosmos1okx", denom="uother")["withdrawn"] == 0
+    assert parse_tx_parts(None, "cosmos1me", "cosmos1okx") == {"withdrawn": 0, "validators": 0, "sent": 0}
+
+
+def test_combined_tx_parts_from_node(client, chain, keyring):
+    sender, target = wallet_address("Wallet1"), wallet_address("Wallet2")
+    msgs = withdraw_all_msgs(sender, chain.validators) + [msg_send(sender, target, 12345)]
+    broadcaster = Broadcaster(client, signer=Signer(client, FAKE_GAIAD))
+    result = broadcaster.sign_and_broadcast(None, msgs, "Wallet1", sender, 5000, 400000)
+    assert result.accepted
+
+    pending = TxConfirmer(client, block_time=chain.block_time).wait(result.tx_hash, timeout=5)
+    assert pending.status is True
+    share = chain.initial_rewards // len(chain.validators)
+    assert parse_tx_parts(pending.tx_result, sender, target) == {
+        "withdrawn": share * len(chain.validators), "validators": len(chain.validators), "sent": 12345}
@@ -0,0 +1,253 @@
+# tx_confirmer.py - Подтверждение транзакций опросом /tx с экспоненциальной задержкой
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import get_metrics
+from rpc_client import RPCError
+
+BLOCK_TIME = 6.0            # Среднее время блока Cosmos Hub (сек)
+BACKOFF_FACTOR = 1.5        # Множитель интервала между проверками
+MAX_POLL_INTERVAL = 15.0    # Верхняя граница интервала (сек)
+DEFAULT_TIMEOUT = 300.0     # Ожидание включения в блок (сек)
+CHECK_WORKERS = 8           # Параллельных запросов /tx за один проход
+
+OUT_OF_GAS_CODE = 11
+
+
+def classify_tx_result(code, log):
+    """Статус транзакции в формате check_transaction: True, "out_of_gas" или False"""
+    if code == 0:
+        return True
+    if code == OUT_OF_GAS_CODE and "out of gas" in (log or "").lower():
+        return "out_of_gas"
+    return False
+
+
+def _attributes(event):
+    return {attr.get("key"): attr.get("value") for attr in event.get("attributes") or []}
+
+
+def _amount(value, denom):
+    """Сумма в денноме из строки монет вида "123uatom,5ibc/..." """
+    total = 0
+    for coin in (value or "").split(","):
+        if coin.endswith(denom) and coin[:-len(denom)].isdigit():
+            total += int(coin[:-len(denom)])
+    return total
+
+
+def parse_tx_parts(tx_result, sender, recipient, denom="uatom"):
+    """Итоги частей составной транзакции по событиям tx_result.
+
+    Возвращает {"withdrawn": снято наград, "validators": с какого числа
+    валидаторов, "sent": отправлено sender -> recipient}.
+    """
+    withdrawn = 0
+    validators = set()
+    sent = 0
+    for event in (tx_result or {}).get("events") or []:
+        attrs = _attributes(event)
+        if event.get("type") == "withdraw_rewards":
+            withdrawn += _amount(attrs.get("amount"), denom)
+            validators.add(attrs.get("validator"))
+        elif event.get("type") == "transfer" and attrs.get("sender") == sender \
+                and attrs.get("recipient") == recipient:
+            sent += _amount(attrs.get("amount"), denom)
+    return {"withdrawn": withdrawn, "validators": len(validators), "sent": sent}
+
+
+def parse_withdrawals(tx_result, delegators, denom="uatom"):
+    """Снятые награды по кошелькам в одной транзакции (MsgExec): {адрес: {"withdrawn", "validators"}}.
+
+    С Cosmos SDK 0.47 событие withdraw_rewards содержит delegator. В более
+    старых сетях сумма берётся из transfer на адрес кошелька (награды
+    переводит модуль distribution), число валидаторов тогда неизвестно (0).
+    """
+    result = {address: {"withdrawn": 0, "validators": 0} for address in delegators}
+    transfers = dict.fromkeys(result, 0)
+    attributed = False
+    for event in (tx_result or {}).get("events") or []:
+        attrs = _attributes(event)
+        if event.get("type") == "withdraw_rewards" and attrs.get("delegator") in result:
+            attributed = True
+            entry = result[attrs["delegator"]]
+            entry["withdrawn"] += _amount(attrs.get("amount"), denom)
+            entry["validators"] += 1
+        elif event.get("type") == "transfer" and attrs.get("recipient") in transfers:
+            transfers[attrs["recipient"]] += _amount(attrs.get("amount"), denom)
+    if not attributed:
+        for address, amount in transfers.items():
+            result[address]["withdrawn"] = amount
+    return result
+
+
+def parse_wallet_events(tx_result, addresses, denom="uatom"):
+    """Движения средств транзакции, затрагивающие адреса из множества addresses.
+
+    Возвращает [(вид, отправитель, получатель, сумма)]: "withdraw"
+    (валидатор -> делегатор), "transfer" и "fee" (плательщик комиссии).
+    У неуспешной транзакции учитывается только комиссия.
+    """
+    success = int((tx_result or {}).get("code", 0)) == 0
+    rows = []
+    for event in (tx_result or {}).get("events") or []:
+        kind = event.get("type")
+        if kind not in ("withdraw_rewards", "transfer", "tx"):
+            continue
+        attrs = _attributes(event)
+        if kind == "tx":
+            if attrs.get("fee_payer") in addresses and attrs.get("fee"):
+                rows.append(("fee", attrs["fee_payer"], None, _amount(attrs["fee"], denom)))
+        elif not success:
+            continue
+        elif kind == "withdraw_rewards" and attrs.get("delegator") in addresses:
+            rows.append(("withdraw", attrs.get("validator"), attrs["delegator"], _amount(attrs.get("amount"), denom)))
+        elif kind == "transfer" and (attrs.get("sender") in addresses or attrs.get("recipient") in addresses):
+            rows.append(("transfer", attrs.get("sender"), attrs.get("recipient"), _amount(attrs.get("amount"), denom)))
+    return rows
+
+
+class PendingTx:
+    """Транзакция, ожидающая включения в блок"""
+
+    def __init__(self, tx_hash, submitted_at, first_delay, deadline):
+        self.tx_hash = tx_hash
+        self.submitted_at = submitted_at
+        self.next_check = submitted_at + first_delay
+        self.interval = first_delay
+        self.deadline = deadline
+        self.checks = 0
+        self.status = None          # True / "out_of_gas" / False
+        self.code = None
+        self.log = ""
+        self.height = None
+        self.tx_result = None
+        self.latency = None
+        self.done = threading.Event()
+
+    @property
+    def found(self):
+        return self.code is not None
+
+
+class TxConfirmer:
+    """Один фоновый поток опрашивает все ожидающие хеши.
+
+    Первая проверка делается примерно через время блока после отправки,
+    далее интервал растёт в BACKOFF_FACTOR раз до MAX_POLL_INTERVAL.
+    Ожидать результата могут сразу несколько потоков обработки кошельков.
+    on_done(pending) вызывается с итогом до того, как его увидят ожидающие.
+    """
+
+    def __init__(self, client, block_time=BLOCK_TIME, max_interval=MAX_POLL_INTERVAL,
+                 timeout=DEFAULT_TIMEOUT, clock=time.monotonic, on_done=None):
+        self.client = client
+        self.on_done = on_done
+        self.block_time = block_time
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.clock = clock
+        self._pending = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self._executor = ThreadPoolExecutor(max_workers=CHECK_WORKERS, thread_name_prefix="tx-check")
+
+    def submit(self, tx_hash, timeout=None):
+        """Ставит хеш на отслеживание и сразу возвращает PendingTx"""
+        tx_hash = tx_hash.upper()
+        with self._cond:
+            pending = self._pending.get(tx_hash)
+            if pending is None:
+                now = self.clock()
+                pending = PendingTx(tx_hash, now, self.block_time, now + (timeout or self.timeout))
+                self._pending[tx_hash] = pending
+            self._ensure_thread()
+            self._cond.notify()
+        return pending
+
+    def wait(self, tx_hash, timeout=None):
+        """Блокирует до включения транзакции в блок или истечения таймаута"""
+        pending = self.submit(tx_hash, timeout)
+        pending.done.wait()
+        return pending
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="tx-confirmer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = self.clock()
+                    due = [p for p in self._pending.values() if p.next_check <= now or p.deadline <= now]
+                    if due:
+                        break
+                    next_at = min((min(p.next_check, p.deadline) for p in self._pending.values()), default=None)
+                    self._cond.wait(None if next_at is None else max(next_at - now, 0.0))
+                if self._stopped:
+                    for pending in self._pending.values():
+                        pending.status = False
+                        pending.done.set()
+                    self._pending.clear()
+                    return
+
+            list(self._executor.map(self._check, due))
+
+            with self._cond:
+                for pending in due:
+                    if pending.done.is_set():
+                        self._pending.pop(pending.tx_hash, None)
+
+    @staticmethod
+    def _observe(pending, outcome):
+        """Время от отправки до включения в блок и число опросов до результата"""
+        metrics = get_metrics()
+        metrics.observe("tx_inclusion_seconds", pending.latency, outcome=outcome)
+        metrics.inc("tx_confirm_checks_total", pending.checks, outcome=outcome)
+
+    def _finish(self, pending):
+        if self.on_done is not None:
+            self.on_done(pending)
+        pending.done.set()
+
+    def _check(self, pending):
+        pending.checks += 1
+        try:
+            result = self.client.get_tx_result(pending.tx_hash)
+        except RPCError:
+            result = None
+        now = self.clock()
+        if result is not None:
+            tx_result = result.get("tx_result") or {}
+            pending.code = int(tx_result.get("code", 0))
+            pending.log = tx_result.get("log", "")
+            pending.height = int(result.get("height", 0))
+            pending.tx_result = tx_result
+            pending.status = classify_tx_result(pending.code, pending.log)
+            pending.latency = now - pending.submitted_at
+            outcome = {True: "confirmed", "out_of_gas": "out_of_gas"}.get(pending.status, "failed")
+            self._observe(pending, outcome)
+            self._finish(pending)
+        elif now >= pending.deadline:
+            pending.status = False
+            pending.latency = now - pending.submitted_at
+            self._observe(pending, "timeout")
+            self._finish(pending)
+        else:
+            pending.interval = min(pending.interval * BACKOFF_FACTOR, self.max_interval)
+            pending.next_check = now + pending.interval